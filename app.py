@@ -1,9 +1,19 @@
+import os
 import streamlit as st
 import pandas as pd
+import numpy as np
 from src.data_loader import DataLoader
 from src.data_processor import DataProcessor
 from src.visualizations import Visualizer
 from src.analysis import Analysis
+from src.screener import Screener, SCREENER_METRICS, FACTOR_MODEL_METRICS, UNIVERSE_LOCK
+from src.memo import ANALYTICS_CACHE, FIGURE_CACHE, memoize
+from src.portfolio import PortfolioBuilder, PortfolioOptimizer, OPTIMIZER_OBJECTIVES
+from src.names import get_display_name, format_rank_name
+from src.spreads import SpreadBuilder
+from src.bootstrap import Bootstrap, BOOTSTRAP_RESAMPLES
+from src.profiling import PROFILE_MODE, RerunTimings, instrument_class, phase, record_rerun, timed
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from datetime import datetime
 
 e_COLORS = {
@@ -21,6 +31,40 @@ e_COLORS = {
     'black': '#000000'        # Black
 }
 
+# Data loading mode: "eager" loads every factor at start-up, "lazy" builds a
+# catalog and loads each factor the first time it is selected, "panel" keeps
+# all portfolios in one consolidated, offset-indexed panel and "shared" maps
+# that panel read-only from the cache directory, shared by all processes
+LOAD_MODE = os.environ.get("GQE_LOAD_MODE", "eager").lower()
+
+# Dtype profile of the loaded frames: "default", "compact" or "compact_float32"
+DTYPE_PROFILE = os.environ.get("GQE_DTYPE_PROFILE", "default").lower()
+
+# Number of data files parsed concurrently on a cold start
+LOAD_WORKERS = int(os.environ.get("GQE_LOAD_WORKERS", "1"))
+
+# Pixel widths of a full-width chart and of a chart in one of two columns, in the
+# wide layout of a 1440 px window with the sidebar open. Streamlit does not report
+# the browser's width, so time series figures are downsampled to these.
+CHART_WIDTH = 1040
+COLUMN_CHART_WIDTH = 510
+
+# Classes whose calls are timed per rerun when GQE_PROFILE is set, with the
+# category they are reported under
+INSTRUMENTED_CLASSES = [
+    (DataLoader, 'loader'),
+    (DataProcessor, 'processor'),
+    (PortfolioBuilder, 'portfolio'),
+    (PortfolioOptimizer, 'portfolio'),
+    (Analysis, 'analysis'),
+    (Bootstrap, 'analysis'),
+    (Screener, 'screener'),
+    (Visualizer, 'figure'),
+]
+if PROFILE_MODE != 'off':
+    for instrumented_class, category in INSTRUMENTED_CLASSES:
+        instrument_class(instrumented_class, category)
+
 #Configure Streamlit theme
 st.set_page_config(
     page_title="Global Q Explorer",
@@ -175,336 +219,470 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Group name mappings
-GROUP_NAMES = {
-    "momentum": "Momentum",
-    "value": "Value-versus-Growth",
-    "investment": "Investment",
-    "profitability": "Profitability",
-    "intangibles": "Intangibles",
-    "frictions": "Frictions"
-}
+@timed(name="st.plotly_chart", category="render")
+def plotly_chart(fig):
+    """Serialize a figure and send it to the browser"""
+    st.plotly_chart(fig, use_container_width=True)
 
-# Factor name mappings
-FACTOR_NAMES = {
-    # Momentum
-    "abr_1": "Abnormal Earnings Returns (1m)",
-    "abr_6": "Abnormal Earnings Returns (6m)",
-    "abr_12": "Abnormal Earnings Returns (12m)",
-    "cim_1": "Customer Industries Momentum (1m)",
-    "cim_6": "Customer Industries Momentum (6m)",
-    "cim_12": "Customer Industries Momentum (12m)",
-    "cm_1": "Customer Momentum (1m)",
-    "cm_6": "Customer Momentum (6m)",
-    "cm_12": "Customer Momentum (12m)",
-    "def_1": "Changes in Analyst Forecasts (1m)",
-    "def_6": "Changes in Analyst Forecasts (6m)",
-    "def_12": "Changes in Analyst Forecasts (12m)",
-    "ile_1": "Industry Lead-Lag Earnings (1m)",
-    "ilr_1": "Industry Lead-Lag Returns (1m)",
-    "ilr_6": "Industry Lead-Lag Returns (6m)",
-    "ilr_12": "Industry Lead-Lag Returns (12m)",
-    "im_1": "Industry Momentum (1m)",
-    "im_6": "Industry Momentum (6m)",
-    "im_12": "Industry Momentum (12m)",
-    "nei_1": "Consecutive Earnings Increase (1m)",
-    "p52w_6": "52-Week High (6m)",
-    "p52w_12": "52-Week High (12m)",
-    "r6_1": "6-Month Prior Returns (1m)",
-    "r6_6": "6-Month Prior Returns (6m)",
-    "r6_12": "6-Month Prior Returns (12m)",
-    "r11_1": "11-Month Prior Returns (1m)",
-    "r11_6": "11-Month Prior Returns (6m)",
-    "r11_12": "11-Month Prior Returns (12m)",
-    "re_1": "Analyst Earnings Forecast Revisions (1m)",
-    "re_6": "Analyst Earnings Forecast Revisions (6m)",
-    "resid6_6": "6-Month Residual Momentum (6m)",
-    "resid6_12": "6-Month Residual Momentum (12m)",
-    "resid11_1": "11-Month Residual Momentum (1m)",
-    "resid11_6": "11-Month Residual Momentum (6m)",
-    "resid11_12": "11-Month Residual Momentum (12m)",
-    "rs_1": "Revenue Surprises (1m)",
-    "sim_1": "Supplier Industries Momentum (1m)",
-    "sim_12": "Supplier Industries Momentum (12m)",
-    "sm_1": "Segment Momentum (1m)",
-    "sm_12": "Segment Momentum (12m)",
-    "sue_1": "Standard Unexpected Earnings (1m)",
-    "sue_6": "Standard Unexpected Earnings (6m)",
-    
-    # Value-versus-growth
-    "bm": "Book-to-Market Equity",
-    "bmj": "Book-to-June-Market Equity",
-    "bmq_12": "Quarterly Book-to-Market (12m)",
-    "cp": "Cash Flow-to-Price",
-    "cpq_1": "Quarterly Cash Flow-to-Price (1m)",
-    "cpq_6": "Quarterly Cash Flow-to-Price (6m)",
-    "cpq_12": "Quarterly Cash Flow-to-Price (12m)",
-    "dp": "Dividend Yield",
-    "dur": "Equity Duration",
-    "ebp": "Enterprise Book-to-Price",
-    "em": "Enterprise Multiple",
-    "emq_1": "Quarterly Enterprise Multiple (1m)",
-    "emq_6": "Quarterly Enterprise Multiple (6m)",
-    "emq_12": "Quarterly Enterprise Multiple (12m)",
-    "ep": "Earnings-to-Price",
-    "epq_1": "Quarterly Earnings-to-Price (1m)",
-    "epq_6": "Quarterly Earnings-to-Price (6m)",
-    "epq_12": "Quarterly Earnings-to-Price (12m)",
-    "ir": "Intangible Return",
-    "nop": "Net Payout Yield",
-    "ocp": "Operating Cash Flow-to-Price",
-    "ocpq_1": "Quarterly Operating Cash Flow-to-Price (1m)",
-    "op": "Payout Yield",
-    "rev_1": "Long-term Reversal (1m)",
-    "rev_6": "Long-term Reversal (6m)",
-    "rev_12": "Long-term Reversal (12m)",
-    "sp": "Sales-to-Price",
-    "spq_1": "Quarterly Sales-to-Price (1m)",
-    "spq_6": "Quarterly Sales-to-Price (6m)",
-    "spq_12": "Quarterly Sales-to-Price (12m)",
-    "vfp": "Analyst-based Intrinsic Value-to-Market",
-    "vhp": "ROE-based Intrinsic Value-to-Market",
-    
-    # Investment
-    "aci": "Abnormal Corporate Investment",
-    "cei": "Composite Equity Issuance",
-    "dac": "Discretionary Accruals",
-    "dbe": "Changes in Book Equity",
-    "dcoa": "Changes in Current Operating Assets",
-    "dfin": "Changes in Net Financial Assets",
-    "dfnl": "Changes in Financial Liabilities",
-    "dii": "Changes in Investment vs Industry",
-    "dlno": "Changes in Long-term Net Operating Assets",
-    "dlti": "Changes in Long-term Investments",
-    "dnca": "Changes in Non-current Operating Assets",
-    "dnco": "Changes in Net Non-current Operating Assets",
-    "dnoa": "Changes in Net Operating Assets",
-    "dpia": "Changes in PPE and Inventory to Assets",
-    "dwc": "Changes in Net Non-cash Working Capital",
-    "ia": "Investment-to-Assets",
-    "iaq_1": "Quarterly Investment-to-Assets (1m)",
-    "iaq_6": "Quarterly Investment-to-Assets (6m)",
-    "iaq_12": "Quarterly Investment-to-Assets (12m)",
-    "ig": "Investment Growth",
-    "ig2": "2-Year Investment Growth",
-    "ivc": "Inventory Changes",
-    "ivg": "Inventory Growth",
-    "ndf": "Net External Debt Financing",
-    "nxf": "Net External Equity Financing",
-    "noa": "Net Operating Assets",
-    "nsi": "Net Stock Issues",
-    "oa": "Operating Accruals",
-    "pda": "Percent Discretionary Accruals",
-    "poa": "Percent Operating Accruals",
-    "pta": "Percent Total Accruals",
-    "ta": "Total Accruals",
-        # Profitability
-    "ato": "Asset Turnover",
-    "atoq_1": "Quarterly Asset Turnover (1m)",
-    "atoq_6": "Quarterly Asset Turnover (6m)",
-    "atoq_12": "Quarterly Asset Turnover (12m)",
-    "cla": "Cash Operating Profits-to-Assets",
-    "claq_1": "Quarterly Cash Operating Profits (1m)",
-    "claq_6": "Quarterly Cash Operating Profits (6m)",
-    "claq_12": "Quarterly Cash Operating Profits (12m)",
-    "cop": "Operating Cash Flow-to-Assets",
-    "cto": "Capital Turnover",
-    "ctoq_1": "Quarterly Capital Turnover (1m)",
-    "ctoq_6": "Quarterly Capital Turnover (6m)",
-    "ctoq_12": "Quarterly Capital Turnover (12m)",
-    "droa_1": "Change in Return on Assets (1m)",
-    "droa_6": "Change in Return on Assets (6m)",
-    "droe_1": "Change in Return on Equity (1m)",
-    "droe_6": "Change in Return on Equity (6m)",
-    "droe_12": "Change in Return on Equity (12m)",
-    "eg_1": "Expected Growth (1m)",
-    "eg_6": "Expected Growth (6m)",
-    "eg_12": "Expected Growth (12m)",
-    "fp_6": "Failure Probability (6m)",
-    "fq_1": "Quarterly Fundamental Score (1m)",
-    "fq_6": "Quarterly Fundamental Score (6m)",
-    "fq_12": "Quarterly Fundamental Score (12m)",
-    "glaq_1": "Quarterly Gross Profits-to-Assets (1m)",
-    "glaq_6": "Quarterly Gross Profits-to-Assets (6m)",
-    "glaq_12": "Quarterly Gross Profits-to-Assets (12m)",
-    "gpa": "Gross Profits-to-Assets",
-    "olaq_1": "Quarterly Operating Profits-to-Assets (1m)",
-    "olaq_6": "Quarterly Operating Profits-to-Assets (6m)",
-    "olaq_12": "Quarterly Operating Profits-to-Assets (12m)",
-    "oleq_1": "Quarterly Operating Profits-to-Equity (1m)",
-    "oleq_6": "Quarterly Operating Profits-to-Equity (6m)",
-    "opa": "Operating Profits-to-Assets",
-    "ope": "Operating Profits-to-Equity",
-    "oq_1": "Quarterly O-Score (1m)",
-    "pmq_1": "Quarterly Profit Margin (1m)",
-    "rnaq_1": "Quarterly Return on Net Operating Assets (1m)",
-    "rnaq_6": "Quarterly Return on Net Operating Assets (6m)",
-    "rnaq_12": "Quarterly Return on Net Operating Assets (12m)",
-    "roa_1": "Return on Assets (1m)",
-    "roa_6": "Return on Assets (6m)",
-    "roe_1": "Return on Equity (1m)",
-    "roe_6": "Return on Equity (6m)",
-    "sgq_1": "Quarterly Sales Growth (1m)",
-    "tbiq_6": "Quarterly Tax-to-Book Income (6m)",
-    "tbiq_12": "Quarterly Tax-to-Book Income (12m)",
-
-    # Intangibles
-    "adm": "Advertising-to-Market",
-    "almq_1": "Quarterly Asset Liquidity (1m)",
-    "almq_6": "Quarterly Asset Liquidity (6m)",
-    "almq_12": "Quarterly Asset Liquidity (12m)",
-    "eprd": "Earnings Predictability",
-    "dls_1": "Long-Short Earnings Growth Forecast Disparity (1m)",
-    "etl": "Earnings Timeliness",
-    "etr": "Effective Tax Rate",
-    "hs": "Industry Sales Concentration",
-    "ioca": "Industry-Adjusted Organizational Capital-to-Assets",
-    "oca": "Organizational Capital-to-Assets",
-    "ol": "Operating Leverage",
-    "olq_1": "Quarterly Operating Leverage (1m)",
-    "olq_6": "Quarterly Operating Leverage (6m)",
-    "olq_12": "Quarterly Operating Leverage (12m)",
-    "r1a": "Seasonality Month t-12",
-    "r1n": "Seasonality Months t-11 to t-1",
-    "r5a": "Seasonality Months t-24,36,48,60",
-    "r5n": "Seasonality Months t-60 to t-13 (Excl. Special)",
-    "r10a": "Seasonality Months t-72,84,96,108,120",
-    "r10n": "Seasonality Months t-120 to t-61 (Excl. Special)",
-    "r15a": "Seasonality Months t-132,144,156,168,180",
-    "r20a": "Seasonality Months t-192,204,216,228,240",
-    "rca": "R&D Capital-to-Assets",
-    "rdm": "R&D Expense-to-Market",
-    "rdmq_1": "Quarterly R&D Expense-to-Market (1m)",
-    "rdmq_6": "Quarterly R&D Expense-to-Market (6m)",
-    "rdmq_12": "Quarterly R&D Expense-to-Market (12m)",
-    "rdsq_6": "Quarterly R&D Expense-to-Sales (6m)",
-    "rdsq_12": "Quarterly R&D Expense-to-Sales (12m)",
-    "rer": "Industry-Adjusted Real Estate Ratio",
-
-    # Frictions
-    "beta_1": "Market Beta (1m)",
-    "dtv_12": "Dollar Trading Volume (12m)",
-    "isff_1": "FF3 Idiosyncratic Skewness (1m)",
-    "isq_1": "Q-Factor Idiosyncratic Skewness (1m)",
-    "ivff_1": "FF3 Idiosyncratic Volatility (1m)",
-    "ivq_1": "Q-Factor Idiosyncratic Volatility (1m)",
-    "me": "Market Equity",
-    "srev": "Short-term Reversal",
-    "sv_1": "Systematic Volatility (1m)",
-    "tv_1": "Total Volatility (1m)"
+def create_factor_display_dict(group_manifest):
+    """Create a dictionary mapping display names to factor codes from the manifest of a group"""
+    return {entry['short_name']: factor for factor, entry in group_manifest.items()}
 
-}
+def create_multifactor_portfolio(factor_data, weights=None):
+    """Create a multifactor portfolio from factor returns with given weights"""
+    return PortfolioBuilder.create_multifactor_portfolio(factor_data, weights)
 
-# Rank name mappings
-RANK_NAMES = {
-    "rank_ME": "Market Cap",
-    "rank_beta": "Beta",
-    "rank_mom": "Momentum",
-    "rank_bm": "Book-to-Market",
-    "rank_op": "Operating Profitability",
-    "rank_inv": "Investment"
-}
+# Identifies the loaded dataset in analytics cache keys
+DATA_VERSION = (LOAD_MODE, DTYPE_PROFILE)
 
-def get_display_name(factor_key):
-    """Get display name for a factor, handling group prefixes"""
-    if '/' in factor_key:
-        group, factor = factor_key.split('/')
-        group_display = GROUP_NAMES.get(group, group)
-        if 'me_' in factor:
-            factor_stripped = factor.replace('me_', '')
-            base_name = FACTOR_NAMES.get(factor_stripped, factor_stripped)
-        else:
-            base_name = FACTOR_NAMES.get(factor, factor)
-        return f"{group_display}: {base_name}"
+@memoize(ANALYTICS_CACHE)
+def load_selection(_data_dict, selection):
+    """Load the selected factors and the market portfolio over their common date range"""
+    # The market portfolio is always taken at market cap rank 10
+    return DataLoader.load_selection(
+        _data_dict, selection['factors'], selection['rank_ME'], selection['return_col'], 10
+    )
+
+@memoize(ANALYTICS_CACHE)
+def build_portfolios(_data_dict, selection, weights):
+    """Get the selected factor portfolios plus the weighted multifactor portfolio"""
+    filtered_data, _, _, _ = load_selection(_data_dict, selection)
+    portfolios = dict(filtered_data)
+    if portfolios:
+        multifactor_data = create_multifactor_portfolio(filtered_data, weights)
+        if not multifactor_data.empty:
+            portfolios["Multifactor Portfolio"] = multifactor_data
+    return portfolios
+
+@memoize(ANALYTICS_CACHE)
+def optimizer_moments(_data_dict, selection):
+    """Estimate the annualized factor (and factor minus market) moments used by the optimizer"""
+    filtered_data, market_data, _, _ = load_selection(_data_dict, selection)
+    return_col = selection['return_col']
+    returns, dates = PortfolioBuilder.align_returns(filtered_data, return_col)
+    market_returns = None
+    if market_data is not None:
+        market_matrix, _ = PortfolioBuilder.align_returns({'market': market_data}, return_col, dates)
+        market_returns = market_matrix[:, 0]
+    return PortfolioOptimizer.estimate_moments(returns, market_returns)
+
+@memoize(ANALYTICS_CACHE)
+def optimize_weights(_data_dict, selection, objective, long_only, max_weight):
+    """Get optimized multifactor weights of the selected factors"""
+    filtered_data, _, _, _ = load_selection(_data_dict, selection)
+    moments = optimizer_moments(_data_dict, selection)
+    weights = PortfolioOptimizer.optimize_weights(
+        moments, OPTIMIZER_OBJECTIVES[objective], long_only, max_weight
+    )
+    return dict(zip(filtered_data.keys(), weights))
+
+@memoize(ANALYTICS_CACHE)
+def efficient_frontier(_data_dict, selection, long_only, max_weight):
+    """Evaluate random candidate weightings and trace the efficient frontier"""
+    filtered_data, _, _, _ = load_selection(_data_dict, selection)
+    moments = optimizer_moments(_data_dict, selection)
+    candidates = PortfolioOptimizer.sample_weights(len(filtered_data), 5000, long_only, max_weight)
+    evaluated = PortfolioOptimizer.evaluate_weights(candidates, moments)
+    frontier = PortfolioOptimizer.calculate_efficient_frontier(moments, long_only, max_weight)
+    return evaluated, frontier
+
+@memoize(FIGURE_CACHE)
+def frontier_analysis(_data_dict, selection, weights, long_only, max_weight):
+    """Build the efficient frontier figure with the current multifactor weights"""
+    filtered_data, _, _, _ = load_selection(_data_dict, selection)
+    moments = optimizer_moments(_data_dict, selection)
+    candidates, frontier = efficient_frontier(_data_dict, selection, long_only, max_weight)
+    factor_points = PortfolioOptimizer.evaluate_weights(np.eye(len(filtered_data)), moments)
+    factor_points.index = list(filtered_data.keys())
+    weight_vector = PortfolioBuilder.get_weight_vector(filtered_data.keys(), weights)
+    selected_point = PortfolioOptimizer.evaluate_weights(weight_vector, moments).iloc[0]
+    return Visualizer.create_frontier_plot(candidates, frontier, factor_points, selected_point)
+
+@memoize(ANALYTICS_CACHE)
+def overview_matrices(_data_dict, selection, weights):
+    """
+    Align every portfolio once into the date x portfolio return and stock count
+    matrices shared by the correlation heatmap and the statistics table, with
+    the date-indexed market returns (None without market data)
+    """
+    _, market_data, _, _ = load_selection(_data_dict, selection)
+    portfolios = build_portfolios(_data_dict, selection, weights)
+    return_col = selection['return_col']
+    return_matrix = DataProcessor.build_return_matrix(portfolios, return_col)
+    nstocks_matrix = DataProcessor.build_return_matrix(
+        {name: df for name, df in portfolios.items() if 'nstocks' in df.columns}, 'nstocks'
+    )
+    market_returns = None
+    if market_data is not None:
+        market_returns = DataProcessor.get_date_indexed(market_data)[return_col]
+    return return_matrix, nstocks_matrix, market_returns
+
+@memoize(FIGURE_CACHE)
+def overview_figures(_data_dict, selection, weights):
+    """Build the performance figures and correlation heatmap of all portfolios"""
+    _, market_data, _, _ = load_selection(_data_dict, selection)
+    portfolios = build_portfolios(_data_dict, selection, weights)
+    return_col = selection['return_col']
+    rank_ME = selection['rank_ME']
+    figures = {}
+
+    figures['performance_fig'] = Visualizer.create_multi_performance_plot(
+        portfolios,
+        market_data=market_data,
+        return_col=return_col,
+        title=f"Portfolio Performance (Market Cap Rank {rank_ME})",
+        width=COLUMN_CHART_WIDTH
+    )
+
+    if market_data is not None:
+        # Set date as index for alignment
+        market_indexed = DataProcessor.get_date_indexed(market_data)
+        indexed_portfolios = {
+            name: DataProcessor.get_date_indexed(df) for name, df in portfolios.items()
+        }
+        figures['excess_fig'] = Visualizer.create_excess_return_plot(
+            indexed_portfolios,
+            market_indexed,
+            return_col=return_col,
+            title=f"Excess Returns vs Market (Market Cap Rank {rank_ME})",
+            width=COLUMN_CHART_WIDTH
+        )
+        return_matrix, _, market_returns = overview_matrices(_data_dict, selection, weights)
+        corr_matrix = DataProcessor.calculate_excess_correlation_matrix(return_matrix, market_returns)
+        figures['heatmap_fig'] = Visualizer.create_heatmap(corr_matrix)
     else:
-        if 'me_' in factor_key:
-            factor_stripped = factor_key.replace('me_', '')
-            base_name = FACTOR_NAMES.get(factor_stripped, factor_stripped)
-        else:
-            base_name = FACTOR_NAMES.get(factor_key, factor_key)
-        return base_name
-
-def create_factor_display_dict(factors, group=None):
-    """Create a dictionary mapping display names to factor codes"""
-    display_dict = {}
-    for factor in factors:
-        if group:
-            display_name = get_display_name(f"{group}/{factor}")
-            display_name = get_display_name(factor)
-            display_dict[display_name] = factor
-        else:
-            display_name = get_display_name(factor)
-            display_dict[display_name] = factor
-    return display_dict
+        figures['excess_fig'] = None
+        figures['heatmap_fig'] = None
+    return figures
 
-def format_rank_name(rank_col):
-    """Format rank column name for display"""
-    return RANK_NAMES.get(rank_col, rank_col.replace('rank_', '').replace('_', ' ').title())
+@memoize(ANALYTICS_CACHE)
+def overview_statistics(_data_dict, selection, weights):
+    """Calculate the statistics of all portfolios in one vectorized pass"""
+    return_matrix, nstocks_matrix, market_returns = overview_matrices(_data_dict, selection, weights)
+    return DataProcessor.calculate_statistics_matrix(
+        return_matrix,
+        market_returns=market_returns,
+        nstocks=nstocks_matrix
+    )
 
-def create_multifactor_portfolio(factor_data, weights=None):
-    """Create a multifactor portfolio from factor returns with given weights"""
-    if weights is None:
-        # Equal weights if none provided
-        n_factors = len(factor_data)
-        weights = {factor: 1/n_factors for factor in factor_data.keys()}
-    
-    # Find common date range across all factors
-    all_dates = set.intersection(*[set(df['date']) for df in factor_data.values()])
-    common_dates = sorted(list(all_dates))
+@memoize(ANALYTICS_CACHE)
+def bootstrap_statistics(_data_dict, selection, weights, n_resamples, seed):
+    """Bootstrap confidence intervals of the Sharpe ratio, alpha and IR of all portfolios"""
+    _, market_data, _, _ = load_selection(_data_dict, selection)
+    portfolios = build_portfolios(_data_dict, selection, weights)
+    return_col = selection['return_col']
+    return_matrix = DataProcessor.build_return_matrix(portfolios, return_col)
+    market_returns = None
+    if market_data is not None:
+        market_returns = DataProcessor.get_date_indexed(market_data)[return_col]
+    return Bootstrap.calculate_bootstrap_statistics(
+        return_matrix, market_returns, n_resamples=n_resamples, seed=seed
+    )
+
+@memoize(ANALYTICS_CACHE)
+def select_period(_data_dict, selection, weights, portfolio_name, start_date, end_date):
+    """Get the date-indexed portfolio and market returns within the analysis period"""
+    _, market_data, _, _ = load_selection(_data_dict, selection)
+    portfolios = build_portfolios(_data_dict, selection, weights)
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+    # Filter data for selected date range
+    selected_factor_data = portfolios[portfolio_name]
+    selected_factor_data = selected_factor_data[selected_factor_data['date'].between(start, end)]
+
+    selected_market_data = None
+    if market_data is not None:
+        selected_market_data = market_data[market_data['date'].between(start, end)]
+        selected_market_data = selected_market_data.set_index('date')
+
+    # Set date as index for rolling calculations
+    return selected_factor_data.set_index('date'), selected_market_data
+
+def format_period(start_date, end_date):
+    """Format an analysis period for figure titles"""
+    return f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
+
+# Window lengths (months) of the standard multi-window rolling analysis
+ROLLING_WINDOWS = (12, 24, 36, 60, 120)
+
+@memoize(ANALYTICS_CACHE)
+def rolling_window_stats(_data_dict, selection, weights, portfolio_name, start_date, end_date, windows):
+    """Compute the rolling statistics of a portfolio for a set of windows in one batch"""
+    selected_factor_data, selected_market_data = select_period(
+        _data_dict, selection, weights, portfolio_name, start_date, end_date
+    )
+    return Analysis.calculate_rolling_windows(
+        selected_factor_data,
+        return_col=selection['return_col'],
+        market_data=selected_market_data,
+        windows=windows
+    )
+
+@memoize(FIGURE_CACHE)
+def rolling_analysis(_data_dict, selection, weights, portfolio_name, start_date, end_date, window, windows):
+    """Build the rolling statistics figure of a portfolio"""
+    selected_factor_data, _ = select_period(
+        _data_dict, selection, weights, portfolio_name, start_date, end_date
+    )
+    rolling_stats = rolling_window_stats(
+        _data_dict, selection, weights, portfolio_name, start_date, end_date, windows
+    )[window]
+    return Visualizer.create_rolling_stats_plot(
+        selected_factor_data,
+        rolling_stats,
+        return_col=selection['return_col'],
+        title=f"Rolling Statistics: {portfolio_name} ({format_period(start_date, end_date)})",
+        width=CHART_WIDTH
+    )
+
+@memoize(FIGURE_CACHE)
+def rolling_heatmaps(_data_dict, selection, weights, portfolio_name, start_date, end_date, windows):
+    """Build window x date heatmaps of the rolling Sharpe ratio and beta of a portfolio"""
+    rolling_stats = rolling_window_stats(
+        _data_dict, selection, weights, portfolio_name, start_date, end_date, windows
+    )
+    sharpe_matrix = pd.DataFrame({window: rolling_stats[window]['rolling_sharpe'] for window in windows}).T
+    sharpe_fig = Visualizer.create_rolling_heatmap(
+        sharpe_matrix,
+        title=f"Rolling Sharpe Ratio by Window: {portfolio_name}",
+        colorbar_title="Sharpe",
+        zmid=0
+    )
+    beta_fig = None
+    if all('rolling_beta' in stats.columns for stats in rolling_stats.values()):
+        beta_matrix = pd.DataFrame({window: rolling_stats[window]['rolling_beta'] for window in windows}).T
+        beta_fig = Visualizer.create_rolling_heatmap(
+            beta_matrix,
+            title=f"Rolling Beta by Window: {portfolio_name}",
+            colorbar_title="Beta",
+            zmid=1
+        )
+    return sharpe_fig, beta_fig
+
+@memoize(FIGURE_CACHE)
+def drawdown_analysis(_data_dict, selection, weights, portfolio_name, start_date, end_date):
+    """Build the drawdown figure of a portfolio"""
+    selected_factor_data, _ = select_period(
+        _data_dict, selection, weights, portfolio_name, start_date, end_date
+    )
+    return_col = selection['return_col']
+    drawdown = Analysis.calculate_drawdown(
+        selected_factor_data,
+        return_col=return_col
+    )
+    return Visualizer.create_drawdown_plot(
+        selected_factor_data,
+        drawdown,
+        return_col=return_col,
+        title=f"Drawdown Analysis: {portfolio_name} ({format_period(start_date, end_date)})",
+        width=CHART_WIDTH
+    )
+
+@memoize(ANALYTICS_CACHE)
+def drawdown_episodes(_data_dict, selection, weights, portfolio_name, start_date, end_date, top_n=5):
+    """Build the formatted table of the deepest drawdown episodes of a portfolio"""
+    selected_factor_data, _ = select_period(
+        _data_dict, selection, weights, portfolio_name, start_date, end_date
+    )
+    episodes = Analysis.analyze_drawdowns(
+        selected_factor_data[[selection['return_col']]], top_n=top_n
+    )['episodes'].drop(columns='Portfolio')
+    for col in ['Peak Date', 'Trough Date', 'Recovery Date']:
+        episodes[col] = episodes[col].dt.strftime('%Y-%m').fillna("Not recovered")
+    episodes['Max Drawdown'] = episodes['Max Drawdown'].map(lambda x: f"{x:.2%}")
+    episodes['Time to Recovery (months)'] = episodes['Time to Recovery (months)'].map(
+        lambda x: f"{x:.0f}" if pd.notnull(x) else "-"
+    )
+    return episodes
+
+@memoize(FIGURE_CACHE)
+def relative_analysis(_data_dict, selection, weights, portfolio_name, start_date, end_date, window, windows):
+    """Build the relative performance and tracking error figures of a portfolio"""
+    selected_factor_data, selected_market_data = select_period(
+        _data_dict, selection, weights, portfolio_name, start_date, end_date
+    )
+    return_col = selection['return_col']
+    period = format_period(start_date, end_date)
+    relative_stats = rolling_window_stats(
+        _data_dict, selection, weights, portfolio_name, start_date, end_date, windows
+    )[window]
+
+    # Relative Performance Plot
+    relative_fig = Visualizer.create_relative_performance_plot(
+        selected_factor_data,
+        relative_stats,
+        market_data=selected_market_data,
+        return_col=return_col,
+        title=f"Relative Performance: {portfolio_name} vs Market ({period})"
+    )
+
+    # Tracking Error Plot
+    tracking_fig = Visualizer.create_tracking_error_plot(
+        selected_factor_data,
+        relative_stats,
+        title=f"Tracking Error Analysis: {portfolio_name} ({period})"
+    )
+    return relative_fig, tracking_fig
+
+@memoize(ANALYTICS_CACHE)
+def market_relative_table(_data_dict, selection, weights, portfolio_name, start_date, end_date):
+    """Build the formatted market relative statistics table of a portfolio"""
+    selected_factor_data, selected_market_data = select_period(
+        _data_dict, selection, weights, portfolio_name, start_date, end_date
+    )
+    return_col = selection['return_col']
+    market_stats = Analysis.calculate_market_relative_statistics(
+        selected_factor_data,
+        return_col=return_col,
+        market_data=selected_market_data
+    )
+
+    # Create a DataFrame with both factor and market statistics
+    combined_stats = pd.DataFrame({
+        f"{portfolio_name}": market_stats,
+        "Market Portfolio": DataProcessor.calculate_statistics(
+            selected_market_data,
+            return_col=return_col
+        )
+    })
+
+    # Format the statistics based on the type of metric
+    formatted_stats = combined_stats.copy()
     
-    # Initialize result DataFrame with common dates
-    result = pd.DataFrame({'date': common_dates})
+    # Define formatting rules for different types of metrics
+    percentage_metrics = [
+        'Annual Alpha (%)', 'Mean Return (% p.a.)', 
+        'Excess Return (% p.a.)', 'Tracking Error (% p.a.)', 
+        'Volatility (% p.a.)'
+    ]
     
-    # Get return columns (should be consistent across all factors)
-    first_factor = list(factor_data.keys())[0]
-    return_cols = [col for col in factor_data[first_factor].columns if col.startswith('ret_')]
+    ratio_metrics = [
+        'Beta', 'Information Ratio', 'Sharpe Ratio'
+    ]
     
-    # Initialize return columns with zeros
-    for col in return_cols:
-        result[col] = 0.0
+    correlation_metrics = [
+        'Correlation', 'R-Squared'
+    ]
     
-    # Calculate weighted returns
-    for factor, df in factor_data.items():
-        # Align dates
-        df_aligned = df[df['date'].isin(common_dates)].copy()
-        df_aligned.set_index('date', inplace=True)
-        
-        weight = weights[factor]
-        for col in return_cols:
-            result.set_index('date', inplace=True)
-            result[col] += df_aligned[col] * weight
-            result.reset_index(inplace=True)
+    count_metrics = [
+        'Average N Stocks'
+    ]
     
-    # Calculate cumulative return
-    result.set_index('date', inplace=True)
-    result['cumulative_return'] = (1 + result[return_cols[0]]).cumprod()
-    result.reset_index(inplace=True)
+    distribution_metrics = [
+        'Skewness', 'Kurtosis'
+    ]
     
-    return result
+    for col in formatted_stats.columns:
+        for idx in formatted_stats.index:
+            value = formatted_stats.loc[idx, col]
+            if pd.isna(value) or value is None:
+                formatted_stats.loc[idx, col] = "N/A"
+            else:
+                if idx in percentage_metrics:
+                    # Format percentages with 2 decimal places
+                    formatted_stats.loc[idx, col] = f"{float(value) * 100:,.2f}%"
+                elif idx in ratio_metrics:
+                    # Format ratios with 2 decimal places
+                    formatted_stats.loc[idx, col] = f"{float(value):,.2f}"
+                elif idx in correlation_metrics:
+                    # Format correlations with 3 decimal places
+                    formatted_stats.loc[idx, col] = f"{float(value):,.3f}"
+                elif idx in count_metrics:
+                    # Format counts as integers
+                    formatted_stats.loc[idx, col] = f"{int(value):,}"
+                elif idx in distribution_metrics:
+                    # Format distribution metrics with 3 decimal places
+                    formatted_stats.loc[idx, col] = f"{float(value):,.3f}"
+                else:
+                    # Default format with 4 decimal places
+                    formatted_stats.loc[idx, col] = f"{float(value):,.4f}"
+
+    return formatted_stats
+
+def load_data(base_path="data"):
+    """Get the shared data dict of a data directory in the configured load mode"""
+    if LOAD_MODE == "lazy":
+        return DataLoader.load_data_catalog(base_path, dtype_profile=DTYPE_PROFILE)
+    if LOAD_MODE == "panel":
+        return DataLoader.load_panel_store(base_path)
+    if LOAD_MODE == "shared":
+        return DataLoader.load_shared_panel(base_path)
+    return DataLoader.load_data_directory(
+        base_path, dtype_profile=DTYPE_PROFILE, n_workers=LOAD_WORKERS
+    )
+
+def refresh_data(base_path="data"):
+    """
+    Bring the cached data and everything derived from it up to date with the
+    data directory, parsing only appended rows and newer vintages
+    """
+    changes = DataLoader.refresh_data_directory(base_path)
+    if not changes:
+        return changes
+
+    # The stores reload from the refreshed columnar cache without parsing CSVs
+    DataLoader.load_data_directory.clear()
+    DataLoader.load_data_catalog.clear()
+    DataLoader.load_panel_store.clear()
+    DataLoader.load_shared_panel.clear()
+    DataLoader.load_manifest.clear()
+    # Memoized analytics are keyed on the analysis period and recomputed on demand
+    ANALYTICS_CACHE.clear()
+    FIGURE_CACHE.clear()
+
+    # Append the new months to the screener universes built so far; the others
+    # are built from the refreshed data when first screened
+    with UNIVERSE_LOCK:
+        universes = Screener.cached_universes(base_path)
+        if universes:
+            data_dict = load_data(base_path)
+            for universe in universes:
+                Screener.update_universe(universe, data_dict, changes)
+    return changes
 
 def main():
     #st.set_page_config(page_title="Global Q Explorer", layout="wide")
     st.title("Global Q Explorer")
 
+    # Incremental refresh of new months and vintages
+    phase("Data refresh")
+    with st.sidebar.expander("Data Refresh"):
+        if st.button("Check for New Data"):
+            with st.spinner("Refreshing data..."):
+                changes = refresh_data("data")
+            if changes:
+                new_months = any(change['new_rows'] > 0 for change in changes)
+                end_date = max(change['end_date'] for change in changes)
+                st.success(
+                    f"Updated {len(changes)} files"
+                    + (f", data now runs through {end_date.strftime('%Y-%m')}" if new_months else "")
+                )
+            else:
+                st.info("Data is up to date")
+
     # Load Data
+    phase("Load data")
     data_loader = DataLoader()
-    data_dict = data_loader.load_data_directory("data")
+    data_dict = load_data("data")
     
+    # Sidebar metadata comes from the precomputed manifest, not the return data
+    phase("Sidebar")
+    manifest = data_loader.load_manifest("data")
+
     # Sidebar Controls
     st.sidebar.header("Data Selection")
     
-    # Get available groups excluding market portfolio
-    available_groups = [g for g in data_loader.get_available_groups(data_dict) 
-                       if g != 'market_portfolio']
+    # Get available groups (the manifest holds factor groups only)
+    available_groups = data_loader.get_available_groups(manifest)
     
     # Create expandable sections for each group
     selected_factors = {}
     
     for group in available_groups:
-        group_display = GROUP_NAMES.get(group, group)
+        group_manifest = manifest[group]
+        group_display = next(iter(group_manifest.values()))['group_display_name']
         with st.sidebar.expander(f"{group_display}"):
-            group_factors = data_loader.get_available_factors(data_dict, group)
-            factor_display_dict = create_factor_display_dict(group_factors, group)
+            factor_display_dict = create_factor_display_dict(group_manifest)
             
             selected_displays = st.multiselect(
                 "Select Factors",
@@ -520,27 +698,25 @@ def main():
         st.warning("Please select at least one factor from any group.")
         st.stop()
     
-    # Market Cap Selection
-    all_market_caps = set()
-    for group, factors in selected_factors.items():
-        for factor in factors:
-            market_caps = data_loader.get_available_market_caps(data_dict, group, factor)
-            all_market_caps.update(market_caps)
+    # Market Cap Selection (ranks every selected factor has; spreads add size-averaged)
+    all_market_caps = SpreadBuilder.get_common_market_caps(
+        manifest[group][factor] for group, factors in selected_factors.items() for factor in factors
+    )
     
     selected_market_cap = st.sidebar.selectbox(
         "Select Market Cap Rank",
-        sorted(list(all_market_caps)),
-        index=2,
-        format_func=lambda x: f"Rank {x}"
+        all_market_caps,
+        index=min(2, len(all_market_caps) - 1),
+        format_func=SpreadBuilder.format_market_cap
     )
     
     # Factor Rank Selection
     factor_ranks = {}
     for group, factors in selected_factors.items():
         for factor in factors:
-            available_ranks = data_loader.get_available_ranks(data_dict, group, factor)
+            available_ranks = manifest[group][factor]['rank_values']
             if available_ranks:
-                display_name = get_display_name(f"{group}/{factor}")
+                display_name = manifest[group][factor]['display_name']
                 st.sidebar.subheader(f"Ranks for {display_name}")
                 factor_ranks[(group, factor)] = {}
                 for rank_col, rank_values in available_ranks.items():
@@ -555,25 +731,6 @@ def main():
                     )
                     factor_ranks[(group, factor)][rank_col] = selected_rank
     
-    # Load selected factor data
-    factor_data = {}
-    for group, factors in selected_factors.items():
-        group_data = data_loader.get_factor_data(
-            data_dict, 
-            group, 
-            factors, 
-            selected_market_cap,
-            {f: factor_ranks[(group, f)] for f in factors if (group, f) in factor_ranks}
-        )
-        # Add group prefix to factor names to avoid duplicates
-        factor_data.update({f"{group}/{f}": data for f, data in group_data.items()})
-    
-    # Load market portfolio data for the selected market cap
-    market_data = data_loader.get_market_portfolio(data_dict, 10)#selected_market_cap)
-
-    #st.write(factor_data)
-    #st.write(market_data)
-    
     # Return Type Selection
     return_columns = data_loader.get_return_columns()
     selected_return = st.sidebar.selectbox(
@@ -583,30 +740,30 @@ def main():
         format_func=lambda x: "Value-weighted" if x == "ret_vw" else "Equal-weighted"
     )
 
-    # Get common date range across all selected factors
-    min_date = max(df['date'].min() for df in factor_data.values())
-    max_date = min(df['date'].max() for df in factor_data.values())
-    
-    # Filter data by date range and add display names
-    filtered_data = {}
-    for factor, df in factor_data.items():
-        display_name = get_display_name(factor)
-        filtered_df = df[df['date'].between(min_date, max_date)].copy()
-        filtered_df['cumulative_return'] = (1 + filtered_df[selected_return]).cumprod()
-        filtered_data[display_name] = filtered_df
-    
-    if market_data is not None:
-        market_data = market_data[market_data['date'].between(min_date, max_date)]
+    # The selection keys every memoized analytics result below
+    selection = {
+        'data_version': DATA_VERSION,
+        'factors': [
+            (group, factor, factor_ranks.get((group, factor), {}))
+            for group, factors in selected_factors.items() for factor in factors
+        ],
+        'rank_ME': selected_market_cap,
+        'return_col': selected_return,
+    }
 
-    # Before visualization
-    for factor in filtered_data:
-        if 'date' not in filtered_data[factor].columns and isinstance(filtered_data[factor].index, pd.DatetimeIndex):
-            filtered_data[factor] = filtered_data[factor].reset_index()
+    # Load selected factor data
+    phase("Load selection")
+    filtered_data, market_data, min_date, max_date = load_selection(data_dict, selection)
 
     # Add multifactor portfolio section
+    phase("Portfolio weights")
     st.sidebar.markdown("---")
     st.sidebar.subheader("Multifactor Portfolio")
-    show_weights = st.sidebar.checkbox("Modify Portfolio Weights", value=False)
+    weight_mode = st.sidebar.radio(
+        "Portfolio Weights",
+        ["Equal", "Manual", "Optimized"],
+        horizontal=True
+    )
     
     # Calculate default equal weights
     n_factors = len(filtered_data)
@@ -614,7 +771,7 @@ def main():
     
     # Create weight inputs if requested
     portfolio_weights = {}
-    if show_weights:
+    if weight_mode == "Manual":
         st.sidebar.markdown("Enter weights (they will be normalized to sum to 1)")
         total_weight = 0
         for factor in sorted(filtered_data.keys()):
@@ -632,16 +789,33 @@ def main():
         # Normalize weights
         if total_weight > 0:
             portfolio_weights = {k: v/total_weight for k, v in portfolio_weights.items()}
+    elif weight_mode == "Optimized":
+        optimizer_objective = st.sidebar.selectbox(
+            "Optimization Objective",
+            list(OPTIMIZER_OBJECTIVES.keys())
+        )
+        long_only = st.sidebar.checkbox("Long Only", value=True)
+        max_weight = st.sidebar.number_input(
+            "Max Weight per Factor",
+            min_value=float(np.ceil(100 / n_factors) / 100),
+            max_value=1.0,
+            value=1.0,
+            step=0.05
+        )
+        try:
+            portfolio_weights = optimize_weights(
+                data_dict, selection, optimizer_objective, long_only, max_weight
+            )
+        except ValueError as e:
+            st.sidebar.warning(f"{e} - using equal weights")
+            portfolio_weights = {factor: default_weight for factor in filtered_data.keys()}
     else:
         portfolio_weights = {factor: default_weight for factor in filtered_data.keys()}
     
     # Create multifactor portfolio
-    if filtered_data:
-        multifactor_data = create_multifactor_portfolio(filtered_data, portfolio_weights)
-        if not multifactor_data.empty:
-            filtered_data["Multifactor Portfolio"] = multifactor_data
-        else:
-            st.warning("Could not create multifactor portfolio - no common dates found across factors")
+    portfolios = build_portfolios(data_dict, selection, portfolio_weights)
+    if filtered_data and "Multifactor Portfolio" not in portfolios:
+        st.warning("Could not create multifactor portfolio - no common dates found across factors")
 
     # Display current weights
     st.sidebar.markdown("---")
@@ -650,59 +824,47 @@ def main():
     weights_df['Weight'] = weights_df['Weight'].map(lambda x: f"{x:.2%}")
     st.sidebar.dataframe(weights_df, hide_index=True)
 
+    phase("Portfolio overview")
+    overview = overview_figures(data_dict, selection, portfolio_weights)
+
     # Add tabs for different analyses
     #tab1, tab2, tab3 = st.tabs(["Basic Analysis", "Rolling Analysis", "Quantile Analysis"])
-    tab1, tab2 = st.tabs(["Basic Analysis", "Rolling Analysis"])
+    tab1, tab2, tab3 = st.tabs(["Basic Analysis", "Rolling Analysis", "Factor Screener"])
     
     with tab1: 
+        phase("Basic Analysis tab")
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("Total Return Performance")
-            fig = Visualizer.create_multi_performance_plot(
-                filtered_data, 
-                market_data=market_data,
-                return_col=selected_return,
-                title=f"Portfolio Performance (Market Cap Rank {selected_market_cap})"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            plotly_chart(overview['performance_fig'])
         
         with col2:
             st.subheader("Excess Return Performance")
             if market_data is not None:
-                # Set date as index for alignment if not already
-                if not isinstance(market_data.index, pd.DatetimeIndex):
-                    market_data = market_data.set_index('date')
-                for factor in filtered_data:
-                    if not isinstance(filtered_data[factor].index, pd.DatetimeIndex):
-                        filtered_data[factor] = filtered_data[factor].set_index('date')
-                
-                fig = Visualizer.create_excess_return_plot(
-                    filtered_data,
-                    market_data,
-                    return_col=selected_return,
-                    title=f"Excess Returns vs Market (Market Cap Rank {selected_market_cap})"
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                plotly_chart(overview['excess_fig'])
             else:
                 st.warning("Market data required for excess return analysis")
         
         # Correlation matrix below the plots
         st.subheader("Excess Return Correlations")
         if market_data is not None:
-            corr_matrix = DataProcessor.calculate_multi_correlation_matrix(
-                filtered_data, market_data, selected_return
-            )
-            fig = Visualizer.create_heatmap(corr_matrix)
-            st.plotly_chart(fig, use_container_width=True)
+            plotly_chart(overview['heatmap_fig'])
         else:
             st.warning("Market data required for excess return correlations")
+
+        if weight_mode == "Optimized":
+            st.subheader("Efficient Frontier")
+            plotly_chart(
+                frontier_analysis(data_dict, selection, portfolio_weights, long_only, max_weight)
+            )
     
     with tab2:
+        phase("Rolling Analysis tab")
         # Let user select which factor to analyze in detail
         selected_display_name = st.selectbox(
             "Select Factor for Detailed Analysis",
-            options=sorted(filtered_data.keys())
+            options=sorted(portfolios.keys())
         )
         
         # Add date range selection
@@ -730,167 +892,63 @@ def main():
                 max_value=max_date
             )
         
-        # Filter data for selected date range
-        selected_factor_data = filtered_data[selected_display_name].copy()
-        
-        # Reset index if date is the index
-        if isinstance(selected_factor_data.index, pd.DatetimeIndex):
-            selected_factor_data = selected_factor_data.reset_index()
-        
-        # Filter by date range
-        selected_factor_data = selected_factor_data[
-            selected_factor_data['date'].between(pd.Timestamp(start_date), pd.Timestamp(end_date))
-        ]
-        
-        if market_data is not None:
-            # Reset index if date is the index
-            if isinstance(market_data.index, pd.DatetimeIndex):
-                selected_market_data = market_data.reset_index()
-            else:
-                selected_market_data = market_data.copy()
-            
-            selected_market_data = selected_market_data[
-                selected_market_data['date'].between(pd.Timestamp(start_date), pd.Timestamp(end_date))
-            ]
-        
         # Rolling Analysis
         st.subheader("Rolling Statistics Analysis")
         
-        window = st.slider(
-            "Rolling Window (months)",
-            min_value=3,
-            max_value=36,
-            value=12
+        window_mode = st.radio(
+            "Window Mode",
+            ["Single Window", "Standard Windows"],
+            horizontal=True,
+            help="Standard windows are computed together, so switching between them is instant"
         )
-        
-        # Set date as index for rolling calculations
-        selected_factor_data.set_index('date', inplace=True)
-        if market_data is not None:
-            selected_market_data.set_index('date', inplace=True)
-        
-        rolling_stats = Analysis.calculate_rolling_stats(
-            selected_factor_data, 
-            return_col=selected_return, 
-            window=window
+
+        if window_mode == "Single Window":
+            window = st.slider(
+                "Rolling Window (months)",
+                min_value=3,
+                max_value=36,
+                value=12
+            )
+            windows = (window,)
+        else:
+            window = st.select_slider(
+                "Rolling Window (months)",
+                options=ROLLING_WINDOWS,
+                value=12
+            )
+            windows = ROLLING_WINDOWS
+
+        period_args = (
+            data_dict, selection, portfolio_weights, selected_display_name, start_date, end_date
         )
         
-        fig = Visualizer.create_rolling_stats_plot(
-            selected_factor_data, 
-            rolling_stats, 
-            return_col=selected_return,
-            title=f"Rolling Statistics: {selected_display_name} ({start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')})"
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        fig = rolling_analysis(*period_args, window, windows)
+        plotly_chart(fig)
+
+        if window_mode == "Standard Windows":
+            sharpe_fig, beta_fig = rolling_heatmaps(*period_args, windows)
+            plotly_chart(sharpe_fig)
+            if beta_fig is not None:
+                plotly_chart(beta_fig)
         
         # Drawdown Analysis
-        drawdown = Analysis.calculate_drawdown(
-            selected_factor_data, 
-            return_col=selected_return
-        )
-        fig = Visualizer.create_drawdown_plot(
-            selected_factor_data, 
-            drawdown, 
-            return_col=selected_return,
-            title=f"Drawdown Analysis: {selected_display_name} ({start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')})"
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        fig = drawdown_analysis(*period_args)
+        plotly_chart(fig)
+
+        st.markdown("**Largest Drawdown Episodes**")
+        st.dataframe(drawdown_episodes(*period_args), use_container_width=True, hide_index=True)
         
         # Market Comparison Section
         st.subheader("Market Relative Analysis")
         
         if market_data is not None:
-            relative_stats = Analysis.calculate_relative_performance(
-                selected_factor_data, 
-                return_col=selected_return, 
-                market_data=selected_market_data, 
-                window=window
-            )
-            
-            # Relative Performance Plot
-            fig = Visualizer.create_relative_performance_plot(
-                selected_factor_data, 
-                relative_stats, 
-                market_data=selected_market_data,
-                return_col=selected_return,
-                title=f"Relative Performance: {selected_display_name} vs Market ({start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')})"
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Tracking Error Plot
-            fig = Visualizer.create_tracking_error_plot(
-                selected_factor_data, 
-                relative_stats,
-                title=f"Tracking Error Analysis: {selected_display_name} ({start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')})"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            relative_fig, tracking_fig = relative_analysis(*period_args, window, windows)
+            plotly_chart(relative_fig)
+            plotly_chart(tracking_fig)
             
             # Market Relative Statistics
             st.subheader("Market Relative Statistics")
-            market_stats = Analysis.calculate_market_relative_statistics(
-                selected_factor_data, 
-                return_col=selected_return,
-                market_data=selected_market_data
-            )
-            
-            # Create a DataFrame with both factor and market statistics
-            combined_stats = pd.DataFrame({
-                f"{selected_display_name}": market_stats,
-                "Market Portfolio": DataProcessor.calculate_statistics(
-                    selected_market_data,
-                    return_col=selected_return
-                )
-            })
-            
-            # Format the statistics based on the type of metric
-            formatted_stats = combined_stats.copy()
-            
-            # Define formatting rules for different types of metrics
-            percentage_metrics = [
-                'Annual Alpha (%)', 'Mean Return (% p.a.)', 
-                'Excess Return (% p.a.)', 'Tracking Error (% p.a.)', 
-                'Volatility (% p.a.)'
-            ]
-            
-            ratio_metrics = [
-                'Beta', 'Information Ratio', 'Sharpe Ratio'
-            ]
-            
-            correlation_metrics = [
-                'Correlation', 'R-Squared'
-            ]
-            
-            count_metrics = [
-                'Average N Stocks'
-            ]
-            
-            distribution_metrics = [
-                'Skewness', 'Kurtosis'
-            ]
-            
-            for col in formatted_stats.columns:
-                for idx in formatted_stats.index:
-                    value = formatted_stats.loc[idx, col]
-                    if pd.isna(value) or value is None:
-                        formatted_stats.loc[idx, col] = "N/A"
-                    else:
-                        if idx in percentage_metrics:
-                            # Format percentages with 2 decimal places
-                            formatted_stats.loc[idx, col] = f"{float(value) * 100:,.2f}%"
-                        elif idx in ratio_metrics:
-                            # Format ratios with 2 decimal places
-                            formatted_stats.loc[idx, col] = f"{float(value):,.2f}"
-                        elif idx in correlation_metrics:
-                            # Format correlations with 3 decimal places
-                            formatted_stats.loc[idx, col] = f"{float(value):,.3f}"
-                        elif idx in count_metrics:
-                            # Format counts as integers
-                            formatted_stats.loc[idx, col] = f"{int(value):,}"
-                        elif idx in distribution_metrics:
-                            # Format distribution metrics with 3 decimal places
-                            formatted_stats.loc[idx, col] = f"{float(value):,.3f}"
-                        else:
-                            # Default format with 4 decimal places
-                            formatted_stats.loc[idx, col] = f"{float(value):,.4f}"
+            formatted_stats = market_relative_table(*period_args)
             
             st.dataframe(
                 formatted_stats,
@@ -899,6 +957,60 @@ def main():
         else:
             st.warning("Market portfolio data not available for comparison.")
     
+    with tab3:
+        phase("Factor Screener tab")
+        st.subheader("Factor Screener")
+        # Screening reads every portfolio, so it only runs once asked for; the
+        # universe is then kept and later reruns reuse it
+        if not st.checkbox(
+            "Screen All Portfolios",
+            help="Loads every portfolio in the dataset the first time",
+            key="screener_run"
+        ):
+            st.info("Screen all portfolios to rank them by a metric")
+        else:
+            screen_model = st.radio(
+                "Benchmark Model",
+                ["Market", "q-Factor"],
+                horizontal=True,
+                key="screener_model"
+            )
+            if screen_model == "Market":
+                st.markdown("All portfolios (every factor, market cap rank and factor rank) "
+                            "against the market portfolio")
+                screener_stats = Screener.load_universe_statistics(data_dict, "data", selected_return, 10)
+                screener_metrics = SCREENER_METRICS
+            else:
+                st.markdown("All portfolios regressed on the market portfolio and the size (ME), "
+                            "investment (IA) and profitability (ROE) spreads of the q-factor model")
+                screener_stats = Screener.load_factor_regressions(data_dict, "data", selected_return, 10)
+                screener_metrics = FACTOR_MODEL_METRICS
+
+            screen_col1, screen_col2 = st.columns(2)
+            with screen_col1:
+                screen_metric = st.selectbox(
+                    "Rank Portfolios By",
+                    list(screener_metrics.keys()),
+                    key=f"screener_metric_{screen_model}"
+                )
+            with screen_col2:
+                screen_top_n = st.number_input(
+                    "Number of Portfolios",
+                    min_value=10,
+                    max_value=len(screener_stats),
+                    value=min(50, len(screener_stats)),
+                    step=10,
+                    key="screener_top_n"
+                )
+
+            ranked_stats = Screener.rank_portfolios(screener_stats, screen_metric, top_n=int(screen_top_n))
+            ranked_stats.insert(0, 'Factor', [get_display_name(f) for f in ranked_stats['factor']])
+            st.dataframe(
+                ranked_stats.round(3),
+                use_container_width=True,
+                hide_index=True
+            )
+
     # with tab3:
     #     # Quantile Analysis
     #     st.subheader("Factor Quantile Analysis")
@@ -923,20 +1035,10 @@ def main():
     #     st.dataframe(quantile_stats)
 
     # Statistics Table
+    phase("Statistics table")
     st.subheader("Portfolio Statistics")
     
-    # Calculate statistics for all selected portfolios
-    stats_dict = {}
-    for factor_name, df in filtered_data.items():
-        stats = DataProcessor.calculate_statistics(
-            df, 
-            return_col=selected_return,
-            market_data=market_data if market_data is not None else None
-        )
-        stats_dict[factor_name] = stats
-    
-    # Create and format the statistics DataFrame
-    stats_df = pd.DataFrame(stats_dict)
+    stats_df = overview_statistics(data_dict, selection, portfolio_weights)
     
     # Format the statistics table
     formatted_stats = stats_df.copy()
@@ -952,5 +1054,64 @@ def main():
         height=400
     )
 
+    if st.checkbox(
+        "Bootstrap Confidence Intervals",
+        help="Stationary block bootstrap of the months, shared by all portfolios"
+    ):
+        col1, col2 = st.columns(2)
+        with col1:
+            n_resamples = st.number_input(
+                "Resamples", min_value=100, max_value=100000, value=BOOTSTRAP_RESAMPLES, step=1000
+            )
+        with col2:
+            seed = st.number_input("Seed", min_value=0, value=0, step=1)
+        bootstrap_df = bootstrap_statistics(
+            data_dict, selection, portfolio_weights, int(n_resamples), int(seed)
+        )
+        st.dataframe(bootstrap_df.round(3), use_container_width=True)
+
+def show_rerun_timings(container, timings):
+    """Show the phase and function timing breakdown of a rerun"""
+    with container:
+        st.metric("Rerun Time", f"{timings.total * 1e3:.0f} ms")
+        hit_rates = [
+            f"{cache_stats['hit_rate']:.0%}" if cache_stats['hit_rate'] is not None else "n/a"
+            for cache_stats in (ANALYTICS_CACHE.stats(), FIGURE_CACHE.stats())
+        ]
+        st.caption(
+            f"Rerun {timings.rerun} ({timings.status}), analytics cache hit rate {hit_rates[0]}, "
+            f"figure cache hit rate {hit_rates[1]}"
+        )
+
+        phases = timings.phase_breakdown()
+        phases['Time (ms)'] = phases['Time (ms)'].map(lambda x: f"{x:.1f}")
+        phases['Share'] = phases['Share'].map(lambda x: f"{x:.0%}" if pd.notnull(x) else "-")
+        st.dataframe(phases, hide_index=True, use_container_width=True)
+
+        st.markdown("**Timed Calls**")
+        st.dataframe(timings.function_breakdown().round(2), hide_index=True, use_container_width=True)
+
+        if timings.profile_path:
+            st.caption(f"Profile written to {timings.profile_path}")
+            if timings.profile_summary:
+                st.code(timings.profile_summary, language=None)
+
+def profiled_main():
+    """
+    Run main() with a timing breakdown in the sidebar, a structured log record
+    and, with GQE_PROFILE=cprofile or pyinstrument, a profile dump of the rerun
+    """
+    container = st.sidebar.expander("Performance")
+    ctx = get_script_run_ctx()
+    st.session_state['rerun_count'] = st.session_state.get('rerun_count', 0) + 1
+    timings = RerunTimings(ctx.session_id if ctx else None, st.session_state['rerun_count'])
+    # Reruns ended early by st.stop or a widget change are logged but not shown
+    with record_rerun(timings):
+        main()
+    show_rerun_timings(container, timings)
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    if PROFILE_MODE == 'off':
+        main()
+    else:
+        profiled_main() 
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Benchmark of the stationary bootstrap intervals against one resample at a time
+
+Run from the repository root:
+    python -m benchmarks.bench_bootstrap --resamples 1000 10000 --portfolios 10 50 --workers 1 4
+
+The loop gathers every resample's returns and computes its statistics with
+DataProcessor.calculate_statistics_matrix and FactorModel.regress; it is only
+timed up to --loop-max resamples and its results are checked against the
+batched ones for the same index matrix first.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from src.bootstrap import Bootstrap
+from src.data_processor import DataProcessor
+from src.factor_model import FactorModel
+from benchmarks.bench_multifactor import best_time
+from benchmarks.bench_factor_model import make_returns
+
+
+def loop_statistics(returns, market_returns, indices):
+    """Statistics of every resample, gathering and analysing one resample at a time"""
+    draws = []
+    for resample in indices:
+        resampled = returns.iloc[resample].reset_index(drop=True)
+        market = pd.DataFrame({'MKT': market_returns.iloc[resample].to_numpy()})
+        stats = DataProcessor.calculate_statistics_matrix(resampled, market['MKT'])
+        alpha = FactorModel.regress(resampled, market)['Annual Alpha (%)']
+        draws.append(np.column_stack([stats.loc['Sharpe Ratio'], alpha, stats.loc['Information Ratio']]))
+    return np.array(draws, dtype=float)
+
+
+def batched_statistics(returns, market_returns, indices):
+    """Statistics of every resample from one counts x inputs matrix product"""
+    inputs, centre, market_centre = Bootstrap.build_sum_inputs(
+        returns.to_numpy(dtype=float), market_returns.to_numpy(dtype=float)
+    )
+    sums = Bootstrap.resample_counts(indices, len(returns)) @ inputs
+    return Bootstrap.statistics_from_sums(sums, centre, market_centre)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--months', type=int, default=684)
+    parser.add_argument('--resamples', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--portfolios', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--loop-max', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'resamples':>10}{'portfolios':>11}{'loop s':>9}"
+          + ''.join(f"{f'{n} workers s':>13}" for n in args.workers))
+    for n_portfolios in args.portfolios:
+        returns, factors = make_returns(args.months, n_portfolios)
+        market_returns = factors['MKT']
+        rng = np.random.default_rng(0)
+        indices = Bootstrap.resample_indices(len(returns), 50, Bootstrap.default_block_length(len(returns)), rng)
+        np.testing.assert_allclose(batched_statistics(returns, market_returns, indices),
+                                   loop_statistics(returns, market_returns, indices), rtol=1e-8, atol=1e-10)
+
+        for n_resamples in args.resamples:
+            loop_time = '-'
+            if n_resamples <= args.loop_max:
+                indices = Bootstrap.resample_indices(
+                    len(returns), n_resamples, Bootstrap.default_block_length(len(returns)), rng
+                )
+                seconds = best_time(lambda: loop_statistics(returns, market_returns, indices), 1)
+                loop_time = f"{seconds:.3f}"
+            times = [
+                best_time(lambda: Bootstrap.calculate_bootstrap_statistics(
+                    returns, market_returns, n_resamples, n_workers=n_workers
+                ), args.repeat)
+                for n_workers in args.workers
+            ]
+            print(f"{n_resamples:>10}{n_portfolios:>11}{loop_time:>9}"
+                  + ''.join(f"{seconds:>13.3f}" for seconds in times))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark of the batched factor regressions against one OLS fit per portfolio
+
+Run from the repository root:
+    python -m benchmarks.bench_factor_model --portfolios 10 100 1000 3000
+
+The per-portfolio fits use statsmodels if it is installed and
+numpy.linalg.lstsq otherwise. Each portfolio misses a random stretch of
+months, so every fit has its own sample as in the screener universe.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from src.factor_model import FactorModel
+from benchmarks.bench_multifactor import best_time
+
+try:
+    import statsmodels.api as sm
+except ImportError:  # optional: the loop then fits with numpy.linalg.lstsq
+    sm = None
+
+FACTOR_NAMES = ['MKT', 'ME', 'IA', 'ROE']
+
+
+def loop_regressions(returns, factors):
+    """Alpha, loadings and their t-stats with a separate OLS fit per portfolio"""
+    results = {}
+    for col in returns.columns:
+        df = pd.concat([returns[col].rename('y'), factors], axis=1).dropna()
+        design = np.column_stack([np.ones(len(df)), df[factors.columns].to_numpy()])
+        y = df['y'].to_numpy()
+        if sm is not None:
+            fit = sm.OLS(y, design).fit()
+            coefs, t_stats = fit.params, fit.tvalues
+        else:
+            coefs = np.linalg.lstsq(design, y, rcond=None)[0]
+            residuals = y - design @ coefs
+            sigma2 = residuals @ residuals / (len(y) - design.shape[1])
+            std_errors = np.sqrt(sigma2 * np.diag(np.linalg.inv(design.T @ design)))
+            t_stats = coefs / std_errors
+        results[col] = np.concatenate([coefs, t_stats])
+    return results
+
+
+def make_returns(n_months, n_portfolios, seed=0):
+    """Create synthetic factor returns and portfolio returns with gaps"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1967-01-01', periods=n_months, freq='MS')
+    factors = pd.DataFrame(rng.normal(0.005, 0.03, (n_months, len(FACTOR_NAMES))),
+                           index=dates, columns=FACTOR_NAMES)
+    loadings = rng.normal(0.5, 0.5, (len(FACTOR_NAMES), n_portfolios))
+    values = factors.to_numpy() @ loadings + rng.normal(0.001, 0.02, (n_months, n_portfolios))
+    starts = rng.integers(0, n_months // 4, n_portfolios)
+    values[np.arange(n_months)[:, None] < starts] = np.nan
+    returns = pd.DataFrame(values, index=dates, columns=[f"portfolio_{i}" for i in range(n_portfolios)])
+    return returns, factors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--months', type=int, default=684)
+    parser.add_argument('--portfolios', type=int, nargs='+', default=[10, 100, 1000, 3000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"per-portfolio fits with {'statsmodels' if sm is not None else 'numpy.linalg.lstsq'}")
+    print(f"{'portfolios':>11}{'loop s':>11}{'batched s':>11}{'speedup':>9}")
+    for n_portfolios in args.portfolios:
+        returns, factors = make_returns(args.months, n_portfolios)
+
+        # Check the batched solve against the separate fits before timing it
+        batched = FactorModel.regress(returns, factors)
+        for col, reference in loop_regressions(returns, factors).items():
+            row = batched.loc[col]
+            coefs = [row['Annual Alpha (%)'] / 1200] + [row[f'{name} Beta'] for name in FACTOR_NAMES]
+            t_stats = [row['Alpha t-stat']] + [row[f'{name} t-stat'] for name in FACTOR_NAMES]
+            np.testing.assert_allclose(np.concatenate([coefs, t_stats]), reference, rtol=1e-7, atol=1e-10)
+
+        loop_time = best_time(lambda: loop_regressions(returns, factors), args.repeat)
+        batched_time = best_time(lambda: FactorModel.regress(returns, factors), args.repeat)
+        print(f"{n_portfolios:>11}{loop_time:>11.4f}{batched_time:>11.4f}{loop_time / batched_time:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark of figure payload size and build time of the time series figures
+
+Run from the repository root:
+    python -m benchmarks.bench_figures --months 684 6840 --factors 1 10 30 100 --widths 510 1040
+
+Compares the multi performance figure as previously built (one SVG trace per
+series with every monthly point) against the current one (WebGL above the trace
+or point thresholds, downsampled to the plot width). The payload is the figure
+JSON Streamlit sends to the browser; the time covers building the figure and
+serializing it.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from src.visualizations import Visualizer, PLOT_TEMPLATE, e_COLOR_SEQUENCE
+from benchmarks.bench_multifactor import best_time
+
+
+def legacy_multi_performance_plot(factor_data, market_data=None, return_col='ret_vw', title="Portfolio Performance"):
+    """The previous figure: an SVG trace with every point of every series"""
+    fig = go.Figure()
+    if market_data is not None:
+        fig.add_trace(go.Scatter(
+            x=market_data['date'],
+            y=(1 + market_data[return_col]).cumprod(),
+            name="Market Portfolio",
+            line=dict(color='#9B9B9B', dash='dash', width=1),
+            hovertemplate="%{y:.2f}x"
+        ))
+    for i, (factor, df) in enumerate(factor_data.items()):
+        fig.add_trace(go.Scatter(
+            x=df['date'],
+            y=df['cumulative_return'],
+            name=factor,
+            line=dict(color=e_COLOR_SEQUENCE[i % len(e_COLOR_SEQUENCE)], width=1.5),
+            hovertemplate="%{y:.2f}x"
+        ))
+    fig.update_layout(
+        PLOT_TEMPLATE['layout'],
+        title=title,
+        xaxis_title="Date",
+        yaxis_title="Cumulative Return (log scale)",
+        yaxis_type="log",
+        hovermode='x unified',
+        showlegend=True,
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=0.01,
+            bgcolor='rgba(255, 255, 255, 0.9)',
+            bordercolor='#EBEBEB',
+            borderwidth=1,
+            font=dict(family="Arial, sans-serif", size=10, color="#0F2D46")
+        )
+    )
+    return fig
+
+
+def make_performance_data(n_months, n_factors, seed=0):
+    """Create synthetic factor frames with cumulative returns and a market portfolio"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1680-01-01', periods=n_months, freq='MS')
+    market = pd.DataFrame({'date': dates, 'ret_vw': rng.normal(0.008, 0.045, n_months)})
+    factor_data = {}
+    for i in range(n_factors):
+        returns = market['ret_vw'].to_numpy() + rng.normal(0.002, 0.03, n_months)
+        factor_data[f"factor_{i}"] = pd.DataFrame({
+            'date': dates,
+            'ret_vw': returns,
+            'cumulative_return': np.cumprod(1 + returns),
+        })
+    return factor_data, market
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--months', type=int, nargs='+', default=[684, 6840])
+    parser.add_argument('--factors', type=int, nargs='+', default=[1, 10, 30, 100])
+    parser.add_argument('--widths', type=int, nargs='+', default=[510, 1040])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'months':>7}{'factors':>8}{'width':>7}{'trace':>11}{'points':>9}"
+          f"{'legacy KB':>11}{'new KB':>9}{'legacy ms':>11}{'new ms':>9}")
+    for n_months in args.months:
+        for n_factors in args.factors:
+            factor_data, market = make_performance_data(n_months, n_factors)
+            legacy_kb = len(legacy_multi_performance_plot(factor_data, market).to_json()) / 1e3
+            legacy_time = best_time(
+                lambda: legacy_multi_performance_plot(factor_data, market).to_json(), args.repeat
+            )
+            for width in args.widths:
+                fig = Visualizer.create_multi_performance_plot(factor_data, market, width=width)
+                new_kb = len(fig.to_json()) / 1e3
+                n_points = sum(len(trace.y) for trace in fig.data)
+                new_time = best_time(
+                    lambda: Visualizer.create_multi_performance_plot(factor_data, market, width=width).to_json(),
+                    args.repeat
+                )
+                print(f"{n_months:>7}{n_factors:>8}{width:>7}{type(fig.data[0]).__name__:>11}{n_points:>9}"
+                      f"{legacy_kb:>11.1f}{new_kb:>9.1f}{legacy_time * 1e3:>11.1f}{new_time * 1e3:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
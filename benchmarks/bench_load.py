@@ -0,0 +1,80 @@
+"""
+Serial versus parallel cold-load benchmark for DataLoader.read_data_directory
+
+Run from the repository root:
+    python -m benchmarks.bench_load --workers 2 4 8 --repeat 3
+
+Also reports the memory of every dtype profile: the size of the loaded frames
+(data files and derived spreads) and the resident memory before and after the
+load, each profile loaded from the columnar cache in a fresh process.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.data_loader import DataLoader, DTYPE_PROFILES
+
+
+def time_load(base_path, n_workers, executor, repeat):
+    """Get the best wall time of a cold (uncached) load over several runs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        DataLoader.read_data_directory(
+            base_path, use_cache=False, n_workers=n_workers, executor=executor
+        )
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure_memory(base_path, dtype_profile):
+    """Get the load_stats of one load of a data directory"""
+    load_stats = {}
+    DataLoader.read_data_directory(base_path, dtype_profile=dtype_profile, load_stats=load_stats)
+    return load_stats
+
+
+def format_megabytes(n_bytes):
+    return f"{n_bytes / 1e6:.1f}" if n_bytes is not None else "n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--data', default='data', help='Data directory to load')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[2, 4, os.cpu_count() or 1], help='Worker counts to compare')
+    parser.add_argument('--executor', choices=['thread', 'process', 'both'], default='both')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per configuration')
+    args = parser.parse_args()
+
+    executors = ['thread', 'process'] if args.executor == 'both' else [args.executor]
+    serial = time_load(args.data, 1, 'thread', args.repeat)
+    print(f"{'mode':<10}{'workers':>8}{'seconds':>10}{'speedup':>9}")
+    print(f"{'serial':<10}{1:>8}{serial:>10.3f}{1.0:>9.2f}")
+    for executor in executors:
+        for n_workers in sorted(set(args.workers)):
+            if n_workers < 2:
+                continue
+            elapsed = time_load(args.data, n_workers, executor, args.repeat)
+            print(f"{executor:<10}{n_workers:>8}{elapsed:>10.3f}{serial / elapsed:>9.2f}")
+
+    # Fill the cache first, then load every profile in a new (spawned) process so
+    # the resident memory only covers that load
+    DataLoader.read_data_directory(args.data)
+    print()
+    print(f"{'dtype profile':<18}{'frames MB':>10}{'default MB':>11}{'spreads MB':>11}"
+          f"{'RSS before MB':>14}{'RSS after MB':>13}")
+    context = multiprocessing.get_context('spawn')
+    for dtype_profile in DTYPE_PROFILES:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            load_stats = pool.submit(measure_memory, args.data, dtype_profile).result()
+        print(f"{dtype_profile:<18}{format_megabytes(load_stats['frames_bytes']):>10}"
+              f"{format_megabytes(load_stats['default_bytes']):>11}"
+              f"{format_megabytes(load_stats['spread_bytes']):>11}"
+              f"{format_megabytes(load_stats['rss_before']):>14}{format_megabytes(load_stats['rss_after']):>13}")
+
+
+if __name__ == '__main__':
+    main()
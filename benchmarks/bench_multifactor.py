@@ -0,0 +1,92 @@
+"""
+Benchmark of the matrix-based multifactor portfolio against the legacy loop
+
+Run from the repository root:
+    python -m benchmarks.bench_multifactor --months 120 1200 3000 --factors 2 10 50 200
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.portfolio import PortfolioBuilder
+
+
+def legacy_create_multifactor_portfolio(factor_data, weights=None):
+    """The previous set-intersection and per-column re-indexing implementation"""
+    if weights is None:
+        n_factors = len(factor_data)
+        weights = {factor: 1/n_factors for factor in factor_data.keys()}
+
+    all_dates = set.intersection(*[set(df['date']) for df in factor_data.values()])
+    common_dates = sorted(list(all_dates))
+    result = pd.DataFrame({'date': common_dates})
+
+    first_factor = list(factor_data.keys())[0]
+    return_cols = [col for col in factor_data[first_factor].columns if col.startswith('ret_')]
+    for col in return_cols:
+        result[col] = 0.0
+
+    for factor, df in factor_data.items():
+        df_aligned = df[df['date'].isin(common_dates)].copy()
+        df_aligned.set_index('date', inplace=True)
+        weight = weights[factor]
+        for col in return_cols:
+            result.set_index('date', inplace=True)
+            result[col] += df_aligned[col] * weight
+            result.reset_index(inplace=True)
+
+    result.set_index('date', inplace=True)
+    result['cumulative_return'] = (1 + result[return_cols[0]]).cumprod()
+    result.reset_index(inplace=True)
+    return result
+
+
+def make_factor_data(n_months, n_factors, seed=0):
+    """Create synthetic monthly factor frames with slightly staggered start dates"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1700-01-01', periods=n_months, freq='MS')
+    factor_data = {}
+    for i in range(n_factors):
+        offset = i % 12
+        factor_data[f"factor_{i}"] = pd.DataFrame({
+            'date': dates[offset:],
+            'ret_vw': rng.normal(0.01, 0.05, n_months - offset),
+        })
+    return factor_data
+
+
+def best_time(func, repeat):
+    """Get the best wall time of several calls"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--months', type=int, nargs='+', default=[684, 3000])
+    parser.add_argument('--factors', type=int, nargs='+', default=[2, 10, 50, 200])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'months':>8}{'factors':>9}{'legacy s':>11}{'matrix s':>11}{'speedup':>9}")
+    for n_months in args.months:
+        for n_factors in args.factors:
+            factor_data = make_factor_data(n_months, n_factors)
+            legacy = legacy_create_multifactor_portfolio(factor_data)
+            matrix = PortfolioBuilder.create_multifactor_portfolio(factor_data)
+            np.testing.assert_allclose(legacy['ret_vw'], matrix['ret_vw'], rtol=1e-10)
+
+            legacy_time = best_time(lambda: legacy_create_multifactor_portfolio(factor_data), args.repeat)
+            matrix_time = best_time(lambda: PortfolioBuilder.create_multifactor_portfolio(factor_data), args.repeat)
+            print(f"{n_months:>8}{n_factors:>9}{legacy_time:>11.4f}{matrix_time:>11.4f}"
+                  f"{legacy_time / matrix_time:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
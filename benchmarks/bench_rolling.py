@@ -0,0 +1,84 @@
+"""
+Benchmark of the fused rolling kernel against per-series pandas rolling windows
+
+Run from the repository root:
+    python -m benchmarks.bench_rolling --portfolios 1 10 50 200 --windows 12 36 60
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from src.analysis import Analysis
+from benchmarks.bench_multifactor import best_time
+
+RELATIVE_STATS = ['rolling_alpha', 'rolling_beta', 'tracking_error', 'information_ratio']
+
+
+def pandas_rolling(returns, market_returns, window):
+    """Rolling statistics of every column with separate pandas rolling passes"""
+    results = {}
+    for col in returns.columns:
+        df = returns[[col]].rename(columns={col: 'ret_vw'})
+        rolling_stats = Analysis.calculate_rolling_stats(df, 'ret_vw', window)
+        relative = pd.DataFrame(index=df.index)
+        relative['rolling_alpha'] = (
+            df['ret_vw'].rolling(window).mean() - market_returns.rolling(window).mean()
+        ) * 12
+        relative['rolling_beta'] = (
+            df['ret_vw'].rolling(window).cov(market_returns) / market_returns.rolling(window).var()
+        )
+        relative['tracking_error'] = (df['ret_vw'] - market_returns).rolling(window).std() * np.sqrt(12)
+        relative['information_ratio'] = relative['rolling_alpha'] / relative['tracking_error']
+        results[col] = pd.concat([rolling_stats, relative], axis=1)
+    return results
+
+
+def make_returns(n_months, n_portfolios, seed=0):
+    """Create synthetic monthly portfolio and market returns"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1960-01-31', periods=n_months, freq='ME')
+    market = pd.Series(rng.normal(0.008, 0.045, n_months), index=dates)
+    returns = pd.DataFrame(
+        market.to_numpy()[:, None] + rng.normal(0.002, 0.03, (n_months, n_portfolios)),
+        index=dates,
+        columns=[f"portfolio_{i}" for i in range(n_portfolios)]
+    )
+    return returns, market
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--months', type=int, default=684)
+    parser.add_argument('--portfolios', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--windows', type=int, nargs='+', default=[12, 36, 60])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'portfolios':>11}{'windows':>9}{'pandas s':>11}{'fused s':>11}{'speedup':>9}")
+    for n_portfolios in args.portfolios:
+        returns, market = make_returns(args.months, n_portfolios)
+
+        def run_pandas():
+            return [pandas_rolling(returns, market, window) for window in args.windows]
+
+        def run_fused():
+            sums = Analysis.calculate_rolling_prefix_sums(returns, market)
+            return [Analysis.calculate_rolling_from_prefix_sums(sums, window) for window in args.windows]
+
+        # Check the kernel against pandas before timing it
+        for window, reference, fused in zip(args.windows, run_pandas(), run_fused()):
+            for col_idx, col in enumerate(returns.columns):
+                for name in reference[col].columns:
+                    np.testing.assert_allclose(
+                        fused[name][:, col_idx], reference[col][name].to_numpy(), rtol=1e-8, atol=1e-12
+                    )
+
+        pandas_time = best_time(run_pandas, args.repeat)
+        fused_time = best_time(run_fused, args.repeat)
+        print(f"{n_portfolios:>11}{len(args.windows):>9}{pandas_time:>11.4f}{fused_time:>11.4f}"
+              f"{pandas_time / fused_time:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,768 @@
+"""
+Benchmark suite of the loader, analytics and visualization hot paths
+
+Run from the repository root:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --datasets bundled --filter analysis --compare benchmarks/results/baseline.json
+
+Every case runs on the bundled data/ directory and on synthetic data directories
+scaled up from a base of --base-factors factors and --base-months months: one with
+10x the months and one with 10x the factors. Cases are timed asv style (calls per
+sample calibrated to at least MIN_SAMPLE_TIME, best of --repeat samples) and the
+results are written as JSON to benchmarks/results/. --compare reports every case
+that got slower than in an earlier results file and exits with status 1 if any did.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.graph_objects as go
+import streamlit as st
+from streamlit import logger as st_logger
+
+from src.analysis import Analysis
+from src.bootstrap import Bootstrap
+from src.data_loader import DataLoader
+from src.data_processor import DataProcessor
+from src.panel_store import PanelStore
+from src.portfolio import PortfolioBuilder, PortfolioOptimizer
+from src.visualizations import Visualizer
+
+# Version of the results file layout
+RESULTS_VERSION = 1
+
+# Default locations of the generated synthetic data and of the results files
+SYNTHETIC_DIR = os.path.join('benchmarks', '.data')
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+
+# Synthetic datasets as (months, factors) multiples of the base shape
+SYNTHETIC_SCALES = {
+    'months_10x': (10, 1),
+    'factors_10x': (1, 10),
+}
+DATASETS = ['bundled', *SYNTHETIC_SCALES]
+
+# Portfolio grid of the synthetic files, as in the bundled ones
+SYNTHETIC_RANKS_ME = (1, 2, 3)
+SYNTHETIC_FACTOR_RANKS = (1, 2, 3, 4, 5)
+SYNTHETIC_MARKET_RANKS = tuple(range(1, 11))
+SYNTHETIC_GROUP_SIZE = 25  # Factors per synthetic group directory
+SYNTHETIC_START_YEAR = 1680  # 10x the bundled months must fit in the pandas date range
+
+# Shortest timed sample; faster cases are called several times per sample
+MIN_SAMPLE_TIME = 0.05
+MAX_CALLS_PER_SAMPLE = 10000
+
+# Selections the analytics and figure cases work on
+MULTIFACTOR_SIZES = (2, 10, 50)
+CORRELATION_SIZES = (10, 50)
+ANALYSIS_FACTORS = 10
+RANK_ME = 1
+MARKET_RANK = 10
+ROLLING_WINDOW = 36
+ROLLING_WINDOWS = (12, 24, 36, 60, 120)
+DOWNSAMPLE_POINTS = 300  # Below the bundled history, so every dataset is downsampled
+BOOTSTRAP_SIZES = (1000, 10000)  # Resamples of the bootstrap intervals
+
+# Registered cases as (name, target function, setup function, param)
+BENCHMARKS = []
+
+
+def benchmark(name, target, params=(None,)):
+    """
+    Register a benchmark case for each param
+
+    The decorated setup function gets the BenchmarkDataset and the param and returns
+    the callable to time, or None when the dataset is too small for the case.
+    """
+    def register(setup):
+        for param in params:
+            case_name = name if param is None else f"{name}[{param}]"
+            BENCHMARKS.append((case_name, target, setup, param))
+        return setup
+    return register
+
+
+def write_synthetic_directory(path, n_factors, n_months, seed=0):
+    """Write a data directory laid out like the bundled one, with random returns in percent"""
+    last_year = SYNTHETIC_START_YEAR + (n_months - 1) // 12
+    if last_year >= pd.Timestamp.max.year:
+        raise ValueError(f"{n_months} months from {SYNTHETIC_START_YEAR} exceed the pandas date range")
+
+    rng = np.random.default_rng(seed)
+    period = np.arange(n_months)
+    years = SYNTHETIC_START_YEAR + period // 12
+    months = period % 12 + 1
+    market = rng.normal(0.8, 4.5, n_months)
+
+    def portfolio_frame(rank_grid, rank_columns):
+        """Monthly rows of every rank combination, sorted by year, month and ranks"""
+        n_grid = len(rank_grid)
+        frame = pd.DataFrame({'year': np.repeat(years, n_grid), 'month': np.repeat(months, n_grid)})
+        for col, values in zip(rank_columns, np.transpose(rank_grid)):
+            frame[col] = np.tile(values, n_months)
+        frame['nstocks'] = rng.integers(20, 500, n_months * n_grid)
+        returns = market[:, None] + rng.normal(0.2, 3.0, (n_months, n_grid))
+        frame['ret_vw'] = returns.ravel().round(4)
+        return frame
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path)
+    market_grid = [(rank_me,) for rank_me in SYNTHETIC_MARKET_RANKS]
+    portfolio_frame(market_grid, ['rank_ME']).to_csv(
+        os.path.join(tmp_path, 'portf_me_monthly_2023.csv'), index=False
+    )
+    factor_grid = [(rank_me, rank) for rank_me in SYNTHETIC_RANKS_ME for rank in SYNTHETIC_FACTOR_RANKS]
+    for i in range(n_factors):
+        group = f"synthetic_{i // SYNTHETIC_GROUP_SIZE:02d}_monthly_2023"
+        factor = f"syn{i:04d}"
+        group_dir = os.path.join(tmp_path, group, group)
+        os.makedirs(group_dir, exist_ok=True)
+        portfolio_frame(factor_grid, ['rank_ME', f"rank_{factor}"]).to_csv(
+            os.path.join(group_dir, f"portf_me_{factor}_monthly_2023.csv"), index=False
+        )
+    os.replace(tmp_path, path)
+
+
+def get_synthetic_directory(name, base_factors, base_months, root=SYNTHETIC_DIR):
+    """Get the path of a synthetic dataset, writing it on first use"""
+    months_scale, factors_scale = SYNTHETIC_SCALES[name]
+    n_factors, n_months = base_factors * factors_scale, base_months * months_scale
+    path = os.path.join(root, f"{name}-{n_factors}f-{n_months}m")
+    if not os.path.isdir(path):
+        print(f"Writing synthetic dataset {name} ({n_factors} factors, {n_months} months) to {path}")
+        os.makedirs(root, exist_ok=True)
+        write_synthetic_directory(path, n_factors, n_months)
+    return path
+
+
+class BenchmarkDataset:
+    """Lazily prepared inputs of the benchmark cases on one data directory"""
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self._selections = {}
+
+    @cached_property
+    def data(self):
+        return DataLoader.load_data_directory(self.path)
+
+    @cached_property
+    def panel(self):
+        return PanelStore.from_data_dict(self.data)
+
+    @cached_property
+    def manifest(self):
+        return DataLoader.get_manifest(self.path)
+
+    @cached_property
+    def factors(self):
+        """(group, factor, ranks) selections of every factor, at its lowest rank"""
+        return [
+            (group, factor, {col: entry['rank_values'][col][0] for col in entry['rank_columns']})
+            for group, factors in self.manifest.items()
+            for factor, entry in factors.items()
+            if RANK_ME in entry['market_caps']
+        ]
+
+    def describe(self):
+        """Shape of the dataset, stored with the results to keep comparisons like for like"""
+        entries = [entry for factors in self.manifest.values() for entry in factors.values()]
+        return {
+            'path': self.path,
+            'n_factors': len(entries),
+            'n_rows': sum(entry['n_rows'] for entry in entries),
+            'start_date': min(entry['start_date'] for entry in entries).strftime('%Y-%m'),
+            'end_date': max(entry['end_date'] for entry in entries).strftime('%Y-%m'),
+        }
+
+    def selection(self, n_factors):
+        """Output of DataLoader.load_selection for the first n_factors factors, or None"""
+        if n_factors > len(self.factors):
+            return None
+        if n_factors not in self._selections:
+            self._selections[n_factors] = DataLoader.load_selection(
+                self.data, self.factors[:n_factors], RANK_ME, 'ret_vw', MARKET_RANK
+            )
+        return self._selections[n_factors]
+
+    @cached_property
+    def market(self):
+        """Date-indexed market portfolio over the analysis selection"""
+        _, market_data, _, _ = self.selection(ANALYSIS_FACTORS)
+        return DataProcessor.get_date_indexed(market_data)
+
+    @cached_property
+    def portfolios(self):
+        """Analysis selection plus its equal weighted multifactor portfolio, as in the app"""
+        filtered_data, _, _, _ = self.selection(ANALYSIS_FACTORS)
+        portfolios = dict(filtered_data)
+        portfolios["Multifactor Portfolio"] = PortfolioBuilder.create_multifactor_portfolio(filtered_data)
+        return portfolios
+
+    @cached_property
+    def portfolio(self):
+        """Date-indexed multifactor portfolio analysed by the single-portfolio cases"""
+        return self.portfolios["Multifactor Portfolio"].set_index('date')
+
+    @cached_property
+    def return_matrix(self):
+        """Date x portfolio return matrix of up to the largest multifactor selection"""
+        filtered_data, _, _, _ = self.selection(min(max(MULTIFACTOR_SIZES), len(self.factors)))
+        return DataProcessor.build_return_matrix(filtered_data)
+
+    @cached_property
+    def matrix_market_returns(self):
+        return self.market['ret_vw'].reindex(self.return_matrix.index).to_numpy()
+
+    @cached_property
+    def rolling_windows(self):
+        return Analysis.calculate_rolling_windows(self.portfolio, 'ret_vw', self.market, ROLLING_WINDOWS)
+
+
+def has_analysis_selection(dataset):
+    return len(dataset.factors) >= ANALYSIS_FACTORS
+
+
+# Loader
+
+@benchmark('loader.load_data_directory.cold_csv', 'DataLoader.load_data_directory')
+def bench_load_cold_csv(dataset, param):
+    def run():
+        DataLoader.load_data_directory.clear()
+        DataLoader.load_data_directory(dataset.path, use_cache=False)
+    return run
+
+
+@benchmark('loader.load_data_directory.cold_cache', 'DataLoader.load_data_directory')
+def bench_load_cold_cache(dataset, param):
+    # Make sure the columnar cache is complete so only cache reads are timed
+    DataLoader.read_data_directory(dataset.path)
+
+    def run():
+        DataLoader.load_data_directory.clear()
+        DataLoader.load_data_directory(dataset.path)
+    return run
+
+
+@benchmark('loader.load_data_directory.warm', 'DataLoader.load_data_directory')
+def bench_load_warm(dataset, param):
+    DataLoader.load_data_directory(dataset.path)
+    return lambda: DataLoader.load_data_directory(dataset.path)
+
+
+@benchmark('loader.get_factor_data', 'DataLoader.get_factor_data', params=('eager', 'panel'))
+def bench_get_factor_data(dataset, param):
+    data_dict = dataset.data if param == 'eager' else dataset.panel
+    group, factor, ranks = dataset.factors[0]
+    return lambda: DataLoader.get_factor_data(data_dict, group, [factor], RANK_ME, {factor: ranks})
+
+
+@benchmark('loader.load_selection', 'DataLoader.load_selection', params=(ANALYSIS_FACTORS,))
+def bench_load_selection(dataset, param):
+    if param > len(dataset.factors):
+        return None
+    factors = dataset.factors[:param]
+    data_dict = dataset.data
+    return lambda: DataLoader.load_selection(data_dict, factors, RANK_ME, 'ret_vw', MARKET_RANK)
+
+
+# Portfolio construction and correlations
+
+@benchmark('portfolio.create_multifactor_portfolio', 'PortfolioBuilder.create_multifactor_portfolio',
+           params=MULTIFACTOR_SIZES)
+def bench_multifactor(dataset, param):
+    selection = dataset.selection(param)
+    if selection is None:
+        return None
+    filtered_data = selection[0]
+    return lambda: PortfolioBuilder.create_multifactor_portfolio(filtered_data)
+
+
+@benchmark('processor.calculate_multi_correlation_matrix', 'DataProcessor.calculate_multi_correlation_matrix',
+           params=CORRELATION_SIZES)
+def bench_multi_correlation(dataset, param):
+    selection = dataset.selection(param)
+    if selection is None:
+        return None
+    filtered_data, market_data, _, _ = selection
+    indexed = {name: DataProcessor.get_date_indexed(df) for name, df in filtered_data.items()}
+    market = DataProcessor.get_date_indexed(market_data)
+    return lambda: DataProcessor.calculate_multi_correlation_matrix(indexed, market)
+
+
+@benchmark('processor.calculate_excess_correlation_matrix', 'DataProcessor.calculate_excess_correlation_matrix',
+           params=CORRELATION_SIZES)
+def bench_excess_correlation(dataset, param):
+    selection = dataset.selection(param)
+    if selection is None:
+        return None
+    filtered_data, market_data, _, _ = selection
+    returns = DataProcessor.build_return_matrix(filtered_data)
+    market_returns = DataProcessor.get_date_indexed(market_data)['ret_vw']
+    return lambda: DataProcessor.calculate_excess_correlation_matrix(returns, market_returns)
+
+
+# Analysis
+
+@benchmark('analysis.calculate_rolling_prefix_sums', 'Analysis.calculate_rolling_prefix_sums')
+def bench_prefix_sums(dataset, param):
+    returns = dataset.return_matrix.to_numpy()
+    market_returns = dataset.matrix_market_returns
+    return lambda: Analysis.calculate_rolling_prefix_sums(returns, market_returns)
+
+
+@benchmark('analysis.calculate_rolling_from_prefix_sums', 'Analysis.calculate_rolling_from_prefix_sums')
+def bench_from_prefix_sums(dataset, param):
+    sums = Analysis.calculate_rolling_prefix_sums(dataset.return_matrix.to_numpy(), dataset.matrix_market_returns)
+    return lambda: Analysis.calculate_rolling_from_prefix_sums(sums, ROLLING_WINDOW)
+
+
+@benchmark('analysis.calculate_rolling_moments', 'Analysis.calculate_rolling_moments')
+def bench_rolling_moments(dataset, param):
+    returns = dataset.return_matrix
+    market_returns = dataset.matrix_market_returns
+    return lambda: Analysis.calculate_rolling_moments(returns, market_returns, ROLLING_WINDOW)
+
+
+@benchmark('analysis.calculate_rolling_windows', 'Analysis.calculate_rolling_windows')
+def bench_rolling_windows(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    portfolio, market = dataset.portfolio, dataset.market
+    return lambda: Analysis.calculate_rolling_windows(portfolio, 'ret_vw', market, ROLLING_WINDOWS)
+
+
+@benchmark('analysis.calculate_rolling_stats', 'Analysis.calculate_rolling_stats')
+def bench_rolling_stats(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    portfolio = dataset.portfolio
+    return lambda: Analysis.calculate_rolling_stats(portfolio, 'ret_vw', ROLLING_WINDOW)
+
+
+@benchmark('analysis.calculate_drawdown', 'Analysis.calculate_drawdown')
+def bench_drawdown(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    portfolio = dataset.portfolio
+    return lambda: Analysis.calculate_drawdown(portfolio)
+
+
+@benchmark('analysis.calculate_drawdown_matrix', 'Analysis.calculate_drawdown_matrix')
+def bench_drawdown_matrix(dataset, param):
+    returns = dataset.return_matrix
+    return lambda: Analysis.calculate_drawdown_matrix(returns)
+
+
+@benchmark('analysis.find_drawdown_episodes', 'Analysis.find_drawdown_episodes')
+def bench_find_drawdown_episodes(dataset, param):
+    values = Analysis.calculate_drawdown_matrix(dataset.return_matrix).to_numpy()
+    return lambda: Analysis.find_drawdown_episodes(values)
+
+
+@benchmark('analysis.episode_frame', 'Analysis.episode_frame')
+def bench_episode_frame(dataset, param):
+    drawdown = Analysis.calculate_drawdown_matrix(dataset.return_matrix)
+    episodes = Analysis.find_drawdown_episodes(drawdown.to_numpy())
+    return lambda: Analysis.episode_frame(episodes, drawdown.index, drawdown.columns)
+
+
+@benchmark('analysis.calculate_drawdown_episodes', 'Analysis.calculate_drawdown_episodes')
+def bench_drawdown_episodes(dataset, param):
+    drawdown = Analysis.calculate_drawdown_matrix(dataset.return_matrix)
+    return lambda: Analysis.calculate_drawdown_episodes(drawdown)
+
+
+@benchmark('analysis.analyze_drawdowns', 'Analysis.analyze_drawdowns')
+def bench_analyze_drawdowns(dataset, param):
+    returns = dataset.return_matrix
+    return lambda: Analysis.analyze_drawdowns(returns)
+
+
+@benchmark('analysis.factor_quantile_analysis', 'Analysis.factor_quantile_analysis')
+def bench_quantile_analysis(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    portfolio = dataset.portfolio
+    return lambda: Analysis.factor_quantile_analysis(portfolio)
+
+
+@benchmark('analysis.calculate_relative_performance', 'Analysis.calculate_relative_performance')
+def bench_relative_performance(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    portfolio, market = dataset.portfolio, dataset.market
+    return lambda: Analysis.calculate_relative_performance(portfolio, 'ret_vw', market, ROLLING_WINDOW)
+
+
+@benchmark('analysis.calculate_market_relative_statistics', 'Analysis.calculate_market_relative_statistics')
+def bench_market_relative_statistics(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    portfolio, market = dataset.portfolio, dataset.market
+    return lambda: Analysis.calculate_market_relative_statistics(portfolio, 'ret_vw', market)
+
+
+@benchmark('analysis.calculate_bootstrap_statistics', 'Bootstrap.calculate_bootstrap_statistics',
+           params=BOOTSTRAP_SIZES)
+def bench_bootstrap_statistics(dataset, param):
+    returns = dataset.return_matrix
+    market_returns = dataset.market['ret_vw']
+    return lambda: Bootstrap.calculate_bootstrap_statistics(returns, market_returns, param, n_workers=1)
+
+
+# Figures, built from the same inputs as in the app
+
+@benchmark('figures.create_time_series', 'Visualizer.create_time_series')
+def bench_time_series_figure(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    wide = DataProcessor.build_return_matrix(dataset.portfolios, 'cumulative_return').reset_index()
+    factors = list(dataset.portfolios)
+    return lambda: Visualizer.create_time_series(wide, factors)
+
+
+@benchmark('figures.create_heatmap', 'Visualizer.create_heatmap', params=CORRELATION_SIZES)
+def bench_heatmap_figure(dataset, param):
+    selection = dataset.selection(param)
+    if selection is None:
+        return None
+    filtered_data, market_data, _, _ = selection
+    corr_matrix = DataProcessor.calculate_excess_correlation_matrix(
+        DataProcessor.build_return_matrix(filtered_data),
+        DataProcessor.get_date_indexed(market_data)['ret_vw']
+    )
+    return lambda: Visualizer.create_heatmap(corr_matrix)
+
+
+@benchmark('figures.create_rolling_stats_plot', 'Visualizer.create_rolling_stats_plot')
+def bench_rolling_stats_figure(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    portfolio, rolling_stats = dataset.portfolio, dataset.rolling_windows[ROLLING_WINDOW]
+    return lambda: Visualizer.create_rolling_stats_plot(portfolio, rolling_stats)
+
+
+@benchmark('figures.create_drawdown_plot', 'Visualizer.create_drawdown_plot')
+def bench_drawdown_figure(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    portfolio = dataset.portfolio
+    drawdown = Analysis.calculate_drawdown(portfolio)
+    return lambda: Visualizer.create_drawdown_plot(portfolio, drawdown)
+
+
+@benchmark('figures.create_relative_performance_plot', 'Visualizer.create_relative_performance_plot')
+def bench_relative_performance_figure(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    portfolio, market = dataset.portfolio, dataset.market
+    relative_stats = dataset.rolling_windows[ROLLING_WINDOW]
+    return lambda: Visualizer.create_relative_performance_plot(portfolio, relative_stats, market)
+
+
+@benchmark('figures.create_tracking_error_plot', 'Visualizer.create_tracking_error_plot')
+def bench_tracking_error_figure(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    portfolio, relative_stats = dataset.portfolio, dataset.rolling_windows[ROLLING_WINDOW]
+    return lambda: Visualizer.create_tracking_error_plot(portfolio, relative_stats)
+
+
+@benchmark('figures.create_performance_plot', 'Visualizer.create_performance_plot')
+def bench_performance_figure(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    multifactor = dataset.portfolios["Multifactor Portfolio"]
+    return lambda: Visualizer.create_performance_plot(multifactor)
+
+
+@benchmark('figures.create_multi_performance_plot', 'Visualizer.create_multi_performance_plot')
+def bench_multi_performance_figure(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    portfolios = dataset.portfolios
+    _, market_data, _, _ = dataset.selection(ANALYSIS_FACTORS)
+    return lambda: Visualizer.create_multi_performance_plot(portfolios, market_data)
+
+
+@benchmark('figures.create_excess_return_plot', 'Visualizer.create_excess_return_plot')
+def bench_excess_return_figure(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    indexed = {name: DataProcessor.get_date_indexed(df) for name, df in dataset.portfolios.items()}
+    market = dataset.market
+    return lambda: Visualizer.create_excess_return_plot(indexed, market)
+
+
+@benchmark('figures.create_frontier_plot', 'Visualizer.create_frontier_plot')
+def bench_frontier_figure(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    filtered_data, market_data, _, _ = dataset.selection(ANALYSIS_FACTORS)
+    returns, dates = PortfolioBuilder.align_returns(filtered_data)
+    market_matrix, _ = PortfolioBuilder.align_returns({'market': market_data}, 'ret_vw', dates)
+    moments = PortfolioOptimizer.estimate_moments(returns, market_matrix[:, 0])
+    candidates = PortfolioOptimizer.evaluate_weights(
+        PortfolioOptimizer.sample_weights(len(filtered_data), 5000), moments
+    )
+    frontier = PortfolioOptimizer.calculate_efficient_frontier(moments)
+    factor_points = PortfolioOptimizer.evaluate_weights(np.eye(len(filtered_data)), moments)
+    factor_points.index = list(filtered_data.keys())
+    weight_vector = PortfolioBuilder.get_weight_vector(filtered_data.keys())
+    selected_point = PortfolioOptimizer.evaluate_weights(weight_vector, moments).iloc[0]
+    return lambda: Visualizer.create_frontier_plot(candidates, frontier, factor_points, selected_point)
+
+
+@benchmark('figures.create_rolling_heatmap', 'Visualizer.create_rolling_heatmap')
+def bench_rolling_heatmap_figure(dataset, param):
+    if not has_analysis_selection(dataset):
+        return None
+    rolling_windows = dataset.rolling_windows
+    sharpe_matrix = pd.DataFrame(
+        {window: rolling_windows[window]['rolling_sharpe'] for window in ROLLING_WINDOWS}
+    ).T
+    return lambda: Visualizer.create_rolling_heatmap(sharpe_matrix, colorbar_title="Sharpe")
+
+
+@benchmark('figures.lttb_indices', 'Visualizer.lttb_indices')
+def bench_lttb_indices(dataset, param):
+    values = (1 + dataset.return_matrix.fillna(0)).cumprod().to_numpy()
+    return lambda: Visualizer.lttb_indices(values, DOWNSAMPLE_POINTS)
+
+
+@benchmark('figures.minmax_indices', 'Visualizer.minmax_indices')
+def bench_minmax_indices(dataset, param):
+    values = (1 + dataset.return_matrix.fillna(0)).cumprod().to_numpy()
+    return lambda: Visualizer.minmax_indices(values, DOWNSAMPLE_POINTS)
+
+
+def cumulative_return_traces(dataset):
+    """Scatter keyword dicts of the cumulative returns of the return matrix columns"""
+    matrix = dataset.return_matrix
+    dates = pd.Series(matrix.index)
+    return [
+        dict(x=dates, y=(1 + matrix[column].fillna(0)).cumprod().to_numpy(), name=str(column))
+        for column in matrix.columns
+    ]
+
+
+@benchmark('figures.downsample_traces', 'Visualizer.downsample_traces', params=('lttb', 'minmax'))
+def bench_downsample_traces(dataset, param):
+    traces = cumulative_return_traces(dataset)
+    return lambda: Visualizer.downsample_traces(traces, DOWNSAMPLE_POINTS, param)
+
+
+@benchmark('figures.compact_dates', 'Visualizer.compact_dates')
+def bench_compact_dates(dataset, param):
+    dates = pd.Series(dataset.return_matrix.index)
+    return lambda: Visualizer.compact_dates(dates)
+
+
+@benchmark('figures.add_time_series', 'Visualizer.add_time_series')
+def bench_add_time_series(dataset, param):
+    traces = cumulative_return_traces(dataset)
+    return lambda: Visualizer.add_time_series(go.Figure(), traces)
+
+
+def find_uncovered_functions():
+    """Get the Analysis and Visualizer functions that no benchmark case times"""
+    targets = {target for _, target, _, _ in BENCHMARKS}
+    return [
+        f"{cls.__name__}.{name}"
+        for cls in (Analysis, Visualizer)
+        for name in vars(cls)
+        if not name.startswith('_') and f"{cls.__name__}.{name}" not in targets
+    ]
+
+
+def time_case(func, repeat):
+    """
+    Time a callable asv style
+
+    A first call calibrates how many calls make up one sample of at least
+    MIN_SAMPLE_TIME; then repeat samples are taken with garbage collection
+    disabled. Times are per call, in seconds.
+    """
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+    number = min(MAX_CALLS_PER_SAMPLE, max(1, math.ceil(MIN_SAMPLE_TIME / max(first, 1e-9))))
+
+    samples = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {
+        'min': min(samples),
+        'median': float(np.median(samples)),
+        'max': max(samples),
+        'number': number,
+        'repeat': repeat,
+        'samples': samples,
+    }
+
+
+def run_suite(datasets, pattern=None, repeat=5):
+    """Time every registered case matching pattern on each dataset"""
+    results = {}
+    print(f"{'dataset':<13}{'case':<58}{'min ms':>11}{'median ms':>11}{'calls':>7}")
+    for dataset in datasets:
+        results[dataset.name] = {}
+        for case_name, _, setup, param in BENCHMARKS:
+            if pattern is not None and not re.search(pattern, case_name):
+                continue
+            func = setup(dataset, param)
+            if func is None:
+                print(f"{dataset.name:<13}{case_name:<58}{'skipped':>11}")
+                continue
+            timing = time_case(func, repeat)
+            results[dataset.name][case_name] = timing
+            print(f"{dataset.name:<13}{case_name:<58}{timing['min'] * 1e3:>11.3f}"
+                  f"{timing['median'] * 1e3:>11.3f}{timing['number']:>7}")
+    return results
+
+
+def get_git_revision():
+    """Get the current commit and whether tracked files have uncommitted changes"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def get_environment():
+    """Describe the machine and library versions the suite ran on"""
+    commit, dirty = get_git_revision()
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plotly': plotly.__version__,
+        'streamlit': st.__version__,
+    }
+
+
+def compare_results(baseline, current, threshold=1.25, stat='min'):
+    """
+    Compare two results files case by case
+
+    Returns rows of (dataset, case, baseline, current, ratio, flag) for the cases
+    both files timed, flagged 'slower' or 'faster' when the ratio of the stat
+    crosses threshold. Datasets whose shape changed are not compared.
+    """
+    rows = []
+    for dataset, cases in current['results'].items():
+        if baseline.get('datasets', {}).get(dataset) != current['datasets'].get(dataset):
+            print(f"Dataset {dataset} differs from the baseline; not compared")
+            continue
+        baseline_cases = baseline['results'].get(dataset, {})
+        for case_name, timing in cases.items():
+            if case_name not in baseline_cases:
+                continue
+            old, new = baseline_cases[case_name][stat], timing[stat]
+            ratio = new / old if old > 0 else math.inf
+            flag = 'slower' if ratio > threshold else 'faster' if ratio < 1 / threshold else ''
+            rows.append((dataset, case_name, old, new, ratio, flag))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--datasets', nargs='+', choices=DATASETS, default=DATASETS)
+    parser.add_argument('--filter', help="Only run cases whose name matches this regular expression")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--data', default='data', help="Bundled data directory")
+    parser.add_argument('--base-factors', type=int, default=50)
+    parser.add_argument('--base-months', type=int, default=684)
+    parser.add_argument('--synthetic-dir', default=SYNTHETIC_DIR)
+    parser.add_argument('--output', help="Results file, defaults to benchmarks/results/<time>-<commit>.json")
+    parser.add_argument('--compare', help="Earlier results file to check for regressions")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="Slowdown ratio of the best time reported as a regression")
+    args = parser.parse_args()
+
+    # Cached loaders are called outside a Streamlit runtime here
+    st_logger.set_log_level('error')
+
+    uncovered = find_uncovered_functions()
+    if uncovered:
+        print(f"No benchmark case for: {', '.join(uncovered)}")
+
+    datasets = []
+    for name in args.datasets:
+        if name == 'bundled':
+            path = args.data
+        else:
+            path = get_synthetic_directory(name, args.base_factors, args.base_months, args.synthetic_dir)
+        datasets.append(BenchmarkDataset(name, path))
+
+    started = datetime.now(timezone.utc)
+    results = run_suite(datasets, args.filter, args.repeat)
+    report = {
+        'version': RESULTS_VERSION,
+        'created': started.isoformat(timespec='seconds'),
+        'environment': get_environment(),
+        'datasets': {dataset.name: dataset.describe() for dataset in datasets},
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+    output = args.output
+    if output is None:
+        commit = report['environment']['commit']
+        output = os.path.join(
+            RESULTS_DIR, f"{started:%Y%m%d-%H%M%S}-{commit[:8] if commit else 'nogit'}.json"
+        )
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, report, args.threshold)
+        print(f"\n{'dataset':<13}{'case':<58}{'before ms':>11}{'after ms':>11}{'ratio':>8}")
+        for dataset, case_name, old, new, ratio, flag in rows:
+            print(f"{dataset:<13}{case_name:<58}{old * 1e3:>11.3f}{new * 1e3:>11.3f}{ratio:>8.2f}  {flag}")
+        regressions = [row for row in rows if row[5] == 'slower']
+        print(f"{len(regressions)} of {len(rows)} cases slower than {args.compare} "
+              f"by more than {args.threshold:.2f}x")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
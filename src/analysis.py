@@ -3,18 +3,173 @@ import numpy as np
 from scipy import stats
 
 class Analysis:
+    @staticmethod
+    def calculate_rolling_prefix_sums(returns, market_returns=None):
+        """
+        Calculate the prefix sums behind every rolling statistic of many series
+
+        Parameters:
+        - returns: (n_dates, n_series) return array, or a single series
+        - market_returns: Optional (n_dates,) market returns aligned with returns
+
+        Series are centered on their full-sample mean before summing so that the
+        window variances do not lose precision to cancellation. Missing returns
+        are tracked in count sums; a window containing one yields NaN, as with
+        pandas rolling windows.
+        """
+        def prefix(values):
+            sums = np.zeros((values.shape[0] + 1,) + values.shape[1:])
+            np.cumsum(values, axis=0, out=sums[1:])
+            return sums
+
+        x = np.asarray(returns, dtype=float)
+        if x.ndim == 1:
+            x = x[:, None]
+        valid_x = ~np.isnan(x)
+        with np.errstate(invalid='ignore'):
+            center_x = np.nanmean(np.where(valid_x.any(axis=0), x, 0.0), axis=0)
+        x0 = np.where(valid_x, x - center_x, 0.0)
+        sums = {
+            'center_x': center_x,
+            'n_x': prefix(valid_x.astype(float)),
+            'x': prefix(x0),
+            'xx': prefix(x0 * x0),
+        }
+
+        if market_returns is not None:
+            m = np.asarray(market_returns, dtype=float).reshape(-1, 1)
+            valid_m = ~np.isnan(m)
+            center_m = np.nanmean(m) if valid_m.any() else 0.0
+            m0 = np.where(valid_m, m - center_m, 0.0)
+            # Paired sums only use months where both the series and the market have a return
+            valid_xm = valid_x & valid_m
+            x1 = np.where(valid_xm, x0, 0.0)
+            m1 = np.where(valid_xm, m0, 0.0)
+            diff = x1 - m1
+            sums.update({
+                'center_m': center_m,
+                'n_m': prefix(valid_m.astype(float)),
+                'm': prefix(m0),
+                'mm': prefix(m0 * m0),
+                'n_xm': prefix(valid_xm.astype(float)),
+                'x1': prefix(x1),
+                'm1': prefix(m1),
+                'xm': prefix(x1 * m1),
+                'd': prefix(diff),
+                'dd': prefix(diff * diff),
+            })
+        return sums
+
+    @staticmethod
+    def calculate_rolling_from_prefix_sums(sums, window=12, annual_factor=12):
+        """
+        Calculate annualized rolling statistics for one window from prefix sums
+
+        Returns a dict of (n_dates, n_series) arrays: rolling_mean, rolling_std and
+        rolling_sharpe, plus rolling_alpha, rolling_beta, tracking_error and
+        information_ratio when market sums are present.
+        """
+        def window_sum(key):
+            prefix = sums[key]
+            out = np.full((prefix.shape[0] - 1,) + prefix.shape[1:], np.nan)
+            if window <= out.shape[0]:
+                out[window - 1:] = prefix[window:] - prefix[:-window]
+            return out
+
+        def window_moments(key, square_key, count_key):
+            total = window_sum(key)
+            count = window_sum(count_key)
+            full = np.isclose(count, window)
+            mean = np.where(full, total / window, np.nan)
+            var = (window_sum(square_key) - total * total / window) / (window - 1)
+            var = np.where(full, np.maximum(var, 0.0), np.nan)
+            return mean, var
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_x, var_x = window_moments('x', 'xx', 'n_x')
+            mean_x = mean_x + sums['center_x']
+            stats = {
+                'rolling_mean': mean_x * annual_factor,
+                'rolling_std': np.sqrt(var_x) * np.sqrt(annual_factor),
+            }
+            stats['rolling_sharpe'] = stats['rolling_mean'] / stats['rolling_std']
+
+            if 'm' in sums:
+                mean_m, var_m = window_moments('m', 'mm', 'n_m')
+                mean_m = mean_m + sums['center_m']
+                n_xm = window_sum('n_xm')
+                paired = np.isclose(n_xm, window)
+                cov_xm = (window_sum('xm') - window_sum('x1') * window_sum('m1') / window) / (window - 1)
+                cov_xm = np.where(paired, cov_xm, np.nan)
+                _, var_d = window_moments('d', 'dd', 'n_xm')
+
+                stats['rolling_alpha'] = (mean_x - mean_m) * annual_factor
+                stats['rolling_beta'] = cov_xm / var_m
+                stats['tracking_error'] = np.sqrt(var_d) * np.sqrt(annual_factor)
+                stats['information_ratio'] = stats['rolling_alpha'] / stats['tracking_error']
+        return stats
+
+    @staticmethod
+    def calculate_rolling_moments(returns, market_returns=None, window=12, annual_factor=12):
+        """
+        Calculate rolling mean, std, Sharpe ratio and market-relative statistics of
+        many return series in one O(n) pass over shared prefix sums
+
+        Parameters:
+        - returns: Date x portfolio DataFrame, or a (n_dates, n_series) array
+        - market_returns: Optional market returns aligned with returns
+        - window: Rolling window length in periods
+        - annual_factor: Periods per year used for annualization
+
+        Returns a dict of statistic name to rolling values, as DataFrames shaped
+        like returns when a DataFrame is given.
+        """
+        sums = Analysis.calculate_rolling_prefix_sums(returns, market_returns)
+        stats = Analysis.calculate_rolling_from_prefix_sums(sums, window, annual_factor)
+        if isinstance(returns, pd.DataFrame):
+            stats = {
+                name: pd.DataFrame(values, index=returns.index, columns=returns.columns)
+                for name, values in stats.items()
+            }
+        return stats
+
+    @staticmethod
+    def calculate_rolling_windows(df, return_col='ret_vw', market_data=None, windows=(12, 24, 36, 60, 120)):
+        """
+        Calculate rolling statistics of a portfolio for several window lengths at once
+
+        The prefix sums are built once and shared by every window. Returns a dict
+        of window to a frame with the columns of calculate_rolling_stats and, with
+        market data aligned on the portfolio dates, those of
+        calculate_relative_performance.
+        """
+        returns = df[return_col]
+        market_returns = None
+        if market_data is not None and return_col in market_data.columns:
+            market_returns = market_data[return_col].reindex(df.index)
+        sums = Analysis.calculate_rolling_prefix_sums(
+            returns.to_numpy(),
+            None if market_returns is None else market_returns.to_numpy()
+        )
+
+        rolling_windows = {}
+        for window in windows:
+            stats = Analysis.calculate_rolling_from_prefix_sums(sums, window)
+            frame = pd.DataFrame({name: values[:, 0] for name, values in stats.items()}, index=df.index)
+            frame['portfolio_value'] = (1 + returns).cumprod()
+            if market_returns is not None:
+                frame['market_value'] = (1 + market_returns).cumprod()
+            rolling_windows[window] = frame
+        return rolling_windows
+
     @staticmethod
     def calculate_rolling_stats(df, return_col='ret_vw', window=12):
         """Calculate rolling statistics for returns"""
-        rolling_stats = pd.DataFrame()
-        
-        # Calculate rolling statistics
-        rolling_stats['rolling_mean'] = df[return_col].rolling(window).mean() * 12  # Annualize
-        rolling_stats['rolling_std'] = df[return_col].rolling(window).std() * np.sqrt(12)
-        rolling_stats['rolling_sharpe'] = (
-            rolling_stats['rolling_mean'] / 
-            rolling_stats['rolling_std']
-        )
+        moments = Analysis.calculate_rolling_moments(df[return_col].to_numpy(), window=window)
+        rolling_stats = pd.DataFrame({
+            name: moments[name][:, 0]
+            for name in ['rolling_mean', 'rolling_std', 'rolling_sharpe']
+        }, index=df.index)
         return rolling_stats
     
     @staticmethod
@@ -25,11 +180,170 @@ class Analysis:
         drawdown = (values - rolling_max) / rolling_max
         return drawdown
     
+    @staticmethod
+    def calculate_drawdown_matrix(returns):
+        """
+        Calculate drawdown series of every column of a date x portfolio return matrix
+
+        Missing returns count as flat months; months before a portfolio's first
+        return are NaN. For a series without missing returns this matches
+        calculate_drawdown.
+        """
+        values = returns.to_numpy(dtype=float) if isinstance(returns, pd.DataFrame) else np.asarray(returns, dtype=float)
+        started = np.logical_or.accumulate(~np.isnan(values), axis=0)
+        wealth = np.cumprod(1 + np.nan_to_num(values, nan=0.0), axis=0)
+        wealth = np.where(started, wealth, np.nan)
+        peaks = np.fmax.accumulate(wealth, axis=0)
+        drawdown = (wealth - peaks) / peaks
+        if isinstance(returns, pd.DataFrame):
+            return pd.DataFrame(drawdown, index=returns.index, columns=returns.columns)
+        return drawdown
+
+    @staticmethod
+    def find_drawdown_episodes(values, top_n=5):
+        """
+        Find the deepest drawdown episodes of every column of a drawdown array
+
+        An episode runs from the last peak before the portfolio goes under water
+        to the first month back at that peak (recovery). Episodes of all columns
+        are found in one pass over the flattened array.
+
+        Parameters:
+        - values: Dates x portfolios drawdown array (see calculate_drawdown_matrix)
+        - top_n: Number of episodes kept per portfolio, deepest first; None keeps all
+
+        Returns a dict of arrays with one entry per episode, sorted by column and
+        rank: 'column' position, 'rank', 'peak', 'trough' and 'recovery' row
+        positions (-1 if not recovered), 'depth', 'duration' (months, peak to
+        recovery or to the last month) and 'time_to_recovery' (months, trough to
+        recovery, NaN if not recovered).
+        """
+        n_dates, n_columns = values.shape
+        underwater = values < 0
+
+        # Flatten column by column so that every episode is one contiguous run
+        previous = np.zeros_like(underwater)
+        previous[1:] = underwater[:-1]
+        following = np.zeros_like(underwater)
+        following[:-1] = underwater[1:]
+        flat_values = values.T.ravel()
+        flat_underwater = underwater.T.ravel()
+        flat_starts = (underwater & ~previous).T.ravel()
+        starts = np.flatnonzero(flat_starts)
+        ends = np.flatnonzero((underwater & ~following).T.ravel())
+
+        columns = starts // n_dates
+        peak_rows = starts % n_dates - 1
+        end_rows = ends % n_dates
+        if len(starts):
+            depth = np.minimum.reduceat(np.where(flat_underwater, flat_values, 0.0), starts)
+            # The trough is the first month of an episode at its deepest drawdown;
+            # cells are in episode order, so it is where the episode number changes
+            cells = np.flatnonzero(flat_underwater)
+            episode_of_cell = np.cumsum(flat_starts)[cells] - 1
+            at_depth = flat_values[cells] == depth[episode_of_cell]
+            deepest_cells, deepest_episodes = cells[at_depth], episode_of_cell[at_depth]
+            first = np.flatnonzero(np.diff(deepest_episodes, prepend=-1))
+            trough_rows = deepest_cells[first] % n_dates
+        else:
+            depth = np.empty(0)
+            trough_rows = np.empty(0, dtype=int)
+
+        recovered = end_rows < n_dates - 1
+        recovery_rows = np.where(recovered, end_rows + 1, -1)
+        duration = np.where(recovered, recovery_rows, n_dates - 1) - peak_rows
+        time_to_recovery = np.where(recovered, recovery_rows - trough_rows, np.nan)
+
+        # Rank episodes by depth within each portfolio
+        order = np.lexsort((depth, columns))
+        columns = columns[order]
+        first_of_column = np.searchsorted(columns, columns, side='left')
+        rank = np.arange(len(order)) - first_of_column + 1
+        keep = rank <= top_n if top_n is not None else slice(None)
+        episodes = {
+            'column': columns, 'rank': rank, 'peak': peak_rows[order], 'trough': trough_rows[order],
+            'recovery': recovery_rows[order], 'depth': depth[order], 'duration': duration[order],
+            'time_to_recovery': time_to_recovery[order],
+        }
+        return {key: array[keep] for key, array in episodes.items()}
+
+    @staticmethod
+    def calculate_drawdown_episodes(drawdown, top_n=5):
+        """
+        Extract the deepest drawdown episodes of every column of a drawdown matrix
+        (see find_drawdown_episodes)
+
+        Parameters:
+        - drawdown: Date x portfolio drawdown frame (see calculate_drawdown_matrix)
+        - top_n: Number of episodes kept per portfolio, deepest first; None keeps all
+
+        Returns a frame with one row per episode: Portfolio, Rank, Peak Date,
+        Trough Date, Recovery Date (NaT if not recovered), Max Drawdown,
+        Duration (months, peak to recovery or to the last month) and Time to
+        Recovery (months, trough to recovery).
+        """
+        episodes = Analysis.find_drawdown_episodes(drawdown.to_numpy(dtype=float), top_n)
+        return Analysis.episode_frame(episodes, drawdown.index, drawdown.columns)
+
+    @staticmethod
+    def episode_frame(episodes, dates, portfolios):
+        """Label the episode arrays of find_drawdown_episodes with dates and portfolios"""
+        recovered = episodes['recovery'] >= 0
+        recovery_dates = np.full(len(recovered), np.datetime64('NaT'), dtype=dates.dtype)
+        recovery_dates[recovered] = dates[episodes['recovery'][recovered]]
+        return pd.DataFrame({
+            'Portfolio': portfolios[episodes['column']],
+            'Rank': episodes['rank'],
+            'Peak Date': dates[episodes['peak']],
+            'Trough Date': dates[episodes['trough']],
+            'Recovery Date': recovery_dates,
+            'Max Drawdown': episodes['depth'],
+            'Duration (months)': episodes['duration'],
+            'Time to Recovery (months)': episodes['time_to_recovery'],
+        })
+
+    @staticmethod
+    def analyze_drawdowns(returns, top_n=5):
+        """
+        Calculate drawdowns, episodes and a per-portfolio drawdown summary of a
+        date x portfolio return matrix
+
+        Returns a dict with the 'drawdown' matrix, the top_n 'episodes' of every
+        portfolio and a 'summary' frame indexed by portfolio with the max drawdown,
+        its peak, trough and recovery dates, duration and time to recovery, the
+        longest drawdown and the current drawdown.
+        """
+        drawdown = Analysis.calculate_drawdown_matrix(returns)
+        values = drawdown.to_numpy(dtype=float)
+        dates, portfolios = drawdown.index, drawdown.columns
+        all_episodes = Analysis.find_drawdown_episodes(values, top_n=None)
+
+        # Only the deepest and the top_n episodes are labelled
+        summary = pd.DataFrame(index=portfolios)
+        summary['Max Drawdown'] = np.nanmin(values, axis=0) if len(values) else np.nan
+        deepest = all_episodes['rank'] == 1
+        columns = all_episodes['column'][deepest]
+        labelled = Analysis.episode_frame(
+            {key: array[deepest] for key, array in all_episodes.items()}, dates, portfolios
+        )
+        for col in ['Peak Date', 'Trough Date', 'Recovery Date', 'Duration (months)', 'Time to Recovery (months)']:
+            summary[col] = pd.Series(labelled[col].to_numpy(), index=columns).reindex(range(len(portfolios))).to_numpy()
+        # Episodes are sorted by column, so every column's episodes are one run
+        starts = np.flatnonzero(np.diff(all_episodes['column'], prepend=-1))
+        longest = pd.Series(np.maximum.reduceat(all_episodes['duration'], starts) if len(starts) else [],
+                            index=all_episodes['column'][starts], dtype=all_episodes['duration'].dtype)
+        summary['Longest Drawdown (months)'] = longest.reindex(range(len(portfolios))).to_numpy()
+        summary['Current Drawdown'] = drawdown.ffill().iloc[-1] if len(drawdown) else np.nan
+
+        top = all_episodes['rank'] <= top_n
+        episodes = Analysis.episode_frame({key: array[top] for key, array in all_episodes.items()}, dates, portfolios)
+        return {'drawdown': drawdown, 'episodes': episodes, 'summary': summary}
+
     @staticmethod
     def factor_quantile_analysis(df, return_col='ret_vw', n_quantiles=5):
         """Analyze return performance by quantiles"""
-        df['quantile'] = pd.qcut(df[return_col], n_quantiles, labels=False) + 1
-        quantile_stats = df.groupby('quantile')[return_col].agg([
+        quantile = (pd.qcut(df[return_col], n_quantiles, labels=False) + 1).rename('quantile')
+        quantile_stats = df.groupby(quantile)[return_col].agg([
             'mean', 'std', 'count',
             lambda x: stats.skew(x, nan_policy='omit'),
             lambda x: stats.kurtosis(x, nan_policy='omit')
@@ -49,33 +363,14 @@ class Analysis:
             # Calculate market values and relative statistics
             relative_stats['market_value'] = (1 + market_data[return_col]).cumprod()
             
-            # Calculate rolling statistics
-            relative_stats['rolling_alpha'] = (
-                df[return_col].rolling(window).mean() - 
-                market_data[return_col].rolling(window).mean()
-            ) * 12  # Annualize
-            
-            relative_stats['rolling_beta'] = (
-                df[return_col]
-                .rolling(window)
-                .cov(market_data[return_col]) /
-                market_data[return_col]
-                .rolling(window)
-                .var()
-            )
-            
-            # Calculate tracking error
-            relative_stats['tracking_error'] = (
-                (df[return_col] - market_data[return_col])
-                .rolling(window)
-                .std() * np.sqrt(12)
-            )
-            
-            # Calculate information ratio
-            relative_stats['information_ratio'] = (
-                relative_stats['rolling_alpha'] / 
-                relative_stats['tracking_error']
+            # Calculate rolling alpha, beta, tracking error and information ratio
+            # in one fused pass, with the market aligned on the portfolio dates
+            market_returns = market_data[return_col].reindex(df.index).to_numpy()
+            moments = Analysis.calculate_rolling_moments(
+                df[return_col].to_numpy(), market_returns, window=window
             )
+            for name in ['rolling_alpha', 'rolling_beta', 'tracking_error', 'information_ratio']:
+                relative_stats[name] = moments[name][:, 0]
         else:
             # If no market data, just store portfolio statistics
             relative_stats['market_value'] = None
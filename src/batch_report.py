@@ -0,0 +1,388 @@
+"""
+Headless batch reports over many portfolio configurations
+
+Computes the tables of the app (portfolio statistics, excess return
+correlations, market relative statistics, rolling statistics and drawdowns)
+for every report in a JSON config and writes them as CSV, Parquet or HTML.
+
+Run from the repository root:
+    python -m src.batch_report reports.json --output reports --workers 4 --format csv html
+
+The config is a list of reports, or {"defaults": {...}, "reports": [...]}:
+    {
+      "defaults": {"rank_ME": 3, "start_date": "1990-01", "end_date": "2023-12"},
+      "reports": [
+        {
+          "name": "value_momentum",
+          "factors": [
+            "me_mom_monthly_2023/me_r11_1",
+            {"group": "me_vvg_monthly_2023", "factor": "me_bm", "ranks": {"rank_BM": 5}}
+          ],
+          "weights": [0.6, 0.4]
+        }
+      ]
+    }
+
+Factor ranks and rank_ME default to the sidebar defaults, weights to equal
+weights, and the date window to the common range of the selected factors.
+The high-minus-low spread of a factor is selected as
+"long_short_spreads/<factor>"; rank_ME 0 selects its size-averaged spread.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.analysis import Analysis
+from src.data_loader import DataLoader
+from src.data_processor import DataProcessor
+from src.names import get_display_name
+from src.portfolio import PortfolioBuilder
+from src.spreads import SpreadBuilder
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - Parquet output is unavailable, CSV uses pandas
+    pa = None
+    pa_csv = None
+
+# Settings of a report that are not given in the config
+REPORT_DEFAULTS = {
+    'rank_ME': None,
+    'return_col': 'ret_vw',
+    'start_date': None,
+    'end_date': None,
+    'weights': None,
+    'windows': [12, 24, 36, 60, 120],
+    'top_n': 5,
+}
+
+REPORT_FORMATS = ('csv', 'parquet', 'html')
+
+# Market cap rank of the market portfolio, as in the app
+MARKET_RANK = 10
+
+# Data of the current worker process, set by BatchReport.init_worker
+_worker_data = None
+
+logger = logging.getLogger(__name__)
+
+
+class BatchReport:
+    @staticmethod
+    def load_config(config_path):
+        """Read a report config and return its reports with the defaults applied"""
+        with open(config_path) as f:
+            config = json.load(f)
+        if isinstance(config, list):
+            config = {'reports': config}
+        defaults = dict(REPORT_DEFAULTS, **config.get('defaults', {}))
+        reports = []
+        for i, report in enumerate(config['reports']):
+            spec = dict(defaults, **report)
+            spec.setdefault('name', f"report_{i + 1:04d}")
+            reports.append(spec)
+        return reports
+
+    @staticmethod
+    def resolve_report(spec, manifest):
+        """
+        Resolve a report spec into an explicit selection
+
+        Factors given as "group/factor" get the sidebar's default rank, a missing
+        rank_ME the sidebar's default market cap rank, and list weights are keyed
+        by the display names of the factors.
+        """
+        factors = []
+        entries = []
+        for entry in spec['factors']:
+            if isinstance(entry, str):
+                group, factor = entry.split('/')
+                ranks = None
+            else:
+                group, factor, ranks = entry['group'], entry['factor'], entry.get('ranks')
+            if group not in manifest or factor not in manifest[group]:
+                raise ValueError(f"Unknown factor {group}/{factor}")
+            factor_entry = manifest[group][factor]
+            if ranks is None:
+                # Same default as the sidebar rank selectboxes
+                ranks = {col: values[min(4, len(values) - 1)]
+                         for col, values in factor_entry['rank_values'].items()}
+            factors.append((group, factor, ranks))
+            entries.append(factor_entry)
+
+        rank_ME = spec['rank_ME']
+        if rank_ME is None:
+            market_caps = SpreadBuilder.get_common_market_caps(entries)
+            rank_ME = market_caps[min(2, len(market_caps) - 1)]
+
+        weights = spec['weights']
+        names = [get_display_name(f"{group}/{factor}") for group, factor, _ in factors]
+        if isinstance(weights, list):
+            if len(weights) != len(names):
+                raise ValueError(f"Report {spec['name']!r} has {len(weights)} weights "
+                                 f"for {len(names)} factors")
+            weights = dict(zip(names, weights))
+        elif isinstance(weights, dict):
+            weights = {get_display_name(key) if '/' in key else key: value
+                       for key, value in weights.items()}
+
+        return dict(spec, factors=factors, rank_ME=rank_ME, weights=weights)
+
+    @staticmethod
+    def compute_report(data_dict, spec):
+        """
+        Compute the tables of one resolved report
+
+        Parameters:
+        - data_dict: The data dictionary (or LazyDataDict / PanelStore)
+        - spec: Report spec resolved with resolve_report
+
+        Returns a dict of table name to DataFrame.
+        """
+        return_col = spec['return_col']
+        filtered_data, market_data, min_date, max_date = DataLoader.load_selection(
+            data_dict, spec['factors'], spec['rank_ME'], return_col, MARKET_RANK
+        )
+        start_date = max(min_date, pd.Timestamp(spec['start_date'] or min_date))
+        end_date = min(max_date, pd.Timestamp(spec['end_date'] or max_date))
+        if start_date > end_date:
+            raise ValueError(f"Report {spec['name']!r} has no data between "
+                             f"{spec['start_date']} and {spec['end_date']}")
+
+        portfolios = {name: DataLoader.slice_date_range(df, start_date, end_date)
+                      for name, df in filtered_data.items()}
+        # As in the app, even a single factor gets the multifactor portfolio
+        if portfolios:
+            multifactor_data = PortfolioBuilder.create_multifactor_portfolio(portfolios, spec['weights'])
+            if not multifactor_data.empty:
+                portfolios["Multifactor Portfolio"] = multifactor_data
+
+        market_indexed = None
+        market_returns = None
+        if market_data is not None:
+            market_indexed = DataProcessor.get_date_indexed(
+                DataLoader.slice_date_range(market_data, start_date, end_date)
+            )
+            market_returns = market_indexed[return_col]
+
+        return_matrix = DataProcessor.build_return_matrix(portfolios, return_col)
+        nstocks_matrix = DataProcessor.build_return_matrix(
+            {name: df for name, df in portfolios.items() if 'nstocks' in df.columns}, 'nstocks'
+        )
+
+        tables = {}
+        tables['statistics'] = DataProcessor.calculate_statistics_matrix(
+            return_matrix, market_returns=market_returns, nstocks=nstocks_matrix
+        )
+        if market_returns is not None:
+            tables['correlation'] = DataProcessor.calculate_excess_correlation_matrix(
+                return_matrix, market_returns
+            )
+            market_relative = {
+                name: pd.Series(Analysis.calculate_market_relative_statistics(
+                    DataProcessor.get_date_indexed(df), return_col=return_col, market_data=market_indexed
+                ), dtype=float)
+                for name, df in portfolios.items()
+            }
+            market_relative['Market Portfolio'] = DataProcessor.calculate_statistics(
+                market_indexed, return_col=return_col
+            ).astype(float)
+            tables['market_relative'] = pd.DataFrame(market_relative)
+
+        tables['rolling'] = BatchReport.calculate_rolling_table(
+            return_matrix, market_returns, spec['windows']
+        )
+        drawdowns = Analysis.analyze_drawdowns(return_matrix, top_n=spec['top_n'])
+        tables['drawdown_episodes'] = drawdowns['episodes']
+        tables['drawdown_summary'] = drawdowns['summary']
+        return tables
+
+    @staticmethod
+    def calculate_rolling_table(return_matrix, market_returns=None, windows=(12,)):
+        """
+        Calculate the rolling statistics of every portfolio for several windows
+
+        All portfolios share one set of prefix sums. Returns a long table with a
+        row per window, date and portfolio.
+        """
+        market = None
+        if market_returns is not None:
+            market = market_returns.reindex(return_matrix.index).to_numpy()
+        sums = Analysis.calculate_rolling_prefix_sums(return_matrix.to_numpy(dtype=float), market)
+
+        # Row-major (date, portfolio) order of the flattened statistic arrays
+        n_dates, n_portfolios = return_matrix.shape
+        dates = np.repeat(return_matrix.index.to_numpy(), n_portfolios)
+        portfolios = np.tile(return_matrix.columns.to_numpy(), n_dates)
+
+        frames = []
+        for window in windows:
+            stats = Analysis.calculate_rolling_from_prefix_sums(sums, window)
+            frame = {'window': np.full(n_dates * n_portfolios, window), 'date': dates,
+                     'portfolio': portfolios}
+            frame.update({name: values.reshape(-1) for name, values in stats.items()})
+            frames.append(pd.DataFrame(frame))
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def write_long_csv(table, path):
+        """Write a large table without its index as CSV, with the pyarrow writer if available"""
+        if pa_csv is None:
+            table.to_csv(path, index=False)
+            return
+        arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+        for i, field in enumerate(arrow_table.schema):
+            # Monthly dates are written as dates rather than timestamps
+            if pa.types.is_timestamp(field.type):
+                arrow_table = arrow_table.set_column(i, field.name, arrow_table.column(i).cast(pa.date32()))
+        pa_csv.write_csv(arrow_table, path)
+
+    @staticmethod
+    def get_report_dir(output_dir, name):
+        """Get the output directory of a report, with a file-system safe name"""
+        return os.path.join(output_dir, re.sub(r'[^\w.-]+', '_', name))
+
+    @staticmethod
+    def write_report(tables, report_dir, formats=('csv',), title=None):
+        """
+        Write the tables of a report as CSV and Parquet files and an HTML page
+
+        The HTML page shows the latest rolling statistics instead of the full
+        rolling series, which are in the CSV and Parquet files.
+        """
+        os.makedirs(report_dir, exist_ok=True)
+        for name, table in tables.items():
+            keep_index = name != 'rolling'
+            if 'csv' in formats:
+                path = os.path.join(report_dir, f"{name}.csv")
+                if keep_index:
+                    table.to_csv(path)
+                else:
+                    # pandas CSV formatting would dominate the report time
+                    BatchReport.write_long_csv(table, path)
+            if 'parquet' in formats:
+                table.to_parquet(os.path.join(report_dir, f"{name}.parquet"), index=keep_index)
+
+        if 'html' in formats:
+            sections = [f"<h1>{title or os.path.basename(report_dir)}</h1>"]
+            for name, table in tables.items():
+                if name == 'rolling':
+                    name = 'latest rolling statistics'
+                    table = table.groupby(['window', 'portfolio']).last()
+                sections.append(f"<h2>{name.replace('_', ' ').title()}</h2>")
+                sections.append(table.to_html(float_format=lambda x: f"{x:,.4f}", na_rep="-"))
+            with open(os.path.join(report_dir, "report.html"), 'w') as f:
+                f.write("<html><body>\n" + "\n".join(sections) + "\n</body></html>\n")
+
+    @staticmethod
+    def run_report(data_dict, spec, manifest, output_dir, formats):
+        """Resolve, compute and write one report; returns a row of the batch index"""
+        started = time.perf_counter()
+        row = {'name': spec['name'], 'status': 'ok', 'error': None}
+        try:
+            resolved = BatchReport.resolve_report(spec, manifest)
+            tables = BatchReport.compute_report(data_dict, resolved)
+            BatchReport.write_report(
+                tables, BatchReport.get_report_dir(output_dir, spec['name']), formats, spec['name']
+            )
+            dates = tables['rolling']['date']
+            row.update({
+                'factors': ';'.join(f"{group}/{factor}" for group, factor, _ in resolved['factors']),
+                'rank_ME': resolved['rank_ME'],
+                'start_date': dates.min(),
+                'end_date': dates.max(),
+                'portfolios': tables['statistics'].shape[1],
+            })
+        except (ValueError, KeyError) as exc:
+            # One bad spec must not stop a nightly batch
+            row.update({'status': 'failed', 'error': f"{type(exc).__name__}: {exc}"})
+        row['seconds'] = time.perf_counter() - started
+        return row
+
+    @staticmethod
+    def init_worker(data_dict, manifest):
+        """Keep the data of a worker process for the reports it runs"""
+        global _worker_data
+        _worker_data = (data_dict, manifest)
+
+    @staticmethod
+    def run_worker_report(spec, output_dir, formats):
+        """Run one report in a worker process set up with init_worker"""
+        data_dict, manifest = _worker_data
+        return BatchReport.run_report(data_dict, spec, manifest, output_dir, formats)
+
+    @staticmethod
+    def run_batch(specs, output_dir, formats=('csv',), n_workers=1, base_path="data"):
+        """
+        Run every report and write the batch index
+
+        Parameters:
+        - specs: Report specs, e.g. from load_config
+        - output_dir: Directory receiving one sub-directory per report
+        - formats: Output formats, any of REPORT_FORMATS
+        - n_workers: Number of worker processes; 1 runs the reports serially
+        - base_path: Root of the data directory
+
+        The data is the memory-mapped shared panel, which worker processes
+        re-open from disk instead of receiving a copy.
+        """
+        unknown = set(formats) - set(REPORT_FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown output formats: {sorted(unknown)}")
+        if 'parquet' in formats and pa is None:
+            raise RuntimeError("Parquet output requires pyarrow")
+
+        data_dict = DataLoader.open_shared_panel(base_path)
+        manifest = DataLoader.get_manifest(base_path)
+        os.makedirs(output_dir, exist_ok=True)
+
+        started = time.perf_counter()
+        if n_workers is not None and n_workers > 1:
+            chunksize = max(1, math.ceil(len(specs) / (n_workers * 4)))
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=BatchReport.init_worker,
+                                     initargs=(data_dict, manifest)) as pool:
+                rows = list(pool.map(
+                    BatchReport.run_worker_report, specs,
+                    [output_dir] * len(specs), [formats] * len(specs), chunksize=chunksize
+                ))
+        else:
+            rows = [BatchReport.run_report(data_dict, spec, manifest, output_dir, formats)
+                    for spec in specs]
+        elapsed = time.perf_counter() - started
+
+        index = pd.DataFrame(rows)
+        index.to_csv(os.path.join(output_dir, "index.csv"), index=False)
+        logger.info("Wrote %d reports to %s in %.2fs (%.1f reports/s)",
+                    len(rows), output_dir, elapsed, len(rows) / elapsed if elapsed else float('inf'))
+        return index, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('config', help="JSON report config")
+    parser.add_argument('--output', default="reports", help="Output directory")
+    parser.add_argument('--format', nargs='+', default=['csv'], choices=REPORT_FORMATS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--data', default="data", help="Data directory")
+    args = parser.parse_args()
+
+    specs = BatchReport.load_config(args.config)
+    index, elapsed = BatchReport.run_batch(specs, args.output, args.format, args.workers, args.data)
+    failed = index[index['status'] != 'ok']
+    print(f"{len(index)} reports in {elapsed:.2f}s ({len(index) / elapsed:.1f} reports/s), "
+          f"{len(failed)} failed, index at {os.path.join(args.output, 'index.csv')}")
+    for _, row in failed.iterrows():
+        print(f"  {row['name']}: {row['error']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Stationary bootstrap resamples drawn for the confidence intervals of the app
+BOOTSTRAP_RESAMPLES = int(os.environ.get("GQE_BOOTSTRAP_RESAMPLES", "10000"))
+
+# Worker processes the resamples are spread over; 1 computes them in-process
+BOOTSTRAP_WORKERS = int(os.environ.get("GQE_BOOTSTRAP_WORKERS", "1"))
+
+# Resamples drawn per task. Every chunk has its own seed spawned from the
+# caller's seed, so results depend on the seed but not on the number of workers.
+BOOTSTRAP_CHUNK_SIZE = 1000
+
+# Statistics with bootstrap intervals, in output order
+BOOTSTRAP_STATISTICS = ('Sharpe Ratio', 'Annual Alpha (%)', 'Information Ratio')
+
+# Per-portfolio sums every statistic is computed from: the portfolio's own
+# months (count, sum, sum of squares) and the months it shares with the market
+# (count, sums and sums of squares of both, sum of products)
+N_SUMS = 9
+
+
+class Bootstrap:
+    @staticmethod
+    def default_block_length(n_obs):
+        """Mean block length used when none is given: the cube root of the sample length"""
+        return max(1, int(round(n_obs ** (1 / 3))))
+
+    @staticmethod
+    def resample_indices(n_obs, n_resamples, block_length, rng):
+        """
+        Draw a resamples x months index matrix of the stationary bootstrap
+
+        Every row is one resample of the months (Politis and Romano): blocks start
+        at a random month, run on with wraparound, and end with probability
+        1 / block_length after each month, so block lengths are geometric with
+        mean block_length.
+        """
+        positions = np.arange(n_obs)
+        starts = rng.integers(0, n_obs, (n_resamples, n_obs))
+        new_block = rng.random((n_resamples, n_obs)) < 1 / block_length
+        new_block[:, 0] = True
+        block_start = np.maximum.accumulate(np.where(new_block, positions, 0), axis=1)
+        return (np.take_along_axis(starts, block_start, axis=1) + positions - block_start) % n_obs
+
+    @staticmethod
+    def resample_counts(indices, n_obs):
+        """Count how often every month is drawn in each resample of an index matrix"""
+        n_resamples = len(indices)
+        offsets = (np.arange(n_resamples) * n_obs)[:, None]
+        counts = np.bincount((indices + offsets).ravel(), minlength=n_resamples * n_obs)
+        return counts.reshape(n_resamples, n_obs).astype(float)
+
+    @staticmethod
+    def build_sum_inputs(values, market=None):
+        """
+        Build the months x (N_SUMS * portfolios) matrix whose column sums give
+        every statistic's inputs
+
+        Returns are centred on their full-sample means first, which keeps the sums
+        of squares accurate; the means are returned to be added back.
+
+        Parameters:
+        - values: Months x portfolios return array, NaN where a portfolio has no return
+        - market: Optional market return array of the same months
+        """
+        n_obs, n_cols = values.shape
+        own = ~np.isnan(values)
+        with np.errstate(invalid='ignore'):
+            centre = np.nanmean(values, axis=0) if n_obs else np.zeros(n_cols)
+        centre = np.nan_to_num(centre)
+        x = np.where(own, values - centre, 0.0)
+
+        if market is not None:
+            joint = own & ~np.isnan(market)[:, None]
+            market_centre = np.nan_to_num(np.nanmean(market)) if (~np.isnan(market)).any() else 0.0
+            m = np.where(joint, (market - market_centre)[:, None], 0.0)
+        else:
+            joint = np.zeros_like(own)
+            market_centre = 0.0
+            m = np.zeros_like(x)
+        xj = np.where(joint, x, 0.0)
+
+        inputs = np.stack([
+            own, x, x * x,
+            joint, xj, xj * xj, m, m * m, xj * m,
+        ], axis=1).astype(float)
+        return inputs.reshape(n_obs, N_SUMS * n_cols), centre, market_centre
+
+    @staticmethod
+    def statistics_from_sums(sums, centre, market_centre, annual_factor=12):
+        """
+        Compute the Sharpe ratio, CAPM alpha and information ratio from resampled sums
+
+        The definitions match calculate_statistics_matrix (Sharpe ratio and
+        information ratio) and calculate_market_relative_statistics (alpha).
+
+        Parameters:
+        - sums: ... x (N_SUMS * portfolios) array of column sums of build_sum_inputs
+        - centre, market_centre: Means returned by build_sum_inputs
+
+        Returns an ... x portfolios x len(BOOTSTRAP_STATISTICS) array.
+        """
+        sums = sums.reshape(*sums.shape[:-1], N_SUMS, -1)
+        n, sx, sxx, nj, sxj, sxxj, sm, smm, sxm = np.moveaxis(sums, -2, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = sx / n + centre
+            variance = (sxx - sx ** 2 / n) / (n - 1)
+            volatility = np.sqrt(np.maximum(variance, 0) * annual_factor)
+            sharpe = np.where(volatility != 0, mean * annual_factor / volatility, 0)
+            sharpe = np.where(n > 1, sharpe, np.nan)
+
+            mean_x = sxj / nj + centre
+            mean_m = sm / nj + market_centre
+            var_m = smm - sm ** 2 / nj
+            cov_xm = sxm - sxj * sm / nj
+            beta = cov_xm / var_m
+            alpha = (mean_x - beta * mean_m) * annual_factor * 100
+            alpha = np.where(nj > 1, alpha, np.nan)
+
+            mean_excess = (mean_x - mean_m) * annual_factor
+            var_excess = (sxxj - 2 * sxm + smm - (sxj - sm) ** 2 / nj) / (nj - 1)
+            tracking_error = np.sqrt(np.maximum(var_excess, 0) * annual_factor)
+            ir = np.where(tracking_error != 0, mean_excess / tracking_error, 0)
+            ir = np.where(nj > 1, ir, np.nan)
+        return np.stack([sharpe, alpha, ir], axis=-1)
+
+    @staticmethod
+    def resample_chunk(inputs, centre, market_centre, n_resamples, block_length, seed):
+        """
+        Compute the statistics of one chunk of stationary bootstrap resamples
+
+        The index matrix is shared by every portfolio and the market, which keeps
+        their cross-sectional dependence. It is reduced to per-month draw counts,
+        so all resampled sums are one counts x inputs matrix product.
+        """
+        rng = np.random.default_rng(seed)
+        n_obs = len(inputs)
+        indices = Bootstrap.resample_indices(n_obs, n_resamples, block_length, rng)
+        sums = Bootstrap.resample_counts(indices, n_obs) @ inputs
+        return Bootstrap.statistics_from_sums(sums, centre, market_centre)
+
+    @staticmethod
+    def calculate_bootstrap_statistics(returns, market_returns=None, n_resamples=BOOTSTRAP_RESAMPLES,
+                                       block_length=None, seed=0, n_workers=BOOTSTRAP_WORKERS,
+                                       confidence=0.95):
+        """
+        Bootstrap confidence intervals and p-values of the Sharpe ratio, CAPM
+        alpha and information ratio of every column of a return matrix
+
+        Months are resampled with the stationary bootstrap, one index matrix for
+        all portfolios at once. Resampled months a portfolio has no return for are
+        skipped. Intervals are percentile intervals; p-values are two-sided for a
+        statistic of zero, from the bootstrap distribution centred on the estimate.
+
+        Parameters:
+        - returns: Wide date x portfolio return matrix (see build_return_matrix)
+        - market_returns: Optional date-indexed market return series; without it
+          alpha and information ratio are NaN
+        - n_resamples: Number of bootstrap resamples
+        - block_length: Mean block length in months (default_block_length if None)
+        - seed: Seed of the resampling; equal seeds give equal results
+        - n_workers: Number of worker processes; 1 computes in-process
+        - confidence: Confidence level of the intervals
+
+        Returns a frame indexed by (portfolio, statistic) with the estimate,
+        bootstrap standard error, interval bounds and p-value.
+        """
+        values = returns.to_numpy(dtype=float)
+        market = None
+        if market_returns is not None:
+            market = market_returns.reindex(returns.index).to_numpy(dtype=float)
+        n_obs = len(values)
+        block_length = block_length or Bootstrap.default_block_length(n_obs)
+        inputs, centre, market_centre = Bootstrap.build_sum_inputs(values, market)
+        estimates = Bootstrap.statistics_from_sums(inputs.sum(axis=0), centre, market_centre)
+
+        chunk_sizes = [BOOTSTRAP_CHUNK_SIZE] * (n_resamples // BOOTSTRAP_CHUNK_SIZE)
+        if n_resamples % BOOTSTRAP_CHUNK_SIZE:
+            chunk_sizes.append(n_resamples % BOOTSTRAP_CHUNK_SIZE)
+        seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+        n_chunks = len(chunk_sizes)
+        task_args = ([inputs] * n_chunks, [centre] * n_chunks, [market_centre] * n_chunks,
+                     chunk_sizes, [block_length] * n_chunks, seeds)
+        if n_obs and n_workers is not None and n_workers > 1 and n_chunks > 1:
+            with ProcessPoolExecutor(max_workers=min(n_workers, n_chunks)) as pool:
+                chunks = list(pool.map(Bootstrap.resample_chunk, *task_args))
+        elif n_obs:
+            chunks = list(map(Bootstrap.resample_chunk, *task_args))
+        else:
+            chunks = []
+        draws = np.concatenate(chunks) if chunks else np.full((0,) + estimates.shape, np.nan)
+
+        tail = (1 - confidence) / 2
+        valid = ~np.isnan(draws)
+        n_valid = valid.sum(axis=0)
+        with warnings.catch_warnings():
+            # Portfolios without enough months have all-NaN draws
+            warnings.simplefilter('ignore', RuntimeWarning)
+            lower, upper = np.nanquantile(draws, [tail, 1 - tail], axis=0)
+            std_error = np.nanstd(draws, axis=0, ddof=1)
+            extreme = (np.abs(draws - estimates) >= np.abs(estimates)) & valid
+            p_value = (extreme.sum(axis=0) + 1) / (n_valid + 1)
+        p_value = np.where((n_valid > 0) & ~np.isnan(estimates), p_value, np.nan)
+
+        index = pd.MultiIndex.from_product([returns.columns, BOOTSTRAP_STATISTICS],
+                                           names=['Portfolio', 'Statistic'])
+        level = f"{confidence:.0%}"
+        return pd.DataFrame({
+            'Estimate': estimates.ravel(),
+            'Std. Error': std_error.ravel(),
+            f'{level} CI Lower': lower.ravel(),
+            f'{level} CI Upper': upper.ravel(),
+            'p-value': p_value.ravel(),
+        }, index=index)
@@ -1,7 +1,62 @@
 import pandas as pd
+import numpy as np
 import streamlit as st
 import os
+import csv
+import io
+import re
+import json
+import hashlib
+import threading
+import logging
+import shutil
+import tempfile
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
+from src.panel_store import PanelStore, PANEL_MANIFEST_FILE
+from src.names import GROUP_NAMES, FACTOR_NAMES, get_display_name
+from src.spreads import SpreadBuilder, SPREAD_GROUP
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - the cache is simply disabled
+    feather = None
+
+# Portfolio files carry their vintage, e.g. portf_me_ia_monthly_2023.csv
+VINTAGE_PATTERN = re.compile(r'_monthly_(\d{4})\.csv$')
+MARKET_FILE_PATTERN = re.compile(r'^portf_me_monthly_\d{4}\.csv$')
+# Number of trailing bytes of a cached file used to recognise a pure append
+CACHE_TAIL_BYTES = 64
+CACHE_DIR_NAME = ".cache"
+CACHE_INDEX_FILE = "index.json"
+# Sidebar metadata of every factor, persisted beside the cache index
+MANIFEST_FILE = "manifest.json"
+# Memory-mapped panels live in <cache_dir>/panel-<source fingerprint>/
+SHARED_PANEL_PREFIX = "panel-"
+# Version of the groups derived from the data files (the long-short spreads);
+# bumping it rebuilds persisted manifests and shared panels of unchanged files
+DERIVED_DATA_VERSION = 1
+
+# Load profiles mapping columns to dtypes; 'rank_*' covers every rank column
+DTYPE_PROFILES = {
+    'default': {},
+    'compact': {
+        'year': 'int16',
+        'month': 'int8',
+        'rank_*': 'int8',
+        'nstocks': 'int32',
+    },
+    'compact_float32': {
+        'year': 'int16',
+        'month': 'int8',
+        'rank_*': 'int8',
+        'nstocks': 'int32',
+        'ret_vw': 'float32',
+    },
+}
+
+logger = logging.getLogger(__name__)
 
 class DataLoader:
     @staticmethod
@@ -12,43 +67,821 @@ class DataLoader:
         return df
 
     @staticmethod
-    @st.cache_data
-    def load_data_directory(base_path="data"):
-        """Load and organize all available datasets"""
-        data_dict = {}
-        
-        # First load market portfolio data
-        market_file = os.path.join(base_path, "portf_me_monthly_2023.csv")
-        if os.path.exists(market_file):
-            market_data = pd.read_csv(market_file)
-            market_data = DataLoader.create_date_column(market_data)
-            market_data['ret_vw'] = market_data['ret_vw'] / 100
-            data_dict['market_portfolio'] = market_data
-        
-        # Walk through all subdirectories in the data folder
+    def read_portfolio_csv(file_path):
+        """Parse a portfolio CSV and apply the standard post-processing"""
+        df = pd.read_csv(file_path)
+        df = DataLoader.create_date_column(df)
+        df['ret_vw'] = df['ret_vw'] / 100
+        return df
+
+    @staticmethod
+    def apply_dtype_profile(df, dtype_profile='default'):
+        """Downcast the columns of a portfolio frame according to a load profile"""
+        profile = DTYPE_PROFILES[dtype_profile]
+        if not profile:
+            return df
+        dtypes = {}
+        for col in df.columns:
+            if col in profile:
+                dtypes[col] = profile[col]
+            elif col.startswith('rank_') and 'rank_*' in profile:
+                dtypes[col] = profile['rank_*']
+        return df.astype(dtypes)
+
+    @staticmethod
+    def get_resident_memory():
+        """Get the resident set size of the current process in bytes, if available"""
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError, AttributeError):
+            return None
+
+    @staticmethod
+    def get_frames_memory(data_dict):
+        """Get the deep memory usage of all frames in a data_dict in bytes"""
+        total = 0
+        for key, value in data_dict.items():
+            frames = [value] if isinstance(value, pd.DataFrame) else value.values()
+            total += sum(int(df.memory_usage(deep=True).sum()) for df in frames)
+        return total
+
+    @staticmethod
+    def freeze_frame(df):
+        """
+        Rebuild a frame on read-only views of its column arrays
+
+        Frames shared between sessions are handed out without copying, so any
+        in-place write to their values raises instead of leaking into other
+        sessions. No data is copied.
+        """
+        columns = {}
+        for col in df.columns:
+            values = df[col]
+            if isinstance(values.dtype, np.dtype):
+                values = values.to_numpy()
+                values.flags.writeable = False
+            columns[col] = values
+        return pd.DataFrame(columns, index=df.index, copy=False)
+
+    @staticmethod
+    def get_default_cache_dir(base_path="data"):
+        """Get the directory holding the columnar cache for a data directory"""
+        return os.path.join(base_path, CACHE_DIR_NAME)
+
+    @staticmethod
+    def read_cache_index(cache_dir):
+        """Read the cache index mapping source files to their cached frames"""
+        index_file = os.path.join(cache_dir, CACHE_INDEX_FILE)
+        if not os.path.exists(index_file):
+            return {}
+        try:
+            with open(index_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # A corrupt index only costs a re-parse
+            return {}
+
+    @staticmethod
+    def write_cache_index(cache_dir, cache_index):
+        """Atomically persist the cache index"""
+        os.makedirs(cache_dir, exist_ok=True)
+        index_file = os.path.join(cache_dir, CACHE_INDEX_FILE)
+        tmp_file = f"{index_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(cache_index, f, indent=1, sort_keys=True)
+        os.replace(tmp_file, index_file)
+
+    @staticmethod
+    def read_appended_rows(file_path, entry, dtypes):
+        """
+        Parse only the rows appended to a portfolio CSV since its cache entry
+
+        Returns None unless the file grew by whole lines after the cached bytes,
+        which are recognised by the trailing bytes stored in the entry. The few
+        new lines are parsed with the csv module into the cached frame's dtypes,
+        avoiding the fixed cost of a full pandas parse per file.
+        """
+        tail = bytes.fromhex(entry.get('tail', ''))
+        if not tail.endswith(b'\n'):
+            return None
+        with open(file_path, 'rb') as f:
+            header = f.readline().decode('utf-8').strip().split(',')
+            f.seek(entry['size'] - len(tail))
+            if f.read(len(tail)) != tail:
+                return None
+            appended = f.read().decode('utf-8')
+        rows = [row for row in csv.reader(io.StringIO(appended)) if row]
+        if not rows or any(len(row) != len(header) for row in rows):
+            return None
+
+        new_rows = {}
+        try:
+            for position, col in enumerate(header):
+                values = np.array([row[position] for row in rows])
+                new_rows[col] = values.astype(dtypes[col] if col in dtypes else float)
+        except ValueError:
+            return None  # Missing values and the like take the full parse
+        new_rows = pd.DataFrame(new_rows)
+        new_rows['ret_vw'] = new_rows['ret_vw'] / 100
+        if 'year' in new_rows.columns and 'month' in new_rows.columns:
+            months = (new_rows['year'].to_numpy(dtype=np.int64) - 1970) * 12 + new_rows['month'].to_numpy(dtype=np.int64) - 1
+            new_rows['date'] = months.astype('datetime64[M]').astype(dtypes.get('date', 'datetime64[ns]'))
+        return new_rows
+
+    @staticmethod
+    def build_cache_entry(file_path, cache_name, df):
+        """Describe a cached frame and the state of its source file"""
+        file_stat = os.stat(file_path)
+        with open(file_path, 'rb') as f:
+            f.seek(max(0, file_stat.st_size - CACHE_TAIL_BYTES))
+            tail = f.read()
+        return {
+            'file': cache_name,
+            'mtime_ns': file_stat.st_mtime_ns,
+            'size': file_stat.st_size,
+            'tail': tail.hex(),
+            'n_rows': len(df),
+            'end_date': df['date'].max().isoformat() if 'date' in df.columns and len(df) else None,
+        }
+
+    @staticmethod
+    def sync_portfolio_file(file_path, cache_dir, cache_index, cached=None):
+        """
+        Bring the cached frame of a portfolio file up to date with its source
+
+        Returns the frame and how it was obtained: 'cached' (source unchanged),
+        'appended' (only rows added at the end of the file were parsed and merged
+        into the cached frame) or 'parsed' (new or rewritten file). A cached frame
+        the caller already read can be passed to avoid reading it again.
+        """
+        source_key = os.path.abspath(file_path)
+        file_stat = os.stat(file_path)
+        entry = cache_index.get(source_key)
+        if entry is not None and cached is None:
+            cache_file = os.path.join(cache_dir, entry['file'])
+            try:
+                cached = feather.read_table(cache_file, memory_map=True).to_pandas()
+            except (OSError, ValueError):
+                entry = None  # Rebuild the entry from the CSV
+        if (entry is not None
+                and entry['mtime_ns'] == file_stat.st_mtime_ns
+                and entry['size'] == file_stat.st_size):
+            return cached, 'cached'
+
+        df, status = None, 'parsed'
+        if entry is not None and file_stat.st_size > entry['size']:
+            new_rows = DataLoader.read_appended_rows(file_path, entry, cached.dtypes)
+            # Appended months must follow the cached sample
+            if (new_rows is not None and set(cached.columns) <= set(new_rows.columns)
+                    and new_rows['date'].min() > cached['date'].max()):
+                df = pd.concat([cached, new_rows[cached.columns]], ignore_index=True)
+                status = 'appended'
+        if df is None:
+            df = DataLoader.read_portfolio_csv(file_path)
+
+        cache_name = hashlib.sha1(source_key.encode('utf-8')).hexdigest()[:16] + '.feather'
+        cache_file = os.path.join(cache_dir, cache_name)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+            feather.write_feather(df, tmp_file, compression='uncompressed')
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            # Read-only deployments still work, just without the cache
+            return df, status
+        cache_index[source_key] = DataLoader.build_cache_entry(file_path, cache_name, df)
+        return df, status
+
+    @staticmethod
+    def load_portfolio_file(file_path, cache_dir=None, cache_index=None):
+        """
+        Load a processed portfolio file, reusing the columnar cache when fresh
+
+        The cache entry is keyed on the source path, its mtime and its size, so
+        only CSVs that changed since the last run are parsed again, and of a CSV
+        that only had rows appended only the new rows are parsed. The cached
+        Feather files are uncompressed and therefore read through a memory map.
+
+        Parameters:
+        - file_path: Path of the source CSV
+        - cache_dir: Cache directory, or None to always parse the CSV
+        - cache_index: Dict loaded with read_cache_index; updated in place
+        """
+        if cache_dir is None or feather is None or cache_index is None:
+            return DataLoader.read_portfolio_csv(file_path)
+        df, _ = DataLoader.sync_portfolio_file(file_path, cache_dir, cache_index)
+        return df
+
+    @staticmethod
+    def load_portfolio_spreads(file_path, cache_dir=None, cache_index=None, df=None):
+        """
+        Load the long-short spread frame of a portfolio file (see
+        SpreadBuilder.build_spread_frame)
+
+        Spreads are built once per version of the source file and persisted beside
+        its cached frame; the entry of the file records them, so a changed file
+        gets a new entry and fresh spreads. Returns None for files without a
+        factor rank grid.
+
+        Parameters:
+        - file_path: Path of the source CSV
+        - cache_dir: Cache directory, or None to build the spreads on every call
+        - cache_index: Dict loaded with read_cache_index; updated in place
+        - df: The up-to-date frame of the file, if the caller already loaded it
+        """
+        if cache_dir is None or feather is None or cache_index is None:
+            return SpreadBuilder.build_spread_frame(
+                df if df is not None else DataLoader.read_portfolio_csv(file_path)
+            )
+        if df is None:
+            df, _ = DataLoader.sync_portfolio_file(file_path, cache_dir, cache_index)
+
+        source_key = os.path.abspath(file_path)
+        entry = cache_index.get(source_key)
+        if entry is not None and 'spread_file' in entry:
+            if entry['spread_file'] is None:
+                return None
+            try:
+                return feather.read_table(
+                    os.path.join(cache_dir, entry['spread_file']), memory_map=True
+                ).to_pandas()
+            except (OSError, ValueError):
+                pass  # Rebuild the spreads from the frame
+
+        spreads = SpreadBuilder.build_spread_frame(df)
+        if entry is None:
+            return spreads
+        spread_name = None
+        if spreads is not None:
+            spread_name = os.path.splitext(entry['file'])[0] + '.spreads.feather'
+            spread_file = os.path.join(cache_dir, spread_name)
+            try:
+                tmp_file = f"{spread_file}.{os.getpid()}.tmp"
+                feather.write_feather(spreads, tmp_file, compression='uncompressed')
+                os.replace(tmp_file, spread_file)
+            except OSError:
+                return spreads
+        cache_index[source_key] = dict(entry, spread_file=spread_name)
+        return spreads
+
+    @staticmethod
+    def load_portfolio_task(file_path, cache_dir=None, cache_entry=None, dtype_profile='default',
+                            with_spreads=False):
+        """
+        Load one portfolio file as a self-contained unit of work for a worker pool
+
+        Returns the frame after the dtype profile, its size in bytes with default
+        dtypes, the (possibly refreshed) cache index entry of the file and, with
+        with_spreads, its long-short spread frame (else None).
+        """
+        source_key = os.path.abspath(file_path)
+        cache_index = None
+        if cache_dir is not None:
+            cache_index = {source_key: cache_entry} if cache_entry is not None else {}
+        df = DataLoader.load_portfolio_file(file_path, cache_dir, cache_index)
+        default_bytes = int(df.memory_usage(deep=True).sum())
+        spreads = None
+        if with_spreads:
+            spreads = DataLoader.load_portfolio_spreads(file_path, cache_dir, cache_index, df)
+            if spreads is not None:
+                spreads = DataLoader.apply_dtype_profile(spreads, dtype_profile)
+        new_entry = cache_index.get(source_key) if cache_index is not None else None
+        return DataLoader.apply_dtype_profile(df, dtype_profile), default_bytes, new_entry, spreads
+
+    @staticmethod
+    def get_factor_name(file_name):
+        """Extract the factor name from a portfolio file name"""
+        return os.path.splitext(file_name)[0].split('portf_')[-1].split('_monthly')[0]
+
+    @staticmethod
+    def get_vintage(file_name):
+        """Get the vintage year of a portfolio file name, or 0 if it carries none"""
+        match = VINTAGE_PATTERN.search(file_name)
+        return int(match.group(1)) if match else 0
+
+    @staticmethod
+    def find_market_file(base_path="data"):
+        """Get the path of the latest vintage of the market portfolio file, if any"""
+        if not os.path.isdir(base_path):
+            return None
+        candidates = [f for f in os.listdir(base_path) if MARKET_FILE_PATTERN.match(f)]
+        if not candidates:
+            return None
+        return os.path.join(base_path, max(candidates, key=DataLoader.get_vintage))
+
+    @staticmethod
+    def iter_portfolio_files(base_path="data"):
+        """
+        Yield (group, factor, file_path) for every factor file under base_path
+
+        When a factor has several vintages in its directory only the latest is used.
+        """
         for root, dirs, files in os.walk(base_path):
-            for file in files:
-                if file.endswith('.csv') and file != "portf_me_monthly_2023.csv":
-                    # Get relative path components
-                    rel_path = os.path.relpath(root, base_path)
-                    group_name = rel_path.split(os.sep)[0]  # First subdirectory is the group name
-                    
-                    # Create group if it doesn't exist
-                    if group_name not in data_dict:
-                        data_dict[group_name] = {}
-                    
-                    # Load the CSV file
-                    file_path = os.path.join(root, file)
-                    df = pd.read_csv(file_path)
-                    df = DataLoader.create_date_column(df)
-                    df['ret_vw'] = df['ret_vw'] / 100
-                    
-                    # Extract factor name from filename
-                    factor_name = os.path.splitext(file)[0].split('portf_')[-1].split('_monthly')[0]
-                    data_dict[group_name][factor_name] = df
+            # Skip hidden directories such as the cache
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            latest = {}
+            for file in sorted(files):
+                if file.endswith('.csv') and not MARKET_FILE_PATTERN.match(file):
+                    factor_name = DataLoader.get_factor_name(file)
+                    if (factor_name not in latest
+                            or DataLoader.get_vintage(file) > DataLoader.get_vintage(latest[factor_name])):
+                        latest[factor_name] = file
+            # First subdirectory is the group name
+            rel_path = os.path.relpath(root, base_path)
+            group_name = rel_path.split(os.sep)[0]
+            for factor_name, file in sorted(latest.items(), key=lambda item: item[1]):
+                yield group_name, factor_name, os.path.join(root, file)
+
+    @staticmethod
+    def read_last_line(file_path):
+        """Read the last non-empty line of a text file without parsing the rest"""
+        with open(file_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            block = b''
+            while position > 0:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                block = f.read(step) + block
+                lines = block.rstrip(b'\r\n').splitlines()
+                if len(lines) > 1 or position == 0:
+                    return lines[-1].decode('utf-8') if lines else ''
+        return ''
+
+    @staticmethod
+    def scan_portfolio_file(file_path):
+        """
+        Build a catalog entry for a portfolio file from its header and boundary rows
+
+        Files are sorted by year, month and ranks, so the first month holds every
+        rank combination and the last line holds the end of the sample.
+        """
+        with open(file_path, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            first_period = []
+            for row in reader:
+                if first_period and row[:2] != first_period[0][:2]:
+                    break
+                first_period.append(row)
+        last_row = DataLoader.read_last_line(file_path).split(',')
+
+        def column_values(col):
+            position = header.index(col)
+            return sorted({int(row[position]) for row in first_period})
+
+        year_pos, month_pos = header.index('year'), header.index('month')
+        rank_columns = [col for col in header if col.startswith('rank_') and col != 'rank_ME']
+        return {
+            'file_path': file_path,
+            'rank_columns': rank_columns,
+            'rank_values': {col: column_values(col) for col in rank_columns},
+            'market_caps': column_values('rank_ME') if 'rank_ME' in header else [],
+            'start_date': pd.Timestamp(year=int(first_period[0][year_pos]),
+                                       month=int(first_period[0][month_pos]), day=1),
+            'end_date': pd.Timestamp(year=int(last_row[year_pos]),
+                                     month=int(last_row[month_pos]), day=1),
+        }
+
+    @staticmethod
+    def count_data_rows(file_path):
+        """Count the data rows of a CSV file without parsing it"""
+        with open(file_path, 'rb') as f:
+            data = f.read().rstrip(b'\r\n')
+        return data.count(b'\n')
+
+    @staticmethod
+    def build_manifest_entry(group, factor, file_path):
+        """Build the manifest entry of a factor file from its boundary rows"""
+        entry = DataLoader.scan_portfolio_file(file_path)
+        entry.update({
+            'group': group,
+            'factor': factor,
+            'n_rows': DataLoader.count_data_rows(file_path),
+            'group_display_name': GROUP_NAMES.get(group, group),
+            'short_name': get_display_name(factor),
+            'display_name': get_display_name(f"{group}/{factor}"),
+        })
+        return entry
+
+    @staticmethod
+    def build_manifest(base_path="data"):
+        """
+        Build the metadata manifest of the data directory
+
+        Maps group -> factor -> entry with the file path, rank columns and values,
+        market cap ranks, date range, row count and display names of the factor.
+        Only file headers and boundary rows are read, never the return data.
+        """
+        manifest = {}
+        spreads = {}
+        for group, factor, file_path in DataLoader.iter_portfolio_files(base_path):
+            entry = DataLoader.build_manifest_entry(group, factor, file_path)
+            manifest.setdefault(group, {})[factor] = entry
+            spread_entry = SpreadBuilder.build_manifest_entry(entry)
+            if spread_entry is not None:
+                spreads[factor] = spread_entry
+        if spreads:
+            manifest[SPREAD_GROUP] = spreads
+        return manifest
+
+    @staticmethod
+    def get_manifest_fingerprint(base_path="data"):
+        """Fingerprint of the data files and display names a manifest is built from"""
+        names = json.dumps([GROUP_NAMES, FACTOR_NAMES, DERIVED_DATA_VERSION], sort_keys=True).encode('utf-8')
+        return DataLoader.get_source_fingerprint(base_path) + hashlib.sha1(names).hexdigest()[:8]
+
+    @staticmethod
+    def read_manifest(cache_dir, fingerprint):
+        """Read the persisted manifest, or None if it is missing or stale"""
+        manifest_file = os.path.join(cache_dir, MANIFEST_FILE)
+        try:
+            with open(manifest_file) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if stored.get('fingerprint') != fingerprint:
+            return None
+
+        manifest = stored['groups']
+        for factors in manifest.values():
+            for entry in factors.values():
+                entry['start_date'] = pd.Timestamp(entry['start_date'])
+                entry['end_date'] = pd.Timestamp(entry['end_date'])
+        return manifest
+
+    @staticmethod
+    def write_manifest(cache_dir, manifest, fingerprint):
+        """Atomically persist the manifest with the fingerprint of its sources"""
+        groups = {
+            group: {
+                factor: dict(entry, start_date=entry['start_date'].isoformat(),
+                             end_date=entry['end_date'].isoformat())
+                for factor, entry in factors.items()
+            }
+            for group, factors in manifest.items()
+        }
+        os.makedirs(cache_dir, exist_ok=True)
+        manifest_file = os.path.join(cache_dir, MANIFEST_FILE)
+        tmp_file = f"{manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump({'fingerprint': fingerprint, 'groups': groups}, f, indent=1)
+        os.replace(tmp_file, manifest_file)
+
+    @staticmethod
+    def get_manifest(base_path="data", cache_dir=None):
+        """
+        Get the manifest of the data directory, rebuilding it if the data changed
+
+        Parameters:
+        - base_path: Root of the data directory
+        - cache_dir: Where the manifest is persisted, defaults to <base_path>/.cache
+        """
+        cache_dir = cache_dir or DataLoader.get_default_cache_dir(base_path)
+        fingerprint = DataLoader.get_manifest_fingerprint(base_path)
+        manifest = DataLoader.read_manifest(cache_dir, fingerprint)
+        if manifest is None:
+            manifest = DataLoader.build_manifest(base_path)
+            try:
+                DataLoader.write_manifest(cache_dir, manifest, fingerprint)
+            except OSError:
+                pass
+        return manifest
+
+    @staticmethod
+    @st.cache_resource
+    def load_manifest(base_path="data"):
+        """Get the manifest of the data directory (cached per process)"""
+        return DataLoader.get_manifest(base_path)
+
+    @staticmethod
+    @st.cache_resource
+    def load_data_catalog(base_path="data", use_cache=True, cache_dir=None, dtype_profile='default'):
+        """
+        Build a lazily loaded view of the data directory
+
+        Only the manifest of groups, factors, ranks and date ranges is read up front.
+        Each factor frame is loaded the first time it is accessed. The result is a
+        shared resource, so frames loaded by one session are reused by the others.
+        """
+        if use_cache:
+            cache_dir = cache_dir or DataLoader.get_default_cache_dir(base_path)
+        else:
+            cache_dir = None
+
+        if cache_dir is not None:
+            manifest = DataLoader.get_manifest(base_path, cache_dir)
+        else:
+            manifest = DataLoader.build_manifest(base_path)
+        catalog = {
+            (group_name, factor_name): entry
+            for group_name, factors in manifest.items() for factor_name, entry in factors.items()
+        }
+
+        return LazyDataDict(
+            catalog,
+            market_file=DataLoader.find_market_file(base_path),
+            cache_dir=cache_dir,
+            dtype_profile=dtype_profile
+        )
+
+    @staticmethod
+    @st.cache_resource
+    def load_panel_store(base_path="data", use_cache=True, cache_dir=None):
+        """Load the data directory into a single consolidated PanelStore"""
+        data_dict = DataLoader.read_data_directory(base_path, use_cache, cache_dir)
+        return PanelStore.from_data_dict(data_dict)
+
+    @staticmethod
+    def get_source_fingerprint(base_path="data"):
+        """Hash the paths, sizes and modification times of the data files in use"""
+        file_paths = [file_path for _, _, file_path in DataLoader.iter_portfolio_files(base_path)]
+        market_file = DataLoader.find_market_file(base_path)
+        if market_file is not None:
+            file_paths.append(market_file)
+        digest = hashlib.sha1()
+        for file_path in file_paths:
+            stat = os.stat(file_path)
+            digest.update(f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def write_shared_panel(store, cache_dir, panel_dir):
+        """
+        Save a panel store for memory mapping and drop panels of older data
+
+        The files are written to a temporary directory that is renamed into place,
+        so concurrent processes never map a partly written panel. Panels that are
+        still mapped elsewhere stay valid until those processes close them.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix="." + SHARED_PANEL_PREFIX, dir=cache_dir)
+        try:
+            store.save(tmp_dir)
+            os.rename(tmp_dir, panel_dir)
+        except OSError:
+            # Another process published the same panel first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(panel_dir):
+                raise
+
+        for entry in os.scandir(cache_dir):
+            if (entry.is_dir() and entry.name.startswith(SHARED_PANEL_PREFIX)
+                    and os.path.abspath(entry.path) != os.path.abspath(panel_dir)):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    @staticmethod
+    @st.cache_resource
+    def load_shared_panel(base_path="data", cache_dir=None):
+        """Open the memory-mapped consolidated panel (cached per process)"""
+        return DataLoader.open_shared_panel(base_path, cache_dir)
+
+    @staticmethod
+    def open_shared_panel(base_path="data", cache_dir=None):
+        """
+        Open the consolidated panel memory-mapped from the cache directory
+
+        The panel is written once per version of the data files and every session,
+        replica and worker process maps the same read-only files, so memory use
+        does not grow with the number of users or processes. Falls back to an
+        in-memory PanelStore if the cache directory is not writable.
+        """
+        cache_dir = cache_dir or DataLoader.get_default_cache_dir(base_path)
+        panel_dir = os.path.abspath(os.path.join(
+            cache_dir,
+            f"{SHARED_PANEL_PREFIX}{DataLoader.get_source_fingerprint(base_path)}-v{DERIVED_DATA_VERSION}"
+        ))
+        if os.path.exists(os.path.join(panel_dir, PANEL_MANIFEST_FILE)):
+            return PanelStore.open_mmap(panel_dir)
+
+        store = PanelStore.from_data_dict(DataLoader.read_data_directory(base_path, True, cache_dir))
+        try:
+            DataLoader.write_shared_panel(store, cache_dir, panel_dir)
+        except OSError as exc:
+            logger.warning("Could not write shared panel to %s (%s), keeping it in memory",
+                           panel_dir, exc)
+            return store
+        return PanelStore.open_mmap(panel_dir)
+
+    @staticmethod
+    @st.cache_resource
+    def load_data_directory(base_path="data", use_cache=True, cache_dir=None,
+                            dtype_profile='default', n_workers=1, executor='thread'):
+        """
+        Load and organize all available datasets as a read-only FrozenDataDict
+
+        The dataset is a shared resource: every session and rerun gets the same
+        object instead of a deserialized copy.
+        """
+        return FrozenDataDict(DataLoader.read_data_directory(
+            base_path, use_cache, cache_dir, dtype_profile, n_workers, executor
+        ))
+
+    @staticmethod
+    def read_data_directory(base_path="data", use_cache=True, cache_dir=None,
+                            dtype_profile='default', n_workers=1, executor='thread', load_stats=None):
+        """
+        Load and organize all available datasets
+
+        Parameters:
+        - base_path: Root of the data directory
+        - use_cache: Reuse the on-disk columnar cache of processed frames
+        - cache_dir: Cache location, defaults to <base_path>/.cache
+        - dtype_profile: Key of DTYPE_PROFILES used to downcast the loaded frames
+        - n_workers: Number of files parsed concurrently; 1 loads serially
+        - executor: 'thread' or 'process' pool used when n_workers > 1
+        - load_stats: Optional dict filled with the memory of the loaded data
+          file frames ('frames_bytes', and 'default_bytes' with default dtypes),
+          of the derived spread frames ('spread_bytes') and the resident memory
+          of the process before and after the load ('rss_before', 'rss_after';
+          None where not available)
+
+        Besides the market portfolio and the factor groups, the data dict holds
+        the SPREAD_GROUP of long-short spreads derived from every factor file.
+        """
+        data_dict = {}
+        spread_frames = {}
+        rss_before = DataLoader.get_resident_memory()
+
+        if use_cache:
+            cache_dir = cache_dir or DataLoader.get_default_cache_dir(base_path)
+            cache_index = DataLoader.read_cache_index(cache_dir)
+        else:
+            cache_dir = None
+            cache_index = {}
+
+        # Market portfolio first, then every factor file in walk order
+        tasks = []
+        market_file = DataLoader.find_market_file(base_path)
+        if market_file is not None:
+            tasks.append(('market_portfolio', None, market_file))
+        tasks.extend(DataLoader.iter_portfolio_files(base_path))
+
+        file_paths = [file_path for _, _, file_path in tasks]
+        cache_entries = [cache_index.get(os.path.abspath(file_path)) for file_path in file_paths]
+        task_args = (file_paths, [cache_dir] * len(tasks), cache_entries,
+                     [dtype_profile] * len(tasks), [group != 'market_portfolio' for group, _, _ in tasks])
+        if n_workers is not None and n_workers > 1:
+            pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+            with pool_class(max_workers=n_workers) as pool:
+                results = list(pool.map(DataLoader.load_portfolio_task, *task_args))
+        else:
+            results = list(map(DataLoader.load_portfolio_task, *task_args))
+
+        default_bytes = 0
+        index_changed = False
+        for (group_name, factor_name, file_path), (df, file_bytes, entry, spreads) in zip(tasks, results):
+            default_bytes += file_bytes
+            source_key = os.path.abspath(file_path)
+            if entry is not None and cache_index.get(source_key) != entry:
+                cache_index[source_key] = entry
+                index_changed = True
+
+            if group_name == 'market_portfolio':
+                data_dict['market_portfolio'] = df
+            else:
+                # Create group if it doesn't exist
+                data_dict.setdefault(group_name, {})[factor_name] = df
+                if spreads is not None:
+                    spread_frames[factor_name] = spreads
+        if spread_frames:
+            data_dict[SPREAD_GROUP] = spread_frames
+
+        if cache_dir is not None and index_changed:
+            try:
+                DataLoader.write_cache_index(cache_dir, cache_index)
+            except OSError:
+                pass
+
+        rss_after = DataLoader.get_resident_memory()
+        frames_bytes = DataLoader.get_frames_memory(
+            {key: value for key, value in data_dict.items() if key != SPREAD_GROUP}
+        )
+        if load_stats is not None:
+            load_stats.update(frames_bytes=frames_bytes, default_bytes=default_bytes,
+                              spread_bytes=DataLoader.get_frames_memory(spread_frames),
+                              rss_before=rss_before, rss_after=rss_after)
+        logger.info(
+            "Loaded data directory %s with dtype profile %r: frames %.1f MB (%.1f MB with "
+            "default dtypes), resident memory %s -> %s",
+            base_path, dtype_profile, frames_bytes / 1e6, default_bytes / 1e6,
+            f"{rss_before / 1e6:.1f} MB" if rss_before is not None else "n/a",
+            f"{rss_after / 1e6:.1f} MB" if rss_after is not None else "n/a",
+        )
         
         return data_dict
 
+    @staticmethod
+    def find_previous_vintage(cache_index, file_path):
+        """Get the cache index key of the latest older vintage of a portfolio file"""
+        directory, file_name = os.path.split(os.path.abspath(file_path))
+        factor_name = DataLoader.get_factor_name(file_name)
+        vintage = DataLoader.get_vintage(file_name)
+        candidates = [
+            key for key in cache_index
+            if os.path.dirname(key) == directory
+            and DataLoader.get_factor_name(os.path.basename(key)) == factor_name
+            and DataLoader.get_vintage(os.path.basename(key)) < vintage
+        ]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda key: DataLoader.get_vintage(os.path.basename(key)))
+
+    @staticmethod
+    def is_revised(previous, current):
+        """Check whether rows of a previous frame changed or disappeared in the current one"""
+        keys = [col for col in previous.columns if col == 'date' or col.startswith('rank_')]
+        previous = previous[previous['date'] <= current['date'].max()]
+        overlap = previous.merge(current, on=keys, how='left', suffixes=('_previous', ''))
+        for col in ['ret_vw', 'nstocks']:
+            if col in previous.columns:
+                before = overlap[f"{col}_previous"].to_numpy(dtype=float)
+                after = overlap[col].to_numpy(dtype=float)
+                if not np.allclose(before, after, equal_nan=True):
+                    return True
+        return False
+
+    @staticmethod
+    def refresh_data_directory(base_path="data", cache_dir=None):
+        """
+        Incrementally bring the columnar cache up to date with the data directory
+
+        Unchanged files are skipped by their cache entry; of files that only had
+        rows appended just the new rows are parsed, and a newer vintage of a
+        file is compared against the cached older vintage.
+
+        Returns one dict per changed file with its group, factor, file_path,
+        status ('appended', 'parsed', 'new_vintage' or 'new_file'), the number of
+        new_rows after the previous sample, whether earlier rows were revised,
+        and the new end_date.
+        """
+        if feather is None:
+            raise RuntimeError("Incremental refresh requires pyarrow for the columnar cache")
+        cache_dir = cache_dir or DataLoader.get_default_cache_dir(base_path)
+        cache_index = DataLoader.read_cache_index(cache_dir)
+
+        tasks = []
+        market_file = DataLoader.find_market_file(base_path)
+        if market_file is not None:
+            tasks.append(('market_portfolio', None, market_file))
+        tasks.extend(DataLoader.iter_portfolio_files(base_path))
+
+        changes = []
+        for group_name, factor_name, file_path in tasks:
+            source_key = os.path.abspath(file_path)
+            file_stat = os.stat(file_path)
+            entry = cache_index.get(source_key)
+            if (entry is not None
+                    and entry['mtime_ns'] == file_stat.st_mtime_ns
+                    and entry['size'] == file_stat.st_size):
+                continue
+
+            previous_key = source_key if entry is not None else DataLoader.find_previous_vintage(
+                cache_index, file_path
+            )
+            previous = None
+            if previous_key is not None:
+                try:
+                    previous = feather.read_table(
+                        os.path.join(cache_dir, cache_index[previous_key]['file'])
+                    ).to_pandas()
+                except (OSError, ValueError):
+                    previous = None
+
+            df, status = DataLoader.sync_portfolio_file(
+                file_path, cache_dir, cache_index,
+                cached=previous if previous_key == source_key else None
+            )
+            if previous is None:
+                status = 'new_file'
+                new_rows, revised = len(df), True
+            else:
+                if entry is None:
+                    status = 'new_vintage'
+                new_rows = int((df['date'] > previous['date'].max()).sum())
+                revised = status != 'appended' and DataLoader.is_revised(previous, df)
+            changes.append({
+                'group': group_name,
+                'factor': factor_name,
+                'file_path': file_path,
+                'status': status,
+                'new_rows': new_rows,
+                'revised': revised,
+                'end_date': df['date'].max(),
+            })
+
+        if changes:
+            try:
+                DataLoader.write_cache_index(cache_dir, cache_index)
+            except OSError:
+                pass
+            # Rebuild the sidebar manifest for the new date ranges and files
+            DataLoader.get_manifest(base_path, cache_dir)
+        logger.info("Refreshed data directory %s: %d changed files", base_path, len(changes))
+        return changes
+
     @staticmethod
     def get_portfolio_columns():
         """Get standard portfolio columns and their descriptions"""
@@ -77,6 +910,8 @@ class DataLoader:
     @staticmethod
     def get_available_ranks(data_dict, group, factor):
         """Get available ranks for a factor"""
+        if isinstance(data_dict, (LazyDataDict, PanelStore)):
+            return dict(data_dict.catalog[(group, factor)]['rank_values'])
         df = data_dict[group][factor]
         rank_columns = [col for col in df.columns if col.startswith('rank_') and col != 'rank_ME']
         ranks = {}
@@ -96,22 +931,89 @@ class DataLoader:
         - rank_ME: Optional market cap rank to filter
         - factor_ranks: Dict of {factor_name: {rank_column: rank_value}}
         """
+        if isinstance(data_dict, PanelStore):
+            return data_dict.get_factor_data(group, factors, rank_ME, factor_ranks)
+
         factor_data = {}
         for factor in factors:
-            df = data_dict[group][factor].copy()
+            df = data_dict[group][factor]
+            mask = None
             
             # Apply market cap filter if specified
             if rank_ME is not None:
-                df = df[df['rank_ME'] == rank_ME]
+                mask = df['rank_ME'].to_numpy() == rank_ME
             
             # Apply factor-specific rank filter if specified
             if factor_ranks and factor in factor_ranks:
                 for rank_col, rank_val in factor_ranks[factor].items():
-                    df = df[df[rank_col] == rank_val]
+                    rank_mask = df[rank_col].to_numpy() == rank_val
+                    mask = rank_mask if mask is None else mask & rank_mask
             
-            factor_data[factor] = df
+            # Selecting rows builds a new frame, so the shared one is never copied
+            factor_data[factor] = df if mask is None else df[mask]
         return factor_data
 
+    @staticmethod
+    def load_selection(data_dict, factors, rank_ME, return_col='ret_vw', market_rank=10):
+        """
+        Load selected factor portfolios and the market portfolio over their common date range
+
+        Parameters:
+        - data_dict: The data dictionary
+        - factors: List of (group, factor, {rank_column: rank_value}) selections
+        - rank_ME: Market cap rank of the factor portfolios
+        - return_col: Return column of the cumulative returns
+        - market_rank: Market cap rank of the market portfolio
+
+        Returns (filtered_data, market_data, min_date, max_date), with the factor
+        frames keyed by display name and carrying a 'cumulative_return' column.
+        """
+        factor_data = {}
+        for group, factor, ranks in factors:
+            group_data = DataLoader.get_factor_data(
+                data_dict,
+                group,
+                [factor],
+                rank_ME,
+                {factor: dict(ranks)} if ranks else None
+            )
+            # Add group prefix to factor names to avoid duplicates
+            factor_data[f"{group}/{factor}"] = group_data[factor]
+
+        market_data = DataLoader.get_market_portfolio(data_dict, market_rank)
+
+        # Get common date range across all selected factors
+        min_date = max(df['date'].min() for df in factor_data.values())
+        max_date = min(df['date'].max() for df in factor_data.values())
+
+        # Filter data by date range and add display names
+        filtered_data = {}
+        for factor, df in factor_data.items():
+            filtered_df = DataLoader.slice_date_range(df, min_date, max_date)
+            filtered_df['cumulative_return'] = (1 + filtered_df[return_col]).cumprod()
+            filtered_data[get_display_name(factor)] = filtered_df
+
+        if market_data is not None:
+            market_data = DataLoader.slice_date_range(market_data, min_date, max_date)
+
+        return filtered_data, market_data, min_date, max_date
+
+    @staticmethod
+    def slice_date_range(df, start_date, end_date):
+        """
+        Get the rows of a frame dated between start_date and end_date (inclusive)
+
+        Date-sorted frames are sliced by position, which returns a view of the
+        data rather than a copy. Other frames fall back to a boolean mask.
+        """
+        dates = df['date']
+        if not dates.is_monotonic_increasing:
+            return df[dates.between(start_date, end_date)]
+        start = dates.searchsorted(start_date, side='left')
+        stop = dates.searchsorted(end_date, side='right')
+        # A shallow copy detaches the view, so callers can add columns to it
+        return df.iloc[start:stop].copy(deep=False)
+
     @staticmethod
     def get_common_columns(df):
         """Get list of available columns excluding standard ones"""
@@ -121,13 +1023,163 @@ class DataLoader:
     @staticmethod
     def get_market_portfolio(data_dict, rank_ME=1):
         """Get market portfolio data for specific rank"""
+        if isinstance(data_dict, PanelStore):
+            return data_dict.get_market_portfolio(rank_ME)
         if 'market_portfolio' in data_dict:
             market_data = data_dict['market_portfolio']
-            return market_data[market_data['rank_ME'] == rank_ME].copy()
+            return market_data[market_data['rank_ME'].to_numpy() == rank_ME]
         return None
 
     @staticmethod
     def get_available_market_caps(data_dict, group, factor):
         """Get available market cap ranks for a factor"""
+        if isinstance(data_dict, (LazyDataDict, PanelStore)):
+            entry = data_dict.catalog.get((group, factor))
+            return list(entry['market_caps']) if entry else None
         if group in data_dict and factor in data_dict[group]:
-            return sorted(data_dict[group][factor]['rank_ME'].unique()) 
\ No newline at end of file
+            return sorted(data_dict[group][factor]['rank_ME'].unique())
+
+
+class LazyFactorGroup(Mapping):
+    """Read-only mapping of factor name to frame, loading each frame on first access"""
+
+    def __init__(self, owner, group):
+        self._owner = owner
+        self._group = group
+        self._factors = [factor for g, factor in owner.catalog if g == group]
+
+    def __getitem__(self, factor):
+        if factor not in self._factors:
+            raise KeyError(factor)
+        return self._owner.load_factor(self._group, factor)
+
+    def __contains__(self, factor):
+        return factor in self._factors
+
+    def __iter__(self):
+        return iter(self._factors)
+
+    def __len__(self):
+        return len(self._factors)
+
+
+class LazyDataDict(Mapping):
+    """
+    Drop-in replacement for the nested data_dict that loads frames on demand
+
+    data_dict[group][factor] and data_dict['market_portfolio'] behave as with the
+    eager loader, while the catalog answers metadata queries without loading data.
+    """
+
+    def __init__(self, catalog, market_file=None, cache_dir=None, dtype_profile='default'):
+        self.catalog = catalog
+        self.market_file = market_file
+        self.cache_dir = cache_dir
+        self.dtype_profile = dtype_profile
+        self._cache_index = DataLoader.read_cache_index(cache_dir) if cache_dir else None
+        self._frames = {}
+        self._lock = threading.Lock()
+
+        self._groups = {}
+        if market_file is not None:
+            self._groups['market_portfolio'] = None
+        for group, _ in catalog:
+            if group not in self._groups:
+                self._groups[group] = LazyFactorGroup(self, group)
+
+    def _load(self, key, file_path, spreads=False):
+        with self._lock:
+            if key not in self._frames:
+                source_key = os.path.abspath(file_path)
+                previous_entry = (self._cache_index.get(source_key)
+                                  if self._cache_index is not None else None)
+                load = DataLoader.load_portfolio_spreads if spreads else DataLoader.load_portfolio_file
+                self._frames[key] = DataLoader.freeze_frame(DataLoader.apply_dtype_profile(
+                    load(file_path, self.cache_dir, self._cache_index),
+                    self.dtype_profile
+                ))
+                if (self._cache_index is not None
+                        and self._cache_index.get(source_key) != previous_entry):
+                    try:
+                        DataLoader.write_cache_index(self.cache_dir, self._cache_index)
+                    except OSError:
+                        pass
+            return self._frames[key].copy(deep=False)
+
+    def load_factor(self, group, factor):
+        """Get the frame of a factor, loading it on first use"""
+        return self._load((group, factor), self.catalog[(group, factor)]['file_path'],
+                          spreads=group == SPREAD_GROUP)
+
+    def loaded_factors(self):
+        """Get the (group, factor) keys that have been loaded so far"""
+        return [key for key in self._frames if key != 'market_portfolio']
+
+    def __getitem__(self, key):
+        if key == 'market_portfolio' and self.market_file is not None:
+            return self._load('market_portfolio', self.market_file)
+        return self._groups[key]
+
+    def __contains__(self, key):
+        return key in self._groups
+
+    def __iter__(self):
+        return iter(self._groups)
+
+    def __len__(self):
+        return len(self._groups)
+
+
+class FrozenFactorGroup(Mapping):
+    """Read-only mapping of factor name to a view of its frozen frame"""
+
+    def __init__(self, frames):
+        self._frames = frames
+
+    def __getitem__(self, factor):
+        return self._frames[factor].copy(deep=False)
+
+    def __contains__(self, factor):
+        return factor in self._frames
+
+    def __iter__(self):
+        return iter(self._frames)
+
+    def __len__(self):
+        return len(self._frames)
+
+
+class FrozenDataDict(Mapping):
+    """
+    Read-only version of the nested data_dict, shared by all sessions
+
+    Every frame is frozen with DataLoader.freeze_frame and each access returns
+    a shallow view of it: columns added to the view stay local to the caller,
+    while in-place writes to the shared values raise.
+    """
+
+    def __init__(self, data_dict):
+        self._groups = {}
+        self._market = None
+        for group, factors in data_dict.items():
+            if group == 'market_portfolio':
+                self._market = DataLoader.freeze_frame(factors)
+                self._groups[group] = None
+            else:
+                self._groups[group] = FrozenFactorGroup({
+                    factor: DataLoader.freeze_frame(df) for factor, df in factors.items()
+                })
+
+    def __getitem__(self, key):
+        if key == 'market_portfolio' and self._market is not None:
+            return self._market.copy(deep=False)
+        return self._groups[key]
+
+    def __contains__(self, key):
+        return key in self._groups
+
+    def __iter__(self):
+        return iter(self._groups)
+
+    def __len__(self):
+        return len(self._groups)
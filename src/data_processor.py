@@ -60,4 +60,120 @@ class DataProcessor:
         # Calculate correlation matrix
         corr_matrix = excess_returns.corr()
         
-        return corr_matrix 
\ No newline at end of file
+        return corr_matrix 
+
+    @staticmethod
+    def get_date_indexed(df):
+        """Get a frame indexed by date whether date is the index or a column"""
+        if isinstance(df.index, pd.DatetimeIndex) or 'date' not in df.columns:
+            return df
+        return df.set_index('date')
+
+    @staticmethod
+    def build_return_matrix(factor_data, return_col='ret_vw'):
+        """
+        Build a wide date x portfolio return matrix from a dict of portfolio frames
+
+        Portfolios are aligned on date in a single outer join; months a portfolio
+        does not cover are NaN.
+        """
+        columns = {
+            name: DataProcessor.get_date_indexed(df)[return_col]
+            for name, df in factor_data.items()
+        }
+        if not columns:
+            return pd.DataFrame(dtype=float)
+        matrix = pd.concat(columns, axis=1).sort_index()
+        return matrix.astype(float)
+
+    @staticmethod
+    def calculate_moments_matrix(values):
+        """
+        Calculate NaN-aware column moments of a 2-D array in one pass
+
+        Returns count, mean, sample std, skewness and excess kurtosis per column,
+        using the same bias corrections as pandas Series.skew and Series.kurtosis.
+        """
+        mask = ~np.isnan(values)
+        count = mask.sum(axis=0).astype(float)
+        filled = np.where(mask, values, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = filled.sum(axis=0) / count
+            demeaned = np.where(mask, values - mean, 0.0)
+            m2 = (demeaned ** 2).sum(axis=0)
+            m3 = (demeaned ** 3).sum(axis=0)
+            m4 = (demeaned ** 4).sum(axis=0)
+            std = np.sqrt(m2 / (count - 1))
+
+            skew = (count * (count - 1) ** 0.5 / (count - 2)) * (m3 / m2 ** 1.5)
+            skew = np.where(m2 == 0, 0.0, skew)
+            skew = np.where(count < 3, np.nan, skew)
+
+            adj = 3 * (count - 1) ** 2 / ((count - 2) * (count - 3))
+            kurt = (count * (count + 1) * (count - 1) * m4) / ((count - 2) * (count - 3) * m2 ** 2) - adj
+            kurt = np.where(m2 == 0, 0.0, kurt)
+            kurt = np.where(count < 4, np.nan, kurt)
+
+        std = np.where(count < 2, np.nan, std)
+        mean = np.where(count < 1, np.nan, mean)
+        return count, mean, std, skew, kurt
+
+    @staticmethod
+    def calculate_statistics_matrix(returns, market_returns=None, nstocks=None):
+        """
+        Calculate the calculate_statistics table for every column of a return matrix
+
+        Parameters:
+        - returns: Wide date x portfolio return matrix (see build_return_matrix)
+        - market_returns: Optional date-indexed market return series
+        - nstocks: Optional wide date x portfolio matrix of stock counts
+        """
+        values = returns.to_numpy(dtype=float)
+        _, mean, std, skew, kurt = DataProcessor.calculate_moments_matrix(values)
+        mean_return = mean * 12  # Annualize
+        volatility = std * np.sqrt(12)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(volatility != 0, mean_return / volatility, 0)
+
+        n_cols = values.shape[1]
+        if market_returns is not None:
+            market = market_returns.reindex(returns.index).to_numpy(dtype=float)
+            excess = values - market[:, None]
+            _, mean_excess, vol_excess, _, _ = DataProcessor.calculate_moments_matrix(excess)
+            mean_excess = mean_excess * 12
+            vol_excess = vol_excess * np.sqrt(12)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ir = np.where(vol_excess != 0, mean_excess / vol_excess, 0)
+            mean_excess = mean_excess * 100
+            vol_excess = vol_excess * 100
+        else:
+            mean_excess = vol_excess = ir = np.full(n_cols, np.nan)
+
+        if nstocks is not None:
+            avg_nstocks = nstocks.reindex(columns=returns.columns).mean().to_numpy(dtype=float)
+        else:
+            avg_nstocks = np.full(n_cols, np.nan)
+
+        return pd.DataFrame({
+            'Mean Return (% p.a.)': mean_return * 100,
+            'Volatility (% p.a.)': volatility * 100,
+            'Sharpe Ratio': sharpe,
+            'Skewness': skew,
+            'Kurtosis': kurt,
+            'Excess Return (% p.a.)': mean_excess,
+            'Tracking Error (% p.a.)': vol_excess,
+            'Information Ratio': ir,
+            'Average N Stocks': avg_nstocks,
+        }, index=returns.columns).T
+
+    @staticmethod
+    def calculate_excess_correlation_matrix(returns, market_returns):
+        """Calculate the correlation matrix of excess returns from a return matrix"""
+        market = market_returns.reindex(returns.index)
+        excess = returns.sub(market, axis=0)
+        excess = excess[market.notna()]
+        values = excess.to_numpy(dtype=float)
+        if len(values) > 1 and not np.isnan(values).any():
+            return pd.DataFrame(np.corrcoef(values, rowvar=False),
+                                index=returns.columns, columns=returns.columns)
+        return excess.corr()
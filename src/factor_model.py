@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+from src.data_loader import DataLoader
+
+# Long-short spreads of the q-factor model (Hou, Xue and Zhang) built from the
+# bundled size x characteristic portfolio grids. Each leg is the equal-weighted
+# average of the grid portfolios at that rank; 'rank' is the grid's own
+# characteristic rank column (e.g. rank_IA). The market factor is the market
+# portfolio itself.
+Q_FACTOR_SPREADS = {
+    'ME': {'group': 'me_inv', 'factor': 'me_ia', 'rank_col': 'rank_ME', 'long': 1, 'short': 3},
+    'IA': {'group': 'me_inv', 'factor': 'me_ia', 'rank_col': 'rank', 'long': 1, 'short': 5},
+    'ROE': {'group': 'me_prof', 'factor': 'me_roe_1', 'rank_col': 'rank', 'long': 5, 'short': 1},
+}
+MARKET_FACTOR = 'MKT'
+
+
+class FactorModel:
+    @staticmethod
+    def find_group(data_dict, name):
+        """Get the group of a data dict whose name is name or name plus a vintage suffix"""
+        groups = [
+            group for group in DataLoader.get_available_groups(data_dict)
+            if group == name or group.startswith(name + '_')
+        ]
+        return max(groups) if groups else None
+
+    @staticmethod
+    def build_spread(data_dict, spread, return_col='ret_vw'):
+        """
+        Build the date-indexed return series of a long-short spread
+
+        Parameters:
+        - data_dict: The data dictionary
+        - spread: Dict with the 'group' and 'factor' of the portfolio grid, the
+          'rank_col' the legs are taken on ('rank' for the factor's own rank
+          column) and the 'long' and 'short' rank values
+        - return_col: Return column to use
+        """
+        group = FactorModel.find_group(data_dict, spread['group'])
+        if group is None or spread['factor'] not in data_dict[group]:
+            raise KeyError(f"Portfolio grid {spread['group']}/{spread['factor']} not found")
+        df = data_dict[group][spread['factor']]
+        rank_col = spread['rank_col']
+        if rank_col == 'rank':
+            rank_col = next(col for col in df.columns if col.startswith('rank_') and col != 'rank_ME')
+
+        ranks = df[rank_col].to_numpy()
+        legs = []
+        for rank in (spread['long'], spread['short']):
+            leg = df[ranks == rank]
+            legs.append(leg.groupby('date')[return_col].mean())
+        return (legs[0] - legs[1]).dropna()
+
+    @staticmethod
+    def build_factor_returns(data_dict, return_col='ret_vw', market_rank=10, spreads=None):
+        """
+        Build the date x factor return matrix of a factor model
+
+        The first column is the market portfolio of market_rank, followed by one
+        column per spread (Q_FACTOR_SPREADS by default). Only months in which
+        every factor has a return are kept.
+        """
+        spreads = Q_FACTOR_SPREADS if spreads is None else spreads
+        market_data = DataLoader.get_market_portfolio(data_dict, market_rank)
+        if market_data is None:
+            raise KeyError("Market portfolio not found")
+        columns = {MARKET_FACTOR: market_data.set_index('date')[return_col]}
+        for name, spread in spreads.items():
+            columns[name] = FactorModel.build_spread(data_dict, spread, return_col)
+        factors = pd.DataFrame(columns).dropna().astype(float)
+        factors.index.name = 'date'
+        return factors
+
+    @staticmethod
+    def regress(returns, factors, annual_factor=12):
+        """
+        Regress every column of a return matrix on the same factors at once
+
+        Each portfolio uses the months in which it and every factor have a
+        return. The design matrix (intercept plus factors) is shared: the normal
+        equations of all portfolios are built with two matrix products and
+        solved in one batched pseudo-inverse. For a portfolio without missing
+        returns the results match a separate OLS regression.
+
+        Parameters:
+        - returns: Wide date x portfolio return matrix
+        - factors: Date x factor return matrix (see build_factor_returns)
+        - annual_factor: Periods per year used to annualize the alpha
+
+        Returns a frame indexed by portfolio with the annual alpha (%), its
+        t-stat, the loading and t-stat of every factor, R-squared, adjusted
+        R-squared and the number of months.
+        """
+        factor_values = factors.reindex(returns.index).to_numpy(dtype=float)
+        values = returns.to_numpy(dtype=float)
+        n_dates, n_factors = factor_values.shape
+        n_params = n_factors + 1
+
+        design = np.column_stack([np.ones(n_dates), np.nan_to_num(factor_values)])
+        mask = ~np.isnan(values) & ~np.isnan(factor_values).any(axis=1)[:, None]
+        weights = mask.astype(float)
+        y = np.where(mask, values, 0.0)
+
+        # Per-portfolio X'X from the outer products of the design rows, and X'y
+        outer = (design[:, :, None] * design[:, None, :]).reshape(n_dates, -1)
+        gram = (weights.T @ outer).reshape(-1, n_params, n_params)
+        xty = y.T @ design
+        n = weights.sum(axis=0)
+
+        inverse = np.linalg.pinv(gram)
+        coefs = np.einsum('pij,pj->pi', inverse, xty)
+
+        residuals = np.where(mask, values - design @ coefs.T, 0.0)
+        sse = (residuals ** 2).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_y = y.sum(axis=0) / n
+            sst = (np.where(mask, values - mean_y, 0.0) ** 2).sum(axis=0)
+            dof = n - n_params
+            valid = dof > 0
+            r_squared = np.where(valid, 1 - sse / sst, np.nan)
+            adj_r_squared = np.where(valid, 1 - (1 - r_squared) * (n - 1) / dof, np.nan)
+            sigma2 = np.where(valid, sse / dof, np.nan)
+            std_errors = np.sqrt(sigma2[:, None] * np.diagonal(inverse, axis1=1, axis2=2))
+            t_stats = coefs / std_errors
+        coefs = np.where(valid[:, None], coefs, np.nan)
+
+        results = {
+            'Annual Alpha (%)': coefs[:, 0] * annual_factor * 100,
+            'Alpha t-stat': t_stats[:, 0],
+        }
+        for i, name in enumerate(factors.columns, start=1):
+            results[f'{name} Beta'] = coefs[:, i]
+            results[f'{name} t-stat'] = t_stats[:, i]
+        results['R-Squared'] = r_squared
+        results['Adj. R-Squared'] = adj_r_squared
+        results['Months'] = n.astype(int)
+        return pd.DataFrame(results, index=returns.columns)
@@ -0,0 +1,125 @@
+import os
+import functools
+import inspect
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+class LRUCache:
+    """Thread-safe mapping with a bounded size and least-recently-used eviction"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        """Get a cached value and mark it as most recently used"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries beyond maxsize"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Get a cached value, computing and storing it on a miss"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drop every entry and reset the hit counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Get size and hit statistics of the cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else None,
+            }
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Per-process memo of analytics results keyed on the user's selection. It lives
+# in an imported module so it survives Streamlit reruns of the app script, and
+# its entries are shared between sessions.
+ANALYTICS_CACHE = LRUCache(maxsize=int(os.environ.get("GQE_ANALYTICS_CACHE_SIZE", "256")))
+
+# Per-process memo of built Plotly figures, keyed like ANALYTICS_CACHE on the
+# selection a figure was built from (its fingerprint). Figures are large, so they
+# get their own bound and do not evict the analytics they are built from.
+FIGURE_CACHE = LRUCache(maxsize=int(os.environ.get("GQE_FIGURE_CACHE_SIZE", "64")))
+
+
+def freeze(value):
+    """Convert a selection argument into a hashable cache key component"""
+    if isinstance(value, dict):
+        return tuple(sorted((freeze(k), freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(freeze(v) for v in value))
+    if isinstance(value, float):
+        # Weights typed into number inputs differ only in float noise
+        return round(value, 12)
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if hasattr(value, 'item') and not hasattr(value, '__len__'):
+        return value.item()
+    return value
+
+
+def memoize(cache):
+    """
+    Memoize a function in an LRUCache, keyed on its selection arguments
+
+    As with Streamlit's caching decorators, arguments whose name starts with an
+    underscore (e.g. the data dict) are excluded from the key. Cached values are
+    shared between callers and must be treated as read-only.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (func.__qualname__,) + tuple(
+                (name, freeze(value)) for name, value in bound.arguments.items()
+                if not name.startswith('_')
+            )
+            return cache.get_or_compute(key, lambda: func(*args, **kwargs))
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
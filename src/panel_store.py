@@ -0,0 +1,342 @@
+import os
+import json
+import pandas as pd
+import numpy as np
+from collections.abc import Mapping
+
+# Generic name of the factor rank column inside the consolidated panel
+PANEL_RANK_COLUMN = 'rank_factor'
+
+# Compact dtypes used for the consolidated panel
+PANEL_DTYPES = {
+    'year': 'int16',
+    'month': 'int8',
+    'rank_ME': 'int8',
+    PANEL_RANK_COLUMN: 'int8',
+    'nstocks': 'int32',
+    'ret_vw': 'float64',
+}
+
+# Written last when a panel is saved, so its presence marks a complete directory
+PANEL_MANIFEST_FILE = 'manifest.json'
+
+
+class PanelGroup(Mapping):
+    """Read-only mapping of factor name to frame, sliced out of the panel on access"""
+
+    def __init__(self, store, group):
+        self._store = store
+        self._group = group
+        self._factors = [factor for g, factor in store.catalog if g == group]
+
+    def __getitem__(self, factor):
+        if factor not in self._factors:
+            raise KeyError(factor)
+        return self._store.select(self._group, factor)
+
+    def __contains__(self, factor):
+        return factor in self._factors
+
+    def __iter__(self):
+        return iter(self._factors)
+
+    def __len__(self):
+        return len(self._factors)
+
+
+class PanelStore(Mapping):
+    """
+    All factor portfolios in one sorted, compactly typed long-format panel
+
+    Rows are sorted by (group, factor, rank_ME, factor rank, date) and a slice
+    offset table maps every prefix of that key to a contiguous row range, so a
+    single portfolio series is selected without scanning or copying the panel.
+    The store also behaves like the nested data_dict of the eager loader.
+    """
+
+    def __init__(self, panel, rank_columns, offsets, market_data=None, market_offsets=None):
+        self.panel = panel
+        self.rank_columns = rank_columns
+        self.offsets = offsets
+        self.market_data = market_data
+        self.market_offsets = market_offsets or {}
+        # Directory of the memory-mapped files when opened with open_mmap
+        self.source = None
+        self.catalog = PanelStore.build_catalog(panel, rank_columns, offsets)
+        self._columns = {col: panel[col].to_numpy() for col in panel.columns
+                         if col not in ('group', 'factor')}
+
+        self._groups = {}
+        if market_data is not None:
+            self._groups['market_portfolio'] = None
+        for group, _ in self.catalog:
+            if group not in self._groups:
+                self._groups[group] = PanelGroup(self, group)
+
+    @staticmethod
+    def compact_frame(df, rank_col=None):
+        """Rename the factor rank column and downcast to the panel dtypes"""
+        if rank_col is not None:
+            df = df.rename(columns={rank_col: PANEL_RANK_COLUMN})
+        return df.astype({col: dtype for col, dtype in PANEL_DTYPES.items() if col in df.columns})
+
+    @staticmethod
+    def compute_offsets(keys):
+        """
+        Build the slice offset table for sorted key columns
+
+        Returns a dict mapping every key prefix (length 2 up to the full key) to
+        a (start, stop) row range.
+        """
+        n_rows = len(keys[0])
+        offsets = {}
+        if n_rows == 0:
+            return offsets
+        change = np.zeros(n_rows, dtype=bool)
+        change[0] = True
+        for depth in range(len(keys)):
+            change[1:] |= keys[depth][1:] != keys[depth][:-1]
+            if depth < 1:
+                continue
+            starts = np.flatnonzero(change)
+            stops = np.append(starts[1:], n_rows)
+            columns = [key[starts] for key in keys[:depth + 1]]
+            for i, (start, stop) in enumerate(zip(starts, stops)):
+                prefix = tuple(col[i].item() if hasattr(col[i], 'item') else col[i] for col in columns)
+                offsets[prefix] = (int(start), int(stop))
+        return offsets
+
+    @staticmethod
+    def from_data_dict(data_dict):
+        """Consolidate a nested data_dict into a single panel store"""
+        frames = []
+        rank_columns = {}
+        for group, factors in data_dict.items():
+            if group == 'market_portfolio':
+                continue
+            for factor, df in factors.items():
+                factor_rank_cols = [col for col in df.columns
+                                    if col.startswith('rank_') and col != 'rank_ME']
+                rank_col = factor_rank_cols[0] if factor_rank_cols else None
+                rank_columns[(group, factor)] = rank_col
+                frame = PanelStore.compact_frame(df, rank_col)
+                if PANEL_RANK_COLUMN not in frame.columns:
+                    frame[PANEL_RANK_COLUMN] = np.int8(0)
+                frame.insert(0, 'factor', factor)
+                frame.insert(0, 'group', group)
+                frames.append(frame)
+
+        panel = pd.concat(frames, ignore_index=True)
+        panel['group'] = panel['group'].astype('category')
+        panel['factor'] = panel['factor'].astype('category')
+        panel = panel.sort_values(
+            ['group', 'factor', 'rank_ME', PANEL_RANK_COLUMN, 'date'], kind='stable'
+        ).reset_index(drop=True)
+        offsets = PanelStore.compute_offsets([
+            panel['group'].astype(str).to_numpy(),
+            panel['factor'].astype(str).to_numpy(),
+            panel['rank_ME'].to_numpy(),
+            panel[PANEL_RANK_COLUMN].to_numpy(),
+        ])
+
+        market_data = None
+        market_offsets = None
+        if 'market_portfolio' in data_dict:
+            market_data = PanelStore.compact_frame(data_dict['market_portfolio'])
+            market_data = market_data.sort_values(['rank_ME', 'date'], kind='stable')
+            market_data = market_data.reset_index(drop=True)
+            rank_me = market_data['rank_ME'].to_numpy()
+            market_offsets = {}
+            starts = np.flatnonzero(np.r_[True, rank_me[1:] != rank_me[:-1]])
+            stops = np.append(starts[1:], len(rank_me))
+            for start, stop in zip(starts, stops):
+                market_offsets[int(rank_me[start])] = (int(start), int(stop))
+
+        return PanelStore(panel, rank_columns, offsets, market_data, market_offsets)
+
+    @staticmethod
+    def build_catalog(panel, rank_columns, offsets):
+        """Derive the factor catalog (ranks and date ranges) from the offset table"""
+        market_caps = {}
+        rank_values = {}
+        for key in offsets:
+            if len(key) == 3:
+                market_caps.setdefault(key[:2], []).append(key[2])
+            elif len(key) == 4:
+                rank_values.setdefault(key[:2], set()).add(key[3])
+
+        catalog = {}
+        dates = panel['date'].to_numpy()
+        for (group, factor), rank_col in rank_columns.items():
+            start, stop = offsets[(group, factor)]
+            catalog[(group, factor)] = {
+                'group': group,
+                'factor': factor,
+                'rank_columns': [rank_col] if rank_col else [],
+                'rank_values': ({rank_col: sorted(rank_values.get((group, factor), []))}
+                                if rank_col else {}),
+                'market_caps': sorted(market_caps.get((group, factor), [])),
+                'start_date': pd.Timestamp(dates[start:stop].min()),
+                'end_date': pd.Timestamp(dates[start:stop].max()),
+            }
+        return catalog
+
+    def save(self, directory):
+        """
+        Write the panel as one .npy file per column plus a JSON manifest
+
+        The files can be memory-mapped read-only by any number of processes with
+        open_mmap. Category columns are stored as their integer codes.
+        """
+        os.makedirs(directory, exist_ok=True)
+        categories = {}
+        for col in self.panel.columns:
+            values = self.panel[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                categories[col] = [str(c) for c in values.cat.categories]
+                values = values.cat.codes
+            np.save(os.path.join(directory, f"panel_{col}.npy"), values.to_numpy())
+
+        market_columns = []
+        if self.market_data is not None:
+            market_columns = list(self.market_data.columns)
+            for col in market_columns:
+                np.save(os.path.join(directory, f"market_{col}.npy"),
+                        self.market_data[col].to_numpy())
+
+        manifest = {
+            'columns': list(self.panel.columns),
+            'categories': categories,
+            'rank_columns': [[group, factor, rank_col]
+                             for (group, factor), rank_col in self.rank_columns.items()],
+            'offsets': [list(key) + list(bounds) for key, bounds in self.offsets.items()],
+            'market_columns': market_columns,
+            'market_offsets': [[rank, start, stop]
+                               for rank, (start, stop) in self.market_offsets.items()],
+        }
+        with open(os.path.join(directory, PANEL_MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f)
+
+    @staticmethod
+    def open_mmap(directory):
+        """
+        Open a saved panel with every column memory-mapped read-only
+
+        The frames wrap the mapped arrays without copying them, so all sessions
+        and processes that open the same directory share one copy of the data in
+        the OS page cache. A store opened this way pickles as its directory path,
+        so process-pool workers re-open the mapping instead of receiving a copy.
+        """
+        with open(os.path.join(directory, PANEL_MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+
+        def load_columns(prefix, columns):
+            data = {}
+            for col in columns:
+                values = np.load(os.path.join(directory, f"{prefix}_{col}.npy"), mmap_mode='r')
+                if col in manifest['categories']:
+                    values = pd.Categorical.from_codes(
+                        values, manifest['categories'][col], validate=False
+                    )
+                data[col] = values
+            return pd.DataFrame(data, copy=False)
+
+        panel = load_columns('panel', manifest['columns'])
+        market_data = None
+        if manifest['market_columns']:
+            market_data = load_columns('market', manifest['market_columns'])
+
+        store = PanelStore(
+            panel,
+            {(group, factor): rank_col for group, factor, rank_col in manifest['rank_columns']},
+            {tuple(entry[:-2]): (entry[-2], entry[-1]) for entry in manifest['offsets']},
+            market_data,
+            {rank: (start, stop) for rank, start, stop in manifest['market_offsets']},
+        )
+        store.source = os.path.abspath(directory)
+        return store
+
+    def __reduce_ex__(self, protocol):
+        if self.source is not None:
+            return (PanelStore.open_mmap, (self.source,))
+        return super().__reduce_ex__(protocol)
+
+    def _to_factor_frame(self, group, factor, rows):
+        """Build a frame with the per-factor column layout of the eager loader"""
+        rank_col = self.rank_columns[(group, factor)]
+        data = {}
+        for col, values in self._columns.items():
+            if col == PANEL_RANK_COLUMN:
+                if rank_col is None:
+                    continue
+                col = rank_col
+            data[col] = values[rows]
+        return pd.DataFrame(data, copy=False)
+
+    def select(self, group, factor, rank_ME=None, rank_value=None):
+        """
+        Select the rows of one factor, optionally narrowed to a size and factor rank
+
+        Parameters:
+        - group: The group name
+        - factor: The factor name
+        - rank_ME: Optional market cap rank
+        - rank_value: Optional value of the factor rank column
+        """
+        if rank_ME is not None and rank_value is not None:
+            start, stop = self.offsets.get((group, factor, rank_ME, rank_value), (0, 0))
+            return self._to_factor_frame(group, factor, slice(start, stop))
+
+        if rank_ME is not None:
+            start, stop = self.offsets.get((group, factor, rank_ME), (0, 0))
+            rows = np.arange(start, stop)
+        else:
+            start, stop = self.offsets[(group, factor)]
+            rows = np.arange(start, stop)
+            if rank_value is not None:
+                rows = rows[self._columns[PANEL_RANK_COLUMN][rows] == rank_value]
+        # Restore the (date, rank_ME, rank) row order of the source files
+        order = np.lexsort((self._columns['rank_ME'][rows], self._columns['date'][rows]))
+        return self._to_factor_frame(group, factor, rows[order])
+
+    def get_factor_data(self, group, factors, rank_ME=None, factor_ranks=None):
+        """Offset-table backed equivalent of DataLoader.get_factor_data"""
+        factor_data = {}
+        for factor in factors:
+            rank_value = None
+            if factor_ranks and factor in factor_ranks:
+                for rank_col, rank_val in factor_ranks[factor].items():
+                    if rank_col != self.rank_columns[(group, factor)]:
+                        raise KeyError(rank_col)
+                    rank_value = rank_val
+            factor_data[factor] = self.select(group, factor, rank_ME, rank_value)
+        return factor_data
+
+    def get_market_portfolio(self, rank_ME=1):
+        """Get market portfolio rows for a market cap rank"""
+        if self.market_data is None:
+            return None
+        start, stop = self.market_offsets.get(rank_ME, (0, 0))
+        return self.market_data.iloc[start:stop].reset_index(drop=True)
+
+    def memory_usage(self):
+        """Get the deep memory usage of the panel in bytes"""
+        total = int(self.panel.memory_usage(deep=True).sum())
+        if self.market_data is not None:
+            total += int(self.market_data.memory_usage(deep=True).sum())
+        return total
+
+    def __getitem__(self, key):
+        if key == 'market_portfolio' and self.market_data is not None:
+            # Present the market rows in the (date, rank) order of the source file
+            return self.market_data.sort_values(['date', 'rank_ME'], kind='stable')
+        return self._groups[key]
+
+    def __contains__(self, key):
+        return key in self._groups
+
+    def __iter__(self):
+        return iter(self._groups)
+
+    def __len__(self):
+        return len(self._groups)
@@ -0,0 +1,320 @@
+import pandas as pd
+import numpy as np
+from scipy import optimize
+
+# Optimizer objectives offered for the multifactor portfolio
+OPTIMIZER_OBJECTIVES = {
+    'Max Sharpe Ratio': 'max_sharpe',
+    'Min Variance': 'min_variance',
+    'Risk Parity': 'risk_parity',
+    'Max Information Ratio': 'max_ir',
+}
+
+
+class PortfolioBuilder:
+    @staticmethod
+    def get_return_columns(df):
+        """Get the return columns of a portfolio frame"""
+        return [col for col in df.columns if col.startswith('ret_')]
+
+    @staticmethod
+    def get_date_keys(df):
+        """Get the dates of a portfolio frame (column or index) as int64 nanoseconds"""
+        dates = df['date'] if 'date' in df.columns else df.index
+        return np.asarray(dates, dtype='datetime64[ns]').view('i8')
+
+    @staticmethod
+    def get_common_dates(factor_data):
+        """Get the sorted dates shared by every portfolio frame"""
+        keys = [np.unique(PortfolioBuilder.get_date_keys(df)) for df in factor_data.values()]
+        if not keys:
+            return pd.DatetimeIndex([])
+        unique_keys, counts = np.unique(np.concatenate(keys), return_counts=True)
+        common = unique_keys[counts == len(keys)]
+        return pd.DatetimeIndex(common.view('datetime64[ns]'))
+
+    @staticmethod
+    def align_returns(factor_data, return_col='ret_vw', dates=None):
+        """
+        Align portfolio returns into a date x factor matrix in one pass
+
+        Parameters:
+        - factor_data: Dict of {factor_name: DataFrame} with a date column or index
+        - return_col: Return column to align
+        - dates: Optional target dates, defaults to the dates common to all factors
+
+        Returns the (n_dates, n_factors) float array and the target dates; dates a
+        factor does not cover are NaN.
+        """
+        if dates is None:
+            dates = PortfolioBuilder.get_common_dates(factor_data)
+        targets = np.asarray(dates, dtype='datetime64[ns]').view('i8')
+        matrix = np.full((len(targets), len(factor_data)), np.nan)
+        for i, df in enumerate(factor_data.values()):
+            keys = PortfolioBuilder.get_date_keys(df)
+            values = df[return_col].to_numpy(dtype=float)
+            if len(keys) > 1 and (np.diff(keys) < 0).any():
+                order = np.argsort(keys, kind='stable')
+                keys, values = keys[order], values[order]
+            if len(keys) == 0:
+                continue
+            positions = np.minimum(np.searchsorted(keys, targets), len(keys) - 1)
+            found = keys[positions] == targets
+            matrix[found, i] = values[positions[found]]
+        return matrix, dates
+
+    @staticmethod
+    def get_weight_vector(factor_names, weights=None):
+        """Get weights as an array ordered like factor_names, equal weights by default"""
+        factor_names = list(factor_names)
+        if weights is None:
+            return np.full(len(factor_names), 1 / len(factor_names))
+        return np.array([weights[factor] for factor in factor_names], dtype=float)
+
+    @staticmethod
+    def create_multifactor_portfolio(factor_data, weights=None):
+        """
+        Create a multifactor portfolio from factor returns with given weights
+
+        All factor returns are aligned once on their common dates and blended
+        with a single matrix-vector product per return column.
+        """
+        weight_vector = PortfolioBuilder.get_weight_vector(factor_data.keys(), weights)
+        first_factor = next(iter(factor_data.values()))
+        return_cols = PortfolioBuilder.get_return_columns(first_factor)
+
+        common_dates = PortfolioBuilder.get_common_dates(factor_data)
+        result = pd.DataFrame({'date': common_dates})
+        for col in return_cols:
+            matrix, _ = PortfolioBuilder.align_returns(factor_data, col, common_dates)
+            result[col] = matrix @ weight_vector
+
+        # Calculate cumulative return
+        result['cumulative_return'] = (1 + result[return_cols[0]]).cumprod()
+        return result
+
+
+class PortfolioOptimizer:
+    @staticmethod
+    def estimate_moments(returns, market_returns=None, annual_factor=12):
+        """
+        Estimate annualized means and covariances of aligned factor returns
+
+        Parameters:
+        - returns: (n_dates, n_factors) return matrix
+        - market_returns: Optional (n_dates,) market returns for the active (IR) moments
+        - annual_factor: Periods per year used for annualization
+
+        Months with a missing factor or market return are dropped.
+        """
+        returns = np.asarray(returns, dtype=float)
+        valid = ~np.isnan(returns).any(axis=1)
+        if market_returns is not None:
+            market_returns = np.asarray(market_returns, dtype=float)
+            valid &= ~np.isnan(market_returns)
+        returns = returns[valid]
+
+        moments = {
+            'mean': returns.mean(axis=0) * annual_factor,
+            'cov': np.atleast_2d(np.cov(returns, rowvar=False)) * annual_factor,
+        }
+        if market_returns is not None:
+            active = returns - market_returns[valid][:, None]
+            moments['active_mean'] = active.mean(axis=0) * annual_factor
+            moments['active_cov'] = np.atleast_2d(np.cov(active, rowvar=False)) * annual_factor
+        return moments
+
+    @staticmethod
+    def get_bounds(n_assets, long_only=True, max_weight=None):
+        """
+        Get the (lower, upper) weight bounds of every factor
+
+        Short positions, if allowed, are limited by the same cap as long ones
+        (100% without a cap).
+        """
+        upper = 1.0 if max_weight is None else float(max_weight)
+        if upper * n_assets < 1 - 1e-9:
+            raise ValueError(f"A weight cap of {upper:.2%} cannot be met with {n_assets} factors")
+        lower = 0.0 if long_only else -upper
+        return lower, upper
+
+    @staticmethod
+    def project_weights(weights, lower, upper, n_iter=60):
+        """
+        Project rows of a weight matrix onto {sum(w) = 1, lower <= w <= upper}
+
+        Finds the shift tau with sum(clip(w - tau, lower, upper)) = 1 for all
+        rows at once by bisection.
+        """
+        weights = np.atleast_2d(np.asarray(weights, dtype=float))
+        tau_low = (weights - upper).min(axis=1, keepdims=True)
+        tau_high = (weights - lower).max(axis=1, keepdims=True)
+        for _ in range(n_iter):
+            tau = (tau_low + tau_high) / 2
+            too_large = np.clip(weights - tau, lower, upper).sum(axis=1, keepdims=True) > 1
+            tau_low = np.where(too_large, tau, tau_low)
+            tau_high = np.where(too_large, tau_high, tau)
+        return np.clip(weights - (tau_low + tau_high) / 2, lower, upper)
+
+    @staticmethod
+    def sample_weights(n_assets, n_samples=5000, long_only=True, max_weight=None, seed=0):
+        """Draw random feasible weight vectors, starting with the equal-weight portfolio"""
+        lower, upper = PortfolioOptimizer.get_bounds(n_assets, long_only, max_weight)
+        rng = np.random.default_rng(seed)
+        if long_only:
+            samples = rng.dirichlet(np.ones(n_assets), n_samples)
+        else:
+            samples = rng.uniform(lower, upper, (n_samples, n_assets))
+        samples[0] = 1 / n_assets
+        return PortfolioOptimizer.project_weights(samples, lower, upper)
+
+    @staticmethod
+    def evaluate_weights(weights, moments):
+        """
+        Evaluate many weight vectors at once
+
+        Parameters:
+        - weights: (n_portfolios, n_factors) weight matrix
+        - moments: Output of estimate_moments
+
+        Returns a frame of annualized return, volatility and Sharpe ratio, plus
+        excess return, tracking error and information ratio when active moments
+        are available.
+        """
+        weights = np.atleast_2d(weights)
+        portfolio_return = weights @ moments['mean']
+        volatility = np.sqrt(np.einsum('kn,nm,km->k', weights, moments['cov'], weights))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            results = {
+                'Return': portfolio_return,
+                'Volatility': volatility,
+                'Sharpe Ratio': portfolio_return / volatility,
+            }
+            if 'active_mean' in moments:
+                excess_return = weights @ moments['active_mean']
+                tracking_error = np.sqrt(
+                    np.einsum('kn,nm,km->k', weights, moments['active_cov'], weights)
+                )
+                results['Excess Return'] = excess_return
+                results['Tracking Error'] = tracking_error
+                results['Information Ratio'] = excess_return / tracking_error
+        return pd.DataFrame(results)
+
+    @staticmethod
+    def get_objective(objective, moments):
+        """Get the function minimized by an objective, scoring a single weight vector"""
+        mean, cov = moments['mean'], moments['cov']
+        if objective == 'max_sharpe':
+            return lambda w: -(w @ mean) / np.sqrt(w @ cov @ w)
+        if objective == 'min_variance':
+            return lambda w: w @ cov @ w
+        if objective == 'risk_parity':
+            def risk_parity(w):
+                contributions = w * (cov @ w)
+                return ((contributions - contributions.mean()) ** 2).sum() / (w @ cov @ w) ** 2
+            return risk_parity
+        if objective == 'max_ir':
+            if 'active_mean' not in moments:
+                raise ValueError("The information ratio objective requires market returns")
+            active_mean, active_cov = moments['active_mean'], moments['active_cov']
+            return lambda w: -(w @ active_mean) / np.sqrt(w @ active_cov @ w)
+        raise ValueError(f"Unknown optimizer objective: {objective}")
+
+    @staticmethod
+    def optimize_weights(moments, objective='max_sharpe', long_only=True, max_weight=None,
+                         n_samples=5000, seed=0):
+        """
+        Optimize factor weights for an objective
+
+        The best of the vectorized random candidates (inverse-volatility weights
+        for risk parity) seeds an SLSQP refinement under the budget and weight
+        bound constraints. Risk parity is always long-only.
+
+        Parameters:
+        - moments: Output of estimate_moments
+        - objective: One of the values of OPTIMIZER_OBJECTIVES
+        - long_only: Disallow short positions
+        - max_weight: Optional cap on the absolute weight of any factor
+        - n_samples: Number of random candidates used to find a starting point
+        - seed: Seed of the candidate sampler
+        """
+        n_assets = len(moments['mean'])
+        if objective == 'risk_parity':
+            long_only = True
+        lower, upper = PortfolioOptimizer.get_bounds(n_assets, long_only, max_weight)
+        score = PortfolioOptimizer.get_objective(objective, moments)
+
+        if objective == 'risk_parity':
+            inverse_vol = 1 / np.sqrt(np.diag(moments['cov']))
+            start = PortfolioOptimizer.project_weights(inverse_vol / inverse_vol.sum(), lower, upper)[0]
+        else:
+            candidates = PortfolioOptimizer.sample_weights(
+                n_assets, n_samples, long_only, max_weight, seed
+            )
+            evaluated = PortfolioOptimizer.evaluate_weights(candidates, moments)
+            if objective == 'min_variance':
+                ranking = evaluated['Volatility']
+            else:
+                metric = 'Sharpe Ratio' if objective == 'max_sharpe' else 'Information Ratio'
+                ranking = -evaluated[metric]
+            start = candidates[int(np.nanargmin(ranking.to_numpy()))]
+
+        result = optimize.minimize(
+            score,
+            start,
+            method='SLSQP',
+            bounds=[(lower, upper)] * n_assets,
+            constraints=[{'type': 'eq', 'fun': lambda w: w.sum() - 1}],
+            options={'maxiter': 500, 'ftol': 1e-12},
+        )
+        weights = PortfolioOptimizer.project_weights(result.x, lower, upper)[0]
+        # Keep the starting point if the refinement did not improve on it
+        if not np.isfinite(score(weights)) or score(weights) > score(start):
+            weights = start
+        return weights
+
+    @staticmethod
+    def get_return_range(mean, lower, upper):
+        """Get the lowest and highest attainable portfolio return under the weight bounds"""
+        def extreme_return(order):
+            weights = np.full(len(mean), lower)
+            budget = 1 - weights.sum()
+            for i in order:
+                weights[i] += min(upper - lower, budget)
+                budget = 1 - weights.sum()
+            return weights @ mean
+        order = np.argsort(mean)
+        return extreme_return(order), extreme_return(order[::-1])
+
+    @staticmethod
+    def calculate_efficient_frontier(moments, long_only=True, max_weight=None, n_points=25):
+        """
+        Trace the minimum-variance frontier from the minimum-variance portfolio
+        up to the highest attainable return
+
+        Returns a frame with the annualized return and volatility of each point.
+        """
+        mean, cov = moments['mean'], moments['cov']
+        n_assets = len(mean)
+        lower, upper = PortfolioOptimizer.get_bounds(n_assets, long_only, max_weight)
+        min_var = PortfolioOptimizer.optimize_weights(moments, 'min_variance', long_only, max_weight)
+        _, max_return = PortfolioOptimizer.get_return_range(mean, lower, upper)
+
+        points = []
+        weights = min_var
+        for target in np.linspace(min_var @ mean, max_return, n_points):
+            result = optimize.minimize(
+                lambda w: w @ cov @ w,
+                weights,
+                method='SLSQP',
+                bounds=[(lower, upper)] * n_assets,
+                constraints=[
+                    {'type': 'eq', 'fun': lambda w: w.sum() - 1},
+                    {'type': 'eq', 'fun': lambda w, target=target: w @ mean - target},
+                ],
+                options={'maxiter': 500, 'ftol': 1e-12},
+            )
+            if result.success:
+                weights = result.x
+                points.append((weights @ mean, np.sqrt(weights @ cov @ weights)))
+        return pd.DataFrame(points, columns=['Return', 'Volatility'])
@@ -0,0 +1,271 @@
+import os
+import io
+import re
+import json
+import time
+import pstats
+import cProfile
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+try:
+    import pyinstrument
+except ImportError:  # optional: GQE_PROFILE=pyinstrument then falls back to cProfile
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+# Opt-in rerun instrumentation: "off", "timing" (per-rerun timing breakdown),
+# "cprofile" or "pyinstrument" (timing plus a profile dump of every rerun)
+PROFILE_MODES = ('off', 'timing', 'cprofile', 'pyinstrument')
+PROFILE_MODE = os.environ.get("GQE_PROFILE", "off").lower()
+if PROFILE_MODE in ('', '0', 'false', 'no'):
+    PROFILE_MODE = 'off'
+elif PROFILE_MODE not in PROFILE_MODES:
+    PROFILE_MODE = 'timing'
+
+# Where profile dumps are written
+PROFILE_DIR = os.environ.get("GQE_PROFILE_DIR", "profiles")
+
+# Optional JSON lines file the per-rerun timing records are appended to, for
+# aggregation across sessions and server processes
+PROFILE_LOG = os.environ.get("GQE_PROFILE_LOG")
+PROFILE_LOG_LOCK = threading.Lock()
+
+# Number of functions kept in the structured log record of a rerun
+LOG_TOP_FUNCTIONS = 20
+
+# Timings of the rerun running in the current thread (each Streamlit session runs
+# its script in its own thread), or None when instrumentation is off
+CURRENT_TIMINGS = contextvars.ContextVar('rerun_timings', default=None)
+
+
+class RerunTimings:
+    """Timed phases and function calls of one rerun of the app script"""
+
+    def __init__(self, session_id=None, rerun=None):
+        self.session_id = session_id
+        self.rerun = rerun
+        self.started_at = datetime.now(timezone.utc)
+        self.status = None
+        self.total = None
+        self.phases = []
+        self.functions = {}
+        self.profile_path = None
+        self.profile_summary = None
+        self._start = time.perf_counter()
+        self._phase = None
+        self._stack = []
+
+    def enter(self):
+        """Start timing a call; calls nest, so each one also knows its children's time"""
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def exit(self, category, name):
+        """Stop timing the innermost call and add it to the function totals"""
+        start, children = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        if self._stack:
+            self._stack[-1][1] += elapsed
+        record = self.functions.setdefault((category, name), [0, 0.0, 0.0])
+        record[0] += 1
+        record[1] += elapsed
+        record[2] += elapsed - children
+
+    def begin_phase(self, name):
+        """End the current phase of the rerun and start the next one"""
+        self.end_phase()
+        self._phase = (name, time.perf_counter())
+
+    def end_phase(self):
+        if self._phase is not None:
+            name, start = self._phase
+            self.phases.append((name, time.perf_counter() - start))
+            self._phase = None
+
+    def finish(self, status='ok'):
+        self.end_phase()
+        self.total = time.perf_counter() - self._start
+        self.status = status
+
+    def phase_breakdown(self):
+        """Get the time of every phase and its share of the rerun"""
+        total = self.total or sum(seconds for _, seconds in self.phases)
+        return pd.DataFrame({
+            'Phase': [name for name, _ in self.phases],
+            'Time (ms)': [seconds * 1e3 for _, seconds in self.phases],
+            'Share': [seconds / total if total else None for _, seconds in self.phases],
+        })
+
+    def function_breakdown(self):
+        """
+        Get the calls, total and self time (excluding timed callees) of every
+        timed function, slowest first
+        """
+        rows = [
+            (category, name, calls, total * 1e3, own * 1e3)
+            for (category, name), (calls, total, own) in self.functions.items()
+        ]
+        breakdown = pd.DataFrame(rows, columns=['Category', 'Function', 'Calls', 'Total (ms)', 'Self (ms)'])
+        return breakdown.sort_values('Total (ms)', ascending=False, ignore_index=True)
+
+    def to_record(self, top_n=LOG_TOP_FUNCTIONS):
+        """Get the structured log record of the rerun"""
+        functions = self.function_breakdown().head(top_n)
+        return {
+            'event': 'rerun_timings',
+            'timestamp': self.started_at.isoformat(timespec='milliseconds'),
+            'pid': os.getpid(),
+            'session_id': self.session_id,
+            'rerun': self.rerun,
+            'status': self.status,
+            'total_ms': round(self.total * 1e3, 3) if self.total is not None else None,
+            'phases': {name: round(seconds * 1e3, 3) for name, seconds in self.phases},
+            'functions': [
+                {'category': row['Category'], 'name': row['Function'], 'calls': int(row['Calls']),
+                 'total_ms': round(row['Total (ms)'], 3), 'self_ms': round(row['Self (ms)'], 3)}
+                for _, row in functions.iterrows()
+            ],
+            'profile': self.profile_path,
+        }
+
+
+def timed(func=None, *, name=None, category='app'):
+    """
+    Record every call of a function in the timings of the active rerun
+
+    Without an active rerun (instrumentation off, or outside the app) the
+    function is called directly.
+    """
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = CURRENT_TIMINGS.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            timings.enter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings.exit(category, label)
+
+        # Keep the cache controls of Streamlit cached functions reachable
+        if hasattr(func, 'clear'):
+            wrapper.clear = func.clear
+        wrapper.timed = True
+        return wrapper
+
+    return decorator if func is None else decorator(func)
+
+
+@contextmanager
+def span(name, category='app'):
+    """Record a block of code in the timings of the active rerun"""
+    timings = CURRENT_TIMINGS.get()
+    if timings is None:
+        yield
+        return
+    timings.enter()
+    try:
+        yield
+    finally:
+        timings.exit(category, name)
+
+
+def phase(name):
+    """Start the next phase of the active rerun, ending the previous one"""
+    timings = CURRENT_TIMINGS.get()
+    if timings is not None:
+        timings.begin_phase(name)
+
+
+def instrument_class(cls, category):
+    """Time every public static method of a class, including its calls to itself"""
+    for attr_name, attr in list(vars(cls).items()):
+        if attr_name.startswith('_') or not isinstance(attr, staticmethod):
+            continue
+        func = attr.__func__
+        if getattr(func, 'timed', False):
+            continue
+        setattr(cls, attr_name, staticmethod(
+            timed(func, name=f"{cls.__name__}.{attr_name}", category=category)
+        ))
+
+
+def write_log_record(record):
+    """Log a rerun record as JSON and append it to PROFILE_LOG if set"""
+    line = json.dumps(record, default=str)
+    logger.info(line)
+    if PROFILE_LOG:
+        try:
+            with PROFILE_LOG_LOCK, open(PROFILE_LOG, 'a') as f:
+                f.write(line + '\n')
+        except OSError as exc:
+            logger.warning("Could not append rerun timings to %s (%s)", PROFILE_LOG, exc)
+
+
+def get_profile_path(timings, extension):
+    session = re.sub(r'\W', '', timings.session_id or '')[:8] or 'nosession'
+    return os.path.join(PROFILE_DIR, f"rerun-{session}-{timings.rerun or 0:04d}.{extension}")
+
+
+@contextmanager
+def record_rerun(timings, mode=None):
+    """
+    Time one rerun of the app script, optionally under a profiler
+
+    The rerun is finished, its profile dumped to PROFILE_DIR and its structured
+    record logged however the script exits (including st.stop and reruns).
+    """
+    mode = mode or PROFILE_MODE
+    if mode == 'pyinstrument' and pyinstrument is None:
+        logger.warning("pyinstrument is not installed, profiling with cProfile instead")
+        mode = 'cprofile'
+    profiler = None
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif mode == 'pyinstrument':
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+
+    token = CURRENT_TIMINGS.set(timings)
+    status = 'ok'
+    try:
+        yield timings
+    except BaseException as exc:
+        # Streamlit ends reruns early with control flow exceptions
+        status = type(exc).__name__
+        raise
+    finally:
+        CURRENT_TIMINGS.reset(token)
+        timings.finish(status)
+        if profiler is not None:
+            if mode == 'cprofile':
+                profiler.disable()
+            else:
+                profiler.stop()
+            try:
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                if mode == 'cprofile':
+                    timings.profile_path = get_profile_path(timings, 'prof')
+                    profiler.dump_stats(timings.profile_path)
+                    summary = io.StringIO()
+                    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(15)
+                    timings.profile_summary = summary.getvalue()
+                else:
+                    timings.profile_path = get_profile_path(timings, 'html')
+                    with open(timings.profile_path, 'w') as f:
+                        f.write(profiler.output_html())
+                    timings.profile_summary = profiler.output_text()
+            except OSError as exc:
+                logger.warning("Could not write the rerun profile to %s (%s)", PROFILE_DIR, exc)
+        write_log_record(timings.to_record())
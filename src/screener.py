@@ -0,0 +1,328 @@
+import pandas as pd
+import numpy as np
+import threading
+from src.data_loader import DataLoader
+from src.analysis import Analysis
+from src.factor_model import FactorModel
+from src.spreads import SPREAD_GROUP
+
+# Columns identifying a portfolio in the universe matrix
+PORTFOLIO_KEYS = ['group', 'factor', 'rank_ME', 'rank']
+
+# Metrics the screener can be sorted by, with their default sort direction
+SCREENER_METRICS = {
+    'Sharpe Ratio': False,
+    'Information Ratio': False,
+    'Annual Alpha (%)': False,
+    'Beta': True,
+    'Max Drawdown (%)': False,
+    'Drawdown Duration (months)': True,
+    'Time to Recovery (months)': True,
+    'Longest Drawdown (months)': True,
+    'Mean Return (% p.a.)': False,
+    'Volatility (% p.a.)': True,
+    'Excess Return (% p.a.)': False,
+    'Tracking Error (% p.a.)': True,
+}
+
+# Factor model regression metrics the screener can be sorted by, with their default sort direction
+FACTOR_MODEL_METRICS = {
+    'Alpha t-stat': False,
+    'Annual Alpha (%)': False,
+    'R-Squared': True,
+    'MKT Beta': True,
+    'ME Beta': False,
+    'IA Beta': False,
+    'ROE Beta': False,
+}
+
+
+# Guards in-place updates of the shared screener universe
+UNIVERSE_LOCK = threading.Lock()
+
+# Screener universes built so far, by (base_path, return_col, market_rank);
+# shared by all sessions of the process and only built when first screened
+UNIVERSES = {}
+
+
+class Screener:
+    @staticmethod
+    def build_universe_matrix(data_dict, return_col='ret_vw', after=None):
+        """
+        Build a wide date x portfolio matrix of every portfolio in the dataset
+
+        Columns are a MultiIndex of (group, factor, rank_ME, rank); months a
+        portfolio does not cover are NaN. With after, only later months are
+        included (used to append new months to an existing matrix).
+        """
+        blocks = []
+        for group in DataLoader.get_available_groups(data_dict):
+            # Spreads have no rank grid; skipping them also keeps a lazy catalog from loading them
+            if group in ('market_portfolio', SPREAD_GROUP):
+                continue
+            for factor in DataLoader.get_available_factors(data_dict, group):
+                df = data_dict[group][factor]
+                rank_cols = [col for col in df.columns if col.startswith('rank_') and col != 'rank_ME']
+                if not rank_cols:
+                    continue
+                if after is not None:
+                    df = df[df['date'] > after]
+                dates = df['date'].to_numpy()
+                # Encode (rank_ME, rank) pairs as one sortable integer per row; ranks
+                # are small, so the codes present are found without sorting
+                portfolios = df['rank_ME'].to_numpy(dtype=np.int64) * 1000 + df[rank_cols[0]].to_numpy(dtype=np.int64)
+                present = np.zeros(portfolios.max() + 1 if len(portfolios) else 0, dtype=bool)
+                present[portfolios] = True
+                codes = np.flatnonzero(present)
+                columns = (np.cumsum(present) - 1)[portfolios]
+                keys = np.stack([codes // 1000, codes % 1000], axis=1)
+                blocks.append((group, factor, dates, keys, columns,
+                               df[return_col].to_numpy(dtype=float)))
+        if not blocks:
+            return pd.DataFrame(dtype=float)
+
+        # Scatter every factor's long rows into one shared date x portfolio array
+        index = pd.unique(np.concatenate([dates for _, _, dates, _, _, _ in blocks]))
+        index.sort()
+        values = np.full((len(index), sum(len(keys) for _, _, _, keys, _, _ in blocks)), np.nan)
+        labels = []
+        offset = 0
+        for group, factor, dates, keys, columns, returns in blocks:
+            values[np.searchsorted(index, dates), offset + columns] = returns
+            labels.extend((group, factor, int(rank_me), int(rank)) for rank_me, rank in keys)
+            offset += len(keys)
+        return pd.DataFrame(
+            values,
+            index=pd.DatetimeIndex(index, name='date'),
+            columns=pd.MultiIndex.from_tuples(labels, names=PORTFOLIO_KEYS)
+        )
+
+    @staticmethod
+    def calculate_moment_sums(returns, market_returns, centers):
+        """
+        Calculate the additive sums behind the screening metrics
+
+        Returns of a portfolio and the market are paired month by month and
+        centered on fixed constants, so sums of new months can simply be added
+        to those of earlier months.
+
+        Parameters:
+        - returns: Wide date x portfolio return matrix
+        - market_returns: Date-indexed market return series
+        - centers: Tuple of per-portfolio and market centering constants
+        """
+        values = returns.to_numpy(dtype=float)
+        market = market_returns.reindex(returns.index).to_numpy(dtype=float)
+        center_p, center_m = centers
+
+        mask = ~np.isnan(values) & ~np.isnan(market)[:, None]
+        p = np.where(mask, values - center_p, 0.0)
+        m = np.where(mask, market[:, None] - center_m, 0.0)
+        d = p - m
+        return {
+            'n': mask.sum(axis=0).astype(float),
+            'p': p.sum(axis=0),
+            'm': m.sum(axis=0),
+            'pp': (p * p).sum(axis=0),
+            'mm': (m * m).sum(axis=0),
+            'pm': (p * m).sum(axis=0),
+            'dd': (d * d).sum(axis=0),
+        }
+
+    @staticmethod
+    def calculate_statistics_from_sums(sums, centers, drawdowns, index, annual_factor=12):
+        """Derive the screening metrics from moment sums and a drawdown summary"""
+        center_p, center_m = centers
+        n = sums['n']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_p = sums['p'] / n
+            mean_m = sums['m'] / n
+            var_p = (sums['pp'] - n * mean_p ** 2) / (n - 1)
+            var_m = (sums['mm'] - n * mean_m ** 2) / (n - 1)
+            cov_pm = (sums['pm'] - n * mean_p * mean_m) / (n - 1)
+            var_d = (sums['dd'] - n * (mean_p - mean_m) ** 2) / (n - 1)
+
+            beta = cov_pm / var_m
+            portfolio_mean = (mean_p + center_p) * annual_factor
+            market_mean = (mean_m + center_m) * annual_factor
+            portfolio_vol = np.sqrt(np.maximum(var_p, 0.0) * annual_factor)
+            alpha = portfolio_mean - beta * market_mean
+            excess_return = portfolio_mean - market_mean
+
+            tracking_error = np.sqrt(np.maximum(var_d, 0.0) * annual_factor)
+            information_ratio = np.where(tracking_error > 0, excess_return / tracking_error, np.nan)
+            sharpe = np.where(portfolio_vol > 0, portfolio_mean / portfolio_vol, np.nan)
+            correlation = cov_pm / np.sqrt(var_p * var_m)
+
+        return pd.DataFrame({
+            'Sharpe Ratio': sharpe,
+            'Information Ratio': information_ratio,
+            'Annual Alpha (%)': alpha * 100,
+            'Beta': beta,
+            'Correlation': correlation,
+            'Max Drawdown (%)': drawdowns['Max Drawdown'].to_numpy() * 100,
+            'Drawdown Duration (months)': drawdowns['Duration (months)'].to_numpy(),
+            'Time to Recovery (months)': drawdowns['Time to Recovery (months)'].to_numpy(),
+            'Longest Drawdown (months)': drawdowns['Longest Drawdown (months)'].to_numpy(),
+            'Mean Return (% p.a.)': portfolio_mean * 100,
+            'Volatility (% p.a.)': portfolio_vol * 100,
+            'Excess Return (% p.a.)': excess_return * 100,
+            'Tracking Error (% p.a.)': tracking_error * 100,
+            'Months': n.astype(int),
+        }, index=index)
+
+    @staticmethod
+    def get_centers(returns, market_returns):
+        """Get the centering constants (full-sample means) of a return matrix and the market"""
+        with np.errstate(invalid='ignore'):
+            center_p = np.nan_to_num(np.nanmean(returns.to_numpy(dtype=float), axis=0))
+        center_m = float(np.nan_to_num(market_returns.mean()))
+        return center_p, center_m
+
+    @staticmethod
+    def calculate_universe_statistics(returns, market_returns, annual_factor=12):
+        """
+        Calculate screening metrics for every column of a return matrix at once
+
+        Return metrics of a portfolio use the months in which both it and the
+        market have a return; drawdown metrics come from Analysis.analyze_drawdowns.
+        For portfolios without missing returns this matches
+        Analysis.calculate_market_relative_statistics and calculate_drawdown.
+
+        Parameters:
+        - returns: Wide date x portfolio return matrix
+        - market_returns: Date-indexed market return series
+        - annual_factor: Periods per year used for annualization
+        """
+        centers = Screener.get_centers(returns, market_returns)
+        sums = Screener.calculate_moment_sums(returns, market_returns, centers)
+        drawdowns = Analysis.analyze_drawdowns(returns, top_n=1)['summary']
+        return Screener.calculate_statistics_from_sums(
+            sums, centers, drawdowns, returns.columns, annual_factor
+        )
+
+    @staticmethod
+    def build_universe(data_dict, return_col='ret_vw', market_rank=10):
+        """
+        Screen every portfolio against the market portfolio, keeping the state
+        needed to add later months incrementally
+
+        Returns a dict with the universe return matrix, the market returns, the
+        centering constants and moment sums, and the 'stats' frame of
+        calculate_universe_statistics (reset to columns).
+        """
+        returns = Screener.build_universe_matrix(data_dict, return_col)
+        market_data = DataLoader.get_market_portfolio(data_dict, market_rank)
+        market_returns = market_data.set_index('date')[return_col]
+        centers = Screener.get_centers(returns, market_returns)
+        sums = Screener.calculate_moment_sums(returns, market_returns, centers)
+        drawdowns = Analysis.analyze_drawdowns(returns, top_n=1)['summary']
+        stats = Screener.calculate_statistics_from_sums(sums, centers, drawdowns, returns.columns)
+        return {
+            'return_col': return_col,
+            'market_rank': market_rank,
+            'returns': returns,
+            'market_returns': market_returns,
+            'centers': centers,
+            'sums': sums,
+            'stats': stats.reset_index(),
+        }
+
+    @staticmethod
+    def update_universe(universe, data_dict, changes=None):
+        """
+        Add the months that follow the universe sample to a screener universe in place
+
+        Only the new rows are pivoted and summed; drawdowns are recomputed on the
+        extended matrix. If earlier months were revised, portfolios were added
+        or the market was not extended, the universe is rebuilt instead.
+
+        Parameters:
+        - universe: Dict built by build_universe
+        - data_dict: The refreshed data dict
+        - changes: Optional change list of DataLoader.refresh_data_directory
+
+        Returns the number of months added, or None after a full rebuild.
+        """
+        return_col, market_rank = universe['return_col'], universe['market_rank']
+        # Factor regressions are recomputed on the next request
+        universe.pop('factor_returns', None)
+        universe.pop('regressions', None)
+        last_date = universe['returns'].index.max()
+        new_returns = Screener.build_universe_matrix(data_dict, return_col, after=last_date)
+        market_data = DataLoader.get_market_portfolio(data_dict, market_rank)
+        market_returns = market_data.set_index('date')[return_col]
+        new_market = market_returns[market_returns.index > last_date]
+
+        structural = changes is not None and any(change['revised'] for change in changes)
+        if (structural or not new_returns.columns.isin(universe['returns'].columns).all()
+                or not new_returns.index.isin(new_market.index).all()):
+            universe.update(Screener.build_universe(data_dict, return_col, market_rank))
+            return None
+        if new_returns.empty:
+            return 0
+
+        new_returns = new_returns.reindex(columns=universe['returns'].columns)
+        new_sums = Screener.calculate_moment_sums(new_returns, new_market, universe['centers'])
+        sums = {key: universe['sums'][key] + new_sums[key] for key in universe['sums']}
+        returns = pd.concat([universe['returns'], new_returns])
+        drawdowns = Analysis.analyze_drawdowns(returns, top_n=1)['summary']
+        stats = Screener.calculate_statistics_from_sums(
+            sums, universe['centers'], drawdowns, returns.columns
+        )
+        universe.update({
+            'returns': returns,
+            'market_returns': pd.concat([universe['market_returns'], new_market]),
+            'sums': sums,
+            'stats': stats.reset_index(),
+        })
+        return len(new_returns)
+
+    @staticmethod
+    def load_universe(data_dict, base_path="data", return_col='ret_vw', market_rank=10):
+        """
+        Build the screener universe of a data directory from the data dict the
+        app loaded it into, in any load mode (shared, updated in place)
+
+        Callers hold UNIVERSE_LOCK.
+        """
+        key = (base_path, return_col, market_rank)
+        if key not in UNIVERSES:
+            UNIVERSES[key] = Screener.build_universe(data_dict, return_col, market_rank)
+        return UNIVERSES[key]
+
+    @staticmethod
+    def cached_universes(base_path="data"):
+        """The universes of a data directory built so far, without building any"""
+        return [universe for (path, _, _), universe in UNIVERSES.items() if path == base_path]
+
+    @staticmethod
+    def load_universe_statistics(data_dict, base_path="data", return_col='ret_vw', market_rank=10):
+        """Screen every portfolio in the data directory against the market portfolio"""
+        with UNIVERSE_LOCK:
+            return Screener.load_universe(data_dict, base_path, return_col, market_rank)['stats']
+
+    @staticmethod
+    def load_factor_regressions(data_dict, base_path="data", return_col='ret_vw', market_rank=10):
+        """
+        Regress every portfolio in the data directory on the q-factor model
+        (see FactorModel.regress), computed on first use and kept in the universe
+
+        The factor spreads are built from the app's data dict, so only the
+        portfolio grids they use are read in addition to the universe.
+        """
+        with UNIVERSE_LOCK:
+            universe = Screener.load_universe(data_dict, base_path, return_col, market_rank)
+            if 'regressions' not in universe:
+                factors = FactorModel.build_factor_returns(data_dict, return_col, market_rank)
+                universe['factor_returns'] = factors
+                universe['regressions'] = FactorModel.regress(universe['returns'], factors).reset_index()
+            return universe['regressions']
+
+    @staticmethod
+    def rank_portfolios(stats, metric='Sharpe Ratio', ascending=None, top_n=None):
+        """Sort screener results by a metric, optionally keeping the top N rows"""
+        if ascending is None:
+            ascending = {**SCREENER_METRICS, **FACTOR_MODEL_METRICS}.get(metric, False)
+        ranked = stats.sort_values(metric, ascending=ascending, na_position='last')
+        return ranked.head(top_n) if top_n else ranked
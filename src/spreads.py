@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+from src.names import GROUP_NAMES, get_display_name
+
+# Group of the derived long-short spread portfolios, one per factor file
+SPREAD_GROUP = 'long_short_spreads'
+
+# rank_ME value of the spread averaged over all market cap ranks
+SIZE_AVERAGED_RANK = 0
+
+
+class SpreadBuilder:
+    @staticmethod
+    def get_rank_column(df):
+        """Get the factor rank column of a portfolio frame, or None"""
+        rank_columns = [col for col in df.columns if col.startswith('rank_') and col != 'rank_ME']
+        return rank_columns[0] if rank_columns else None
+
+    @staticmethod
+    def build_spread_frame(df, return_cols=('ret_vw',)):
+        """
+        Build the high-minus-low spread portfolios of a factor's portfolio grid
+
+        One pivot turns the long (date, rank_ME, factor rank) rows into a date x
+        (column, rank_ME, factor rank) grid. The spread of each market cap rank is
+        its top factor rank minus its bottom one, and the size-averaged spread
+        (rank_ME SIZE_AVERAGED_RANK) is their mean. nstocks counts the stocks of
+        both legs; for the size-averaged spread it is the total over all market
+        cap ranks, not an average. Months missing a leg are left out.
+
+        Returns a frame laid out like a portfolio file without the factor rank
+        column, or None if the frame has no factor rank grid.
+        """
+        rank_col = SpreadBuilder.get_rank_column(df)
+        if rank_col is None or 'rank_ME' not in df.columns:
+            return None
+        ranks = df[rank_col].to_numpy()
+        top, bottom = ranks.max(), ranks.min()
+        if top == bottom:
+            return None
+
+        return_cols = [col for col in return_cols if col in df.columns]
+        value_cols = return_cols + (['nstocks'] if 'nstocks' in df.columns else [])
+        grid = df.pivot(index='date', columns=['rank_ME', rank_col], values=value_cols)
+        market_caps = sorted(df['rank_ME'].unique())
+
+        def leg(col, rank):
+            return grid[col].xs(rank, axis=1, level=rank_col).reindex(columns=market_caps).to_numpy(dtype=float)
+
+        # Date x (size-averaged, then every market cap rank) blocks
+        columns = {}
+        for col in value_cols:
+            if col == 'nstocks':
+                values = leg(col, top) + leg(col, bottom)
+                # The size-averaged spread holds the stocks of every leg
+                total = values.sum(axis=1)
+                total[np.isnan(values).any(axis=1)] = np.nan
+                columns[col] = np.column_stack([total, values])
+            else:
+                values = leg(col, top) - leg(col, bottom)
+                average = values.mean(axis=1)
+                columns[col] = np.column_stack([average, values])
+
+        dates = grid.index.to_numpy()
+        rank_me = np.array([SIZE_AVERAGED_RANK] + list(market_caps))
+        n_dates, n_ranks = len(dates), len(rank_me)
+        spreads = pd.DataFrame({
+            'date': np.repeat(dates, n_ranks).astype(df['date'].dtype),
+            'rank_ME': np.tile(rank_me, n_dates).astype(df['rank_ME'].dtype),
+            **{col: values.ravel() for col, values in columns.items()},
+        })
+        spreads = spreads.dropna(subset=return_cols).reset_index(drop=True)
+        if 'nstocks' in spreads.columns and not spreads['nstocks'].isna().any():
+            spreads['nstocks'] = spreads['nstocks'].astype(df['nstocks'].dtype)
+
+        date_index = pd.DatetimeIndex(spreads['date'])
+        layout = [col for col in df.columns if col != rank_col]
+        spreads['year'] = date_index.year.astype(df['year'].dtype) if 'year' in df.columns else date_index.year
+        spreads['month'] = date_index.month.astype(df['month'].dtype) if 'month' in df.columns else date_index.month
+        return spreads[[col for col in layout if col in spreads.columns]]
+
+    @staticmethod
+    def build_manifest_entry(entry):
+        """
+        Derive the manifest entry of a factor's spread portfolios from the
+        factor's own entry, or None if the factor has no rank grid to spread
+        """
+        rank_values = next(iter(entry['rank_values'].values()), [])
+        if len(rank_values) < 2:
+            return None
+        factor = entry['factor']
+        n_dates = entry['n_rows'] // max(1, len(entry['market_caps']) * len(rank_values))
+        return {
+            'file_path': entry['file_path'],
+            'source_group': entry['group'],
+            'rank_columns': [],
+            'rank_values': {},
+            'market_caps': list(entry['market_caps']) + [SIZE_AVERAGED_RANK],
+            'start_date': entry['start_date'],
+            'end_date': entry['end_date'],
+            'group': SPREAD_GROUP,
+            'factor': factor,
+            'n_rows': n_dates * (len(entry['market_caps']) + 1),
+            'group_display_name': GROUP_NAMES.get(SPREAD_GROUP, SPREAD_GROUP),
+            'short_name': get_display_name(factor),
+            'display_name': get_display_name(f"{SPREAD_GROUP}/{factor}"),
+        }
+
+    @staticmethod
+    def get_common_market_caps(entries):
+        """
+        Get the market cap ranks offered by every one of several manifest
+        entries, with the size-averaged rank last
+        """
+        market_caps = None
+        for entry in entries:
+            caps = set(entry['market_caps'])
+            market_caps = caps if market_caps is None else market_caps & caps
+        return sorted(market_caps or [], key=lambda rank: (rank == SIZE_AVERAGED_RANK, rank))
+
+    @staticmethod
+    def format_market_cap(rank_ME):
+        """Format a market cap rank for display"""
+        return "Size-Averaged" if rank_ME == SIZE_AVERAGED_RANK else f"Rank {rank_ME}"
@@ -1,3 +1,4 @@
+import os
 import plotly.express as px
 import plotly.graph_objects as go
 import seaborn as sns
@@ -56,7 +57,188 @@ e_COLOR_SEQUENCE = [
     '#777265',  # nordic brown
 ]
 
+# Time series figures switch from SVG to WebGL (Scattergl) traces when they have
+# more traces or more points than these thresholds
+WEBGL_TRACE_THRESHOLD = int(os.environ.get("GQE_WEBGL_TRACES", "10"))
+WEBGL_POINT_THRESHOLD = int(os.environ.get("GQE_WEBGL_POINTS", "5000"))
+
+# Series longer than the plot is wide are downsampled with a shape-preserving
+# method ("lttb", "minmax" or "none") to about one point per pixel
+DOWNSAMPLE_METHOD = os.environ.get("GQE_DOWNSAMPLE", "lttb").lower()
+DEFAULT_PLOT_WIDTH = 1200  # Pixel width assumed when a figure is not given one
+POINTS_PER_PIXEL = 1
+
 class Visualizer:
+    @staticmethod
+    def lttb_indices(values, n_out):
+        """
+        Select n_out points of every column of a (n, k) array with
+        Largest-Triangle-Three-Buckets
+
+        Points are taken as equally spaced. The first and last points are kept,
+        and from each of the n_out - 2 buckets in between the point forming the
+        largest triangle with the last kept point and the mean of the next
+        bucket. All columns are processed in the same pass over the buckets.
+        Returns a (n_out, k) array of row indices.
+        """
+        n, k = values.shape
+        if n_out >= n or n_out < 3:
+            return np.repeat(np.arange(n)[:, None], k, axis=1)
+
+        filled = np.nan_to_num(values)
+        edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+        columns = np.arange(k)
+        indices = np.empty((n_out, k), dtype=np.int64)
+        indices[0] = 0
+        indices[-1] = n - 1
+        last = np.zeros(k, dtype=np.int64)
+        for bucket in range(n_out - 2):
+            start, stop = edges[bucket], edges[bucket + 1]
+            if bucket + 2 < len(edges):
+                next_stop = edges[bucket + 2]
+                next_x = (stop + next_stop - 1) / 2
+                next_y = filled[stop:next_stop].mean(axis=0)
+            else:
+                next_x, next_y = n - 1, filled[n - 1]
+            last_y = filled[last, columns]
+            x = np.arange(start, stop)[:, None]
+            area = np.abs(
+                (last - next_x) * (filled[start:stop] - last_y) - (last - x) * (next_y - last_y)
+            )
+            last = start + area.argmax(axis=0)
+            indices[bucket + 1] = last
+        return indices
+
+    @staticmethod
+    def minmax_indices(values, n_out):
+        """
+        Select about n_out points of every column of a (n, k) array by min/max bucketing
+
+        The first and last points are kept, and the lowest and highest point of
+        each of (n_out - 2) // 2 buckets in between, in date order. Returns an
+        array of row indices with one column per series.
+        """
+        n, k = values.shape
+        n_buckets = (n_out - 2) // 2
+        if n_out >= n or n_buckets < 1:
+            return np.repeat(np.arange(n)[:, None], k, axis=1)
+
+        missing = np.isnan(values)
+        low_values = np.where(missing, np.inf, values)
+        high_values = np.where(missing, -np.inf, values)
+        edges = np.linspace(1, n - 1, n_buckets + 1).astype(np.int64)
+        indices = np.empty((2 * n_buckets + 2, k), dtype=np.int64)
+        indices[0] = 0
+        indices[-1] = n - 1
+        for bucket in range(n_buckets):
+            start, stop = edges[bucket], edges[bucket + 1]
+            low = start + low_values[start:stop].argmin(axis=0)
+            high = start + high_values[start:stop].argmax(axis=0)
+            indices[2 * bucket + 1] = np.minimum(low, high)
+            indices[2 * bucket + 2] = np.maximum(low, high)
+        return indices
+
+    @staticmethod
+    def downsample_traces(traces, max_points, method=None, linked=None):
+        """
+        Downsample the x/y data of line traces to at most about max_points points each
+
+        Traces sharing the same x values are downsampled together in one pass.
+        Traces that are short enough keep their original data. Returns a list of
+        (x, y) pairs in trace order.
+
+        Parameters:
+        - linked: Optional dict mapping a trace position to the position of the
+          trace whose selected points it takes (e.g. the edges of a filled band,
+          which must keep the same x points as each other)
+        """
+        method = method or DOWNSAMPLE_METHOD
+        data = [(trace['x'], trace['y']) for trace in traces]
+        if method == 'none' or max_points is None:
+            return data
+        select = Visualizer.minmax_indices if method == 'minmax' else Visualizer.lttb_indices
+
+        linked = linked or {}
+        groups = []
+        for position, (x, y) in enumerate(data):
+            if position in linked:
+                continue
+            x_values = np.asarray(x)
+            n = min(len(x_values), len(y))
+            if n <= max_points:
+                continue
+            for group_x, positions in groups:
+                if len(group_x) == n and np.array_equal(group_x, x_values[:n]):
+                    positions.append(position)
+                    break
+            else:
+                groups.append((x_values[:n], [position]))
+
+        selected = {}
+        for group_x, positions in groups:
+            n = len(group_x)
+            values = np.column_stack([
+                np.asarray(data[position][1], dtype=float)[:n] for position in positions
+            ])
+            indices = select(values, max_points)
+            for column, position in enumerate(positions):
+                selected[position] = (group_x, indices[:, column])
+                data[position] = (group_x[indices[:, column]], values[indices[:, column], column])
+
+        for position, leader in linked.items():
+            if leader in selected:
+                group_x, indices = selected[leader]
+                y = np.asarray(data[position][1], dtype=float)[:len(group_x)]
+                data[position] = (group_x[indices], y[indices])
+        return data
+
+    @staticmethod
+    def compact_dates(x):
+        """
+        Convert date-only timestamps to a datetime64[D] array, which Plotly
+        validates and serializes without copying element by element
+        """
+        values = np.asarray(x)
+        if not np.issubdtype(values.dtype, np.datetime64):
+            return x
+        days = values.astype('datetime64[D]')
+        if not np.array_equal(days, values, equal_nan=True):
+            return x
+        return days
+
+    @staticmethod
+    def add_time_series(fig, traces, width=None, render_mode='auto', linked=None):
+        """
+        Add line traces given as Scatter keyword dicts to a figure
+
+        Each series is downsampled to the plot's pixel width, and the traces are
+        WebGL (Scattergl) traces if render_mode is 'webgl', or 'auto' and the
+        figure exceeds WEBGL_TRACE_THRESHOLD traces or WEBGL_POINT_THRESHOLD points.
+        linked is passed on to downsample_traces.
+        """
+        max_points = int((width or DEFAULT_PLOT_WIDTH) * POINTS_PER_PIXEL)
+        data = Visualizer.downsample_traces(traces, max_points, linked=linked)
+        n_points = sum(len(y) for _, y in data)
+        use_webgl = render_mode == 'webgl' or (
+            render_mode == 'auto'
+            and (len(traces) > WEBGL_TRACE_THRESHOLD or n_points > WEBGL_POINT_THRESHOLD)
+        )
+        trace_class = go.Scattergl if use_webgl else go.Scatter
+
+        # Traces usually share their dates, so each distinct date axis is formatted once
+        formatted = []
+        for trace, (x, y) in zip(traces, data):
+            x_values = np.asarray(x)
+            for original, compact in formatted:
+                if original is x_values or (len(original) == len(x_values)
+                                            and np.array_equal(original, x_values)):
+                    break
+            else:
+                compact = Visualizer.compact_dates(x_values)
+                formatted.append((x_values, compact))
+            fig.add_trace(trace_class(dict(trace, x=compact, y=y)))
+        return fig
+
     @staticmethod
     def create_time_series(df, factors, title="Factor Performance Over Time"):
         """Create interactive time series plot"""
@@ -122,54 +304,56 @@ class Visualizer:
         return fig
 
     @staticmethod
-    def create_rolling_stats_plot(df, rolling_stats, return_col='ret_vw', title="Rolling Statistics"):
+    def create_rolling_stats_plot(df, rolling_stats, return_col='ret_vw', title="Rolling Statistics",
+                                  width=None, render_mode='auto'):
         """Create rolling statistics plot"""
         fig = go.Figure()
         
         # Get date values whether it's index or column
         dates = df.index if isinstance(df.index, pd.DatetimeIndex) else df['date']
         
-        # Returns
-        fig.add_trace(go.Scatter(
-            x=dates, 
-            y=df[return_col],
-            name="Monthly Returns",
-            line=dict(color='blue', width=1),
-            hovertemplate="%{y:.2%}"
-        ))
-        
-        # Rolling mean
-        fig.add_trace(go.Scatter(
-            x=dates,
-            y=rolling_stats['rolling_mean'],
-            name='Rolling Mean',
-            line=dict(color='red', width=1.5),
-            hovertemplate="%{y:.2%}"
-        ))
-        
         # Rolling bands (mean ± std)
         upper = rolling_stats['rolling_mean'] + rolling_stats['rolling_std']
         lower = rolling_stats['rolling_mean'] - rolling_stats['rolling_std']
         
-        fig.add_trace(go.Scatter(
-            x=dates,
-            y=upper,
-            fill=None,
-            mode='lines',
-            line=dict(color='rgba(0,0,0,0)'),
-            showlegend=False,
-            hovertemplate="%{y:.2%}"
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=dates,
-            y=lower,
-            fill='tonexty',
-            mode='lines',
-            line=dict(color='rgba(0,0,0,0)'),
-            name='±1 Std Dev',
-            hovertemplate="%{y:.2%}"
-        ))
+        Visualizer.add_time_series(fig, [
+            # Returns
+            dict(
+                x=dates, 
+                y=df[return_col],
+                name="Monthly Returns",
+                line=dict(color='blue', width=1),
+                hovertemplate="%{y:.2%}"
+            ),
+            # Rolling mean
+            dict(
+                x=dates,
+                y=rolling_stats['rolling_mean'],
+                name='Rolling Mean',
+                line=dict(color='red', width=1.5),
+                hovertemplate="%{y:.2%}"
+            ),
+            dict(
+                x=dates,
+                y=upper,
+                fill=None,
+                mode='lines',
+                line=dict(color='rgba(0,0,0,0)'),
+                showlegend=False,
+                hovertemplate="%{y:.2%}"
+            ),
+            dict(
+                x=dates,
+                y=lower,
+                fill='tonexty',
+                mode='lines',
+                line=dict(color='rgba(0,0,0,0)'),
+                name='±1 Std Dev',
+                hovertemplate="%{y:.2%}"
+            ),
+        # Both band edges take the points of the rolling mean, so the fill between
+        # them is drawn on the same dates
+        ], width, render_mode, linked={2: 1, 3: 1})
         
         fig.update_layout(
             title=title,
@@ -189,20 +373,21 @@ class Visualizer:
         return fig
 
     @staticmethod
-    def create_drawdown_plot(df, drawdown, return_col='ret_vw', title="Drawdown Analysis"):
+    def create_drawdown_plot(df, drawdown, return_col='ret_vw', title="Drawdown Analysis",
+                             width=None, render_mode='auto'):
         """Create drawdown plot"""
         fig = go.Figure()
         
         dates = df.index if isinstance(df.index, pd.DatetimeIndex) else df['date']
         
-        fig.add_trace(go.Scatter(
+        Visualizer.add_time_series(fig, [dict(
             x=dates,
             y=drawdown,
             fill='tozeroy',
             name='Drawdown',
             line=dict(color='red'),
             hovertemplate="%{y:.1%}"
-        ))
+        )], width, render_mode)
         
         fig.update_layout(
             title=title,
@@ -355,14 +540,16 @@ class Visualizer:
         return fig
 
     @staticmethod
-    def create_multi_performance_plot(factor_data, market_data=None, return_col='ret_vw', title="Portfolio Performance"):
+    def create_multi_performance_plot(factor_data, market_data=None, return_col='ret_vw', title="Portfolio Performance",
+                                      width=None, render_mode='auto'):
         """Create performance plot for multiple factors with market returns and log scale"""
         fig = go.Figure()
+        traces = []
         
         # Add market returns first if available
         if market_data is not None:
             market_cumret = (1 + market_data[return_col]).cumprod()
-            fig.add_trace(go.Scatter(
+            traces.append(dict(
                 x=market_data['date'],
                 y=market_cumret,
                 name="Market Portfolio",
@@ -373,7 +560,7 @@ class Visualizer:
         # Add individual factors
         for i, (factor, df) in enumerate(factor_data.items()):
             if factor != "Multifactor Portfolio":
-                fig.add_trace(go.Scatter(
+                traces.append(dict(
                     x=df['date'],
                     y=df['cumulative_return'],
                     name=factor,
@@ -387,13 +574,14 @@ class Visualizer:
         # Add multifactor portfolio last with bold line
         if "Multifactor Portfolio" in factor_data:
             df = factor_data["Multifactor Portfolio"]
-            fig.add_trace(go.Scatter(
+            traces.append(dict(
                 x=df['date'],
                 y=df['cumulative_return'],
                 name="Multifactor Portfolio",
                 line=dict(color='#0F2D46', width=2.5),
                 hovertemplate="%{y:.2f}x"
             ))
+        Visualizer.add_time_series(fig, traces, width, render_mode)
         
         fig.update_layout(
             PLOT_TEMPLATE['layout'],
@@ -417,9 +605,11 @@ class Visualizer:
         return fig
 
     @staticmethod
-    def create_excess_return_plot(factor_data, market_data, return_col='ret_vw', title="Excess Return Performance"):
+    def create_excess_return_plot(factor_data, market_data, return_col='ret_vw', title="Excess Return Performance",
+                                  width=None, render_mode='auto'):
         """Create performance plot showing cumulative excess returns vs market"""
         fig = go.Figure()
+        traces = []
         
         # Add individual factors
         for i, (factor, df) in enumerate(factor_data.items()):
@@ -434,7 +624,7 @@ class Visualizer:
                 cum_excess = (1 + excess_returns).cumprod()
                 
                 # Add trace
-                fig.add_trace(go.Scatter(
+                traces.append(dict(
                     x=common_dates,
                     y=cum_excess,
                     name=factor,
@@ -455,13 +645,14 @@ class Visualizer:
             excess_returns = factor_returns - market_returns
             cum_excess = (1 + excess_returns).cumprod()
             
-            fig.add_trace(go.Scatter(
+            traces.append(dict(
                 x=common_dates,
                 y=cum_excess,
                 name="Multifactor Portfolio",
                 line=dict(color='#0F2D46', width=2.5),  # Ocean blue, bold line
                 hovertemplate="%{y:.2f}x"
             ))
+        Visualizer.add_time_series(fig, traces, width, render_mode)
         
         # Add horizontal line at y=1 for reference
         fig.add_hline(
@@ -497,4 +688,102 @@ class Visualizer:
                 )
             )
         )
-        return fig 
\ No newline at end of file
+        return fig
+
+    @staticmethod
+    def create_frontier_plot(candidates, frontier, factor_points, selected_point=None, title="Efficient Frontier"):
+        """
+        Create risk/return plot of candidate weightings, the efficient frontier,
+        the individual factors and the selected portfolio (annualized, in %)
+        """
+        fig = go.Figure()
+
+        fig.add_trace(go.Scattergl(
+            x=candidates['Volatility'] * 100,
+            y=candidates['Return'] * 100,
+            mode='markers',
+            name="Candidate Weights",
+            marker=dict(
+                size=4,
+                color=candidates['Sharpe Ratio'],
+                colorscale=[[0, e_COLORS['nordic_red']], [0.5, e_COLORS['nordic_beige']], [1, e_COLORS['nordic_blue']]],
+                colorbar=dict(title="Sharpe"),
+                opacity=0.5
+            ),
+            hovertemplate="Vol: %{x:.2f}%<br>Return: %{y:.2f}%<extra></extra>"
+        ))
+
+        if frontier is not None and not frontier.empty:
+            fig.add_trace(go.Scatter(
+                x=frontier['Volatility'] * 100,
+                y=frontier['Return'] * 100,
+                mode='lines',
+                name="Efficient Frontier",
+                line=dict(color=e_COLORS['ocean_blue'], width=2),
+                hovertemplate="Vol: %{x:.2f}%<br>Return: %{y:.2f}%<extra></extra>"
+            ))
+
+        fig.add_trace(go.Scatter(
+            x=factor_points['Volatility'] * 100,
+            y=factor_points['Return'] * 100,
+            mode='markers+text',
+            name="Factors",
+            text=factor_points.index,
+            textposition='top center',
+            textfont=dict(family="Arial, sans-serif", size=9, color=e_COLORS['dark_grey']),
+            marker=dict(size=8, color=e_COLORS['nordic_green']),
+            hovertemplate="%{text}<br>Vol: %{x:.2f}%<br>Return: %{y:.2f}%<extra></extra>"
+        ))
+
+        if selected_point is not None:
+            fig.add_trace(go.Scatter(
+                x=[selected_point['Volatility'] * 100],
+                y=[selected_point['Return'] * 100],
+                mode='markers',
+                name="Multifactor Portfolio",
+                marker=dict(size=14, symbol='star', color=e_COLORS['aqua_blue'],
+                            line=dict(color=e_COLORS['ocean_blue'], width=1)),
+                hovertemplate="Vol: %{x:.2f}%<br>Return: %{y:.2f}%<extra></extra>"
+            ))
+
+        fig.update_layout(
+            PLOT_TEMPLATE['layout'],
+            title=title,
+            xaxis_title="Volatility (% p.a.)",
+            yaxis_title="Return (% p.a.)",
+            showlegend=True,
+            legend=dict(
+                yanchor="bottom",
+                y=0.01,
+                xanchor="right",
+                x=0.99,
+                bgcolor='rgba(255, 255, 255, 0.9)',
+                font=dict(family="Arial, sans-serif", size=10)
+            )
+        )
+        return fig
+
+    @staticmethod
+    def create_rolling_heatmap(rolling_matrix, title="Rolling Statistic by Window", colorbar_title="", zmid=0):
+        """Create window x date heatmap of a rolling statistic"""
+        fig = go.Figure(data=go.Heatmap(
+            z=rolling_matrix.to_numpy(),
+            x=rolling_matrix.columns,
+            y=[f"{window}m" for window in rolling_matrix.index],
+            zmid=zmid,
+            colorscale=[[0, '#8C5E60'],  # nordic red below the midpoint
+                       [0.5, '#FFFFFF'], # white at the midpoint
+                       [1, '#5A7887']],  # nordic blue above the midpoint
+            colorbar=dict(title=colorbar_title),
+            hoverongaps=False,
+            hovertemplate="%{x|%Y-%m}<br>Window: %{y}<br>%{z:.2f}<extra></extra>"
+        ))
+
+        fig.update_layout(
+            PLOT_TEMPLATE['layout'],
+            title=title,
+            height=350,
+            xaxis_title="Date",
+            yaxis_title="Rolling Window",
+        )
+        return fig